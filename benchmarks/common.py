@@ -0,0 +1,36 @@
+"""Helpers shared by the benchmark scripts"""
+from __future__ import print_function, division
+
+import os
+import sys
+import time
+import platform
+
+
+def use_offscreen_qt(env=None):
+    """Make Qt render offscreen unless a platform was chosen explicitly"""
+    env = os.environ if env is None else env
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
+
+
+def environment_info():
+    import numpy as np
+    import pandas as pd
+    import matplotlib as mpl
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'matplotlib': mpl.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
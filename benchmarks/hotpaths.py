@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+Time the interactive hot paths of Inspector with Qt running offscreen.
+
+Timed paths:
+    Model.add_dataitems, OutlineView.add_items, DetailView.display_interval,
+    View.move_interval, Model.new_marking, View.canvas_redraw
+
+Each parameter is swept on its own while the others are kept at their
+defaults (a full cartesian product of 1e7-point series and 1000 series does
+not fit in memory):
+    --lengths   series length, with --default-count series. Up to 1e7 by
+                default, 1e8 (several GB of memory) must be asked for
+    --counts    number of series, each of --default-length points
+    --markings  number of markings, on --default-count series of
+                --default-length points
+
+Examples:
+    $ python benchmarks/hotpaths.py run -o results.json
+    $ python benchmarks/hotpaths.py run --lengths 1e3,1e6 --counts 1,100 \\
+          --markings 0 -o results.json
+    $ python benchmarks/hotpaths.py run --lengths 1e7,1e8 --counts 1 \\
+          --markings 0 -o large.json
+    $ python benchmarks/hotpaths.py compare results.json baseline.json
+"""
+from __future__ import print_function, division
+
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+from functools import wraps
+
+from common import median, use_offscreen_qt, environment_info
+
+use_offscreen_qt()
+
+import numpy as np
+import pandas as pd
+
+from inspector.main import Inspector
+from inspector.model import Model
+from inspector.spanviews import OutlineView, DetailView
+from inspector.view import View
+from inspector.constants import Labels
+
+
+TIMED_METHODS = [
+    (Model, 'add_dataitems'),
+    (OutlineView, 'add_items'),
+    (DetailView, 'display_interval'),
+    (View, 'move_interval'),
+    (Model, 'new_marking'),
+    (View, 'canvas_redraw'),
+]
+
+
+class MethodTimer(object):
+    """
+    Wraps methods on their classes (so that already connected signals are
+    timed as well) and collects the duration of every call
+    """
+    def __init__(self, methods):
+        self.methods = methods
+        self.durations = defaultdict(list)
+        self._originals = []
+
+    def __enter__(self):
+        for class_, attr in self.methods:
+            original = getattr(class_, attr)
+            self._originals.append((class_, attr, original))
+            setattr(class_, attr, self._timed(
+                '{}.{}'.format(class_.__name__, attr), original
+            ))
+        return self
+
+    def __exit__(self, *exc_info):
+        for class_, attr, original in self._originals:
+            setattr(class_, attr, original)
+        self._originals = []
+
+    def _timed(self, name, method):
+        durations = self.durations[name]
+        @wraps(method)
+        def timed(*args, **kwargs):
+            t0 = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                durations.append(time.time() - t0)
+        return timed
+
+    def reset(self):
+        self.durations.clear()
+
+    def summary(self):
+        return {
+            name: {
+                'calls': len(values),
+                'total': sum(values),
+                'median': median(values),
+                'min': min(values),
+                'max': max(values),
+            }
+            for name, values in self.durations.items() if values
+        }
+
+
+def make_series(length, idx):
+    index = pd.date_range('2016-01-01', periods=int(length), freq='1s')
+    data = np.random.randn(int(length)).cumsum() + 100 * idx
+    return pd.Series(data, index=index, name='series {}'.format(idx))
+
+
+def run_case(app, timer, length, count, n_markings, n_moves=10, n_draws=3):
+    seria = [make_series(length, idx) for idx in range(count)]
+    timer.reset()
+    ins = Inspector(interactive=True, loglevel=40)
+    view, model = ins.view, ins.model
+    model.add_dataitems([{'series': series} for series in seria])
+    app.processEvents()
+
+    index = seria[0].index
+    window = max(len(index) // 20, 2)
+    for start in np.linspace(0, len(index) - window - 1, 5).astype(int):
+        view.detail_view.display_interval(index[start], index[start + window])
+
+    model.set_current_label(Labels.DISCARD)
+    if n_markings:
+        positions = np.linspace(0, len(index) - 2, n_markings).astype(int)
+        for pos in positions:
+            model.new_marking(index[pos].to_pydatetime(),
+                              index[pos + 1].to_pydatetime())
+    app.processEvents()
+
+    for _ in range(n_moves):
+        view.move_interval('right')
+    for _ in range(n_moves):
+        view.move_interval('left')
+    app.processEvents()
+
+    for _ in range(n_draws):
+        view.canvas_redraw()
+
+    view.close()
+    return timer.summary()
+
+
+def parse_floats(text):
+    return [int(float(v)) for v in text.split(',') if v]
+
+
+def cases_from_args(args):
+    cases = []
+    for length in args.lengths:
+        cases.append((length, args.default_count, 0))
+    for count in args.counts:
+        cases.append((args.default_length, count, 0))
+    for n_markings in args.markings:
+        cases.append((args.default_length, args.default_count, n_markings))
+    # Keep order, drop duplicates
+    seen = set()
+    return [c for c in cases if not (c in seen or seen.add(c))]
+
+
+def cmd_run(args):
+    from matplotlib.backends.qt_compat import QtWidgets
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    results = []
+    with MethodTimer(TIMED_METHODS) as timer:
+        for length, count, n_markings in cases_from_args(args):
+            case = {'length': length, 'count': count, 'markings': n_markings}
+            repeats = []
+            for _ in range(args.repeat):
+                repeats.append(run_case(app, timer, length, count, n_markings))
+            timings = {}
+            for name in repeats[0]:
+                # Median over repeats of each statistic
+                timings[name] = {
+                    stat: median([r[name][stat] for r in repeats if name in r])
+                    for stat in repeats[0][name]
+                }
+            results.append({'case': case, 'timings': timings})
+            print('length={length:<10} count={count:<5} markings={markings:<6}'
+                  ''.format(**case))
+            for name, stats in sorted(timings.items()):
+                print('    {:<32} median {:9.5f} s  total {:9.4f} s  ({} calls)'
+                      ''.format(name, stats['median'], stats['total'],
+                                int(stats['calls'])))
+    output = {'environment': environment_info(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(output, fh, indent=2)
+        print('Wrote {}'.format(args.output))
+    return output
+
+
+def _case_key(result):
+    case = result['case']
+    return case['length'], case['count'], case['markings']
+
+
+def cmd_compare(args):
+    with open(args.results) as fh:
+        current = {_case_key(r): r['timings'] for r in json.load(fh)['results']}
+    with open(args.baseline) as fh:
+        baseline = {_case_key(r): r['timings'] for r in json.load(fh)['results']}
+
+    regressions = []
+    for key in sorted(set(current) & set(baseline)):
+        print('length={:<10} count={:<5} markings={:<6}'.format(*key))
+        for name in sorted(set(current[key]) & set(baseline[key])):
+            new = current[key][name][args.stat]
+            old = baseline[key][name][args.stat]
+            ratio = new / old if old else float('inf')
+            flag = ''
+            if ratio > 1 + args.tolerance and new - old > args.min_delta:
+                flag = '  <-- REGRESSION'
+                regressions.append((key, name, ratio))
+            print('    {:<32} {:9.5f} s -> {:9.5f} s  x{:5.2f}{}'
+                  ''.format(name, old, new, ratio, flag))
+    missing = sorted(set(baseline) - set(current))
+    if missing:
+        print('Cases in baseline but not in results: {}'.format(missing))
+    if regressions:
+        print('{} regression(s) beyond {:.0%}'.format(len(regressions),
+                                                      args.tolerance))
+        return 1
+    print('No regressions beyond {:.0%}'.format(args.tolerance))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    subparsers = parser.add_subparsers(dest='command')
+
+    run = subparsers.add_parser('run', help='run the benchmarks')
+    run.add_argument('--lengths', type=parse_floats,
+                     default=parse_floats('1e3,1e4,1e5,1e6,1e7'),
+                     help='series lengths (default 1e3,...,1e7), add 1e8 '
+                          'explicitly for the largest series')
+    run.add_argument('--counts', type=parse_floats,
+                     default=parse_floats('1,10,100,1000'))
+    run.add_argument('--markings', type=parse_floats,
+                     default=parse_floats('0,100,1000'))
+    run.add_argument('--default-length', type=lambda v: int(float(v)),
+                     default=10000)
+    run.add_argument('--default-count', type=int, default=1)
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('-o', '--output', default=None,
+                     help='write results as JSON to this file')
+
+    compare = subparsers.add_parser(
+        'compare', help='compare results against a stored baseline'
+    )
+    compare.add_argument('results')
+    compare.add_argument('baseline')
+    compare.add_argument('--stat', default='median',
+                         choices=['median', 'min', 'total'])
+    compare.add_argument('--tolerance', type=float, default=0.2,
+                         help='allowed relative slowdown (default 0.2)')
+    compare.add_argument('--min-delta', type=float, default=1e-4,
+                         help='ignore slowdowns smaller than this many seconds')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        cmd_run(args)
+        return 0
+    elif args.command == 'compare':
+        return cmd_compare(args)
+    else:
+        parser.print_help()
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Measure Inspector startup time in fresh interpreters.
+
+Reports, per run and as medians:
+    import  - time to `import inspector.main`
+    window  - time until the main window has been created and shown
+    ready   - time until the event loop has processed the first round of
+              events, including loading any files given on the command line
+
+Example:
+    $ python benchmarks/startup.py --runs 10 some_file.msgpack
+"""
+from __future__ import print_function, division
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from common import median, use_offscreen_qt
+
+# Executed in a fresh interpreter for every run
+_RUN_SNIPPET = """
+import sys, time, json
+t0 = time.time()
+import inspector.main
+t_import = time.time() - t0
+sys.argv = ['inspector'] + json.loads(sys.argv[1])
+ins = inspector.main.Inspector(interactive=False, loglevel=40)
+t_window = time.time() - t0
+from matplotlib.backends.qt_compat import QtCore
+def report():
+    print(json.dumps({
+        'import': t_import,
+        'window': t_window,
+        'ready': time.time() - t0,
+    }))
+    ins.app.quit()
+QtCore.QTimer.singleShot(0, report)
+ins.app.exec_()
+"""
+
+
+def run_once(files, env):
+    output = subprocess.check_output(
+        [sys.executable, '-c', _RUN_SNIPPET, json.dumps(files)],
+        env=env,
+    )
+    # Last line holds the result, anything before is application output
+    return json.loads(output.decode('utf8').strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('files', nargs='*',
+                        help='files passed on to the inspector command line')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='also write all results to this file')
+    args = parser.parse_args(argv)
+
+    env = use_offscreen_qt(dict(os.environ))
+    results = []
+    for idx in range(args.runs):
+        result = run_once(args.files, env)
+        results.append(result)
+        print('run {:2d}: import {import:.3f} s  window {window:.3f} s  '
+              'ready {ready:.3f} s'.format(idx, **result))
+    summary = {key: median([r[key] for r in results])
+               for key in ['import', 'window', 'ready']}
+    print('median: import {import:.3f} s  window {window:.3f} s  '
+          'ready {ready:.3f} s'.format(**summary))
+    if args.json_path:
+        with open(args.json_path, 'w') as fh:
+            json.dump({'runs': results, 'median': summary}, fh, indent=2)
+    return summary
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+Statistics of any interval of a series in constant time, from prefix sums
+
+For a series of n values, IntervalAggregates keeps prefix arrays of the
+number of valid (non-NaN) values and of the trapezoid integral over the
+index. The count and integral of an interval [x0, x1] are differences of two
+entries each, at the positions found by searchsorted (see
+IndexSlicer.bounds).
+
+The values are split into blocks of BLOCK_SIZE. Mean and std come from
+prefix sums of per-block centred moments: the sum of squared deviations
+from the block mean, and the block mean relative to the mean of the series.
+Sums of raw squares would cancel catastrophically for e.g. 1000 W +- 0.01 W.
+The whole blocks of an interval and at most two partial blocks are combined
+with the parallel variance formula. Minimum and maximum come from a sparse
+table over the block extremes: a query reads two table entries, plus the
+partial blocks.
+
+Derived series are only evaluated per window (see derived), window_stats
+computes the same statistics from such a window directly.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import logging
+logger = logging.getLogger('aggr')
+
+import warnings
+from collections import namedtuple
+from timeit import default_timer
+
+import numpy as np
+
+from inspector.slicing import nanminmax, values_to_keys
+
+BLOCK_SIZE = 1024
+
+IntervalStats = namedtuple('IntervalStats', [
+    'n',         # number of valid values
+    'mean',      # NaN if n is 0
+    'std',       # sample standard deviation, NaN if n < 2
+    'min',       # NaN if n is 0
+    'max',       # NaN if n is 0
+    'integral',  # trapezoid integral, in value * hours for datetime indexes
+])
+
+
+def _x_scale(dtype):
+    """:return: number of index keys per unit of integrals (hours for dates)"""
+    if dtype.kind != 'M':
+        return 1
+    unit = np.datetime_data(dtype)[0]
+    return np.timedelta64(1, 'h') // np.timedelta64(1, unit)
+
+
+def _trapezoids(keys, values, valid):
+    """:return: areas between consecutive values, 0 where either is NaN"""
+    filled = np.where(valid, values, 0.0)
+    trapezoids = (filled[1:] + filled[:-1]) * (np.diff(keys) / 2)
+    trapezoids[~(valid[1:] & valid[:-1])] = 0
+    return trapezoids
+
+
+Moments = namedtuple('Moments', ['n', 'mean', 'm2'])  # m2: sum of squared
+                                                       # deviations from mean
+NO_MOMENTS = Moments(0, 0.0, 0.0)
+
+
+def _moments(values):
+    """:return: Moments of the non-NaN values"""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return NO_MOMENTS
+    mean = values.mean()
+    deviations = values - mean
+    return Moments(len(values), mean, float(np.dot(deviations, deviations)))
+
+
+def _merge(a, b):
+    """:return: Moments of the union of the values of a and b"""
+    if not a.n:
+        return b
+    if not b.n:
+        return a
+    n = a.n + b.n
+    delta = b.mean - a.mean
+    return Moments(n, a.mean + delta * b.n / n,
+                   a.m2 + b.m2 + delta * delta * a.n * b.n / n)
+
+
+def _prefix(values):
+    """:return: array of length len(values) + 1, the sums of values[:i]"""
+    prefix = np.zeros(len(values) + 1, dtype=np.result_type(values, float))
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+def _sparse_table(block_extremes, func):
+    """
+    :param func: np.fmin | np.fmax
+    :return: [np.ndarray], level k holding func of the 2**k blocks from each
+        position
+    """
+    table = [block_extremes]
+    width = 1
+    while 2 * width <= len(block_extremes):
+        previous = table[-1]
+        table.append(func(previous[:-width], previous[width:]))
+        width *= 2
+    return table
+
+
+def _query_table(table, func, b0, b1):
+    """:return: func over blocks [b0, b1), b0 < b1"""
+    level = int(np.log2(b1 - b0))
+    return func(table[level][b0], table[level][b1 - (1 << level)])
+
+
+class IntervalAggregates(object):
+    """
+    Prefix sums and block extremes of the values behind an IndexSlicer, see
+    the module docstring
+    """
+    def __init__(self, slicer, block_size=BLOCK_SIZE):
+        """
+        :param slicer: IndexSlicer
+        :param block_size: int, number of values per block
+        """
+        start_time = default_timer()
+        self.slicer = slicer
+        self.block_size = block_size
+        values = np.asarray(slicer.values, dtype=float)
+        valid = ~np.isnan(values)
+        self.counts = _prefix(valid.astype(np.int64))
+
+        # integrals[i] is the integral from the first value to value i
+        trapezoids = _trapezoids(slicer.keys, values, valid)
+        self.integrals = _prefix(
+            trapezoids / _x_scale(slicer.index_dtype)
+        )
+
+        n_blocks = -(-len(values) // block_size)  # ceil
+        padded = np.full(n_blocks * block_size, np.nan)
+        padded[:len(values)] = values
+        blocks = padded.reshape(n_blocks, block_size)
+        with warnings.catch_warnings():
+            # All-NaN blocks
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.min_table = _sparse_table(np.nanmin(blocks, axis=1), np.fmin)
+            self.max_table = _sparse_table(np.nanmax(blocks, axis=1), np.fmax)
+
+        # Centred moments per block, see the module docstring
+        block_counts = np.count_nonzero(~np.isnan(blocks), axis=1)
+        block_means = np.nansum(blocks, axis=1) / np.maximum(block_counts, 1)
+        deviations = blocks - block_means[:, np.newaxis]
+        self.reference = block_means.dot(block_counts) \
+                         / max(block_counts.sum(), 1)
+        offsets = np.where(block_counts > 0, block_means - self.reference, 0)
+        self.block_counts = _prefix(block_counts)
+        self.block_offsets = _prefix(block_counts * offsets)
+        self.block_offset_squares = _prefix(block_counts * offsets * offsets)
+        self.block_m2 = _prefix(np.nansum(deviations * deviations, axis=1))
+        self.values = values
+        logger.debug('Built interval aggregates of {} values in {:.3f} s'
+                     ''.format(len(values), default_timer() - start_time))
+
+    def extremes(self, i0, i1):
+        """:return: (min, max) of values[i0:i1], NaN if none are valid"""
+        size = self.block_size
+        b0 = -(-i0 // size)  # First whole block
+        b1 = i1 // size      # End of the whole blocks
+        if b0 >= b1:
+            return nanminmax(self.values[i0:i1])
+        vmin = _query_table(self.min_table, np.fmin, b0, b1)
+        vmax = _query_table(self.max_table, np.fmax, b0, b1)
+        for part in [self.values[i0:b0 * size], self.values[b1 * size:i1]]:
+            part_min, part_max = nanminmax(part)
+            vmin, vmax = np.fmin(vmin, part_min), np.fmax(vmax, part_max)
+        return vmin, vmax
+
+    def moments(self, i0, i1):
+        """:return: Moments of values[i0:i1]"""
+        size = self.block_size
+        b0 = -(-i0 // size)
+        b1 = i1 // size
+        if b0 >= b1:
+            return _moments(self.values[i0:i1])
+        n = int(self.block_counts[b1] - self.block_counts[b0])
+        whole = NO_MOMENTS
+        if n:
+            offset = self.block_offsets[b1] - self.block_offsets[b0]
+            # Spread of the block means, around their mean
+            between = self.block_offset_squares[b1] \
+                      - self.block_offset_squares[b0] - offset * offset / n
+            whole = Moments(n, self.reference + offset / n,
+                            self.block_m2[b1] - self.block_m2[b0]
+                            + max(between, 0.0))
+        for part in [self.values[i0:b0 * size], self.values[b1 * size:i1]]:
+            whole = _merge(whole, _moments(part))
+        return whole
+
+    def query(self, x0, x1):
+        """
+        :return: IntervalStats of the values in the closed interval [x0, x1].
+            The integral runs from its first to its last value.
+        """
+        i0, i1 = self.slicer.bounds(x0, x1, remember=False)
+        n = int(self.counts[i1] - self.counts[i0])
+        if n == 0:
+            return IntervalStats(0, np.nan, np.nan, np.nan, np.nan, 0.0)
+        moments = self.moments(i0, i1)
+        mean = moments.mean
+        std = np.sqrt(moments.m2 / (n - 1)) if n > 1 else np.nan
+        vmin, vmax = self.extremes(i0, i1)
+        integral = self.integrals[i1 - 1] - self.integrals[i0]
+        return IntervalStats(n, mean, std, vmin, vmax, integral)
+
+
+def window_stats(index_values, values):
+    """
+    :param index_values: np.ndarray, index of a window, e.g. of
+        IndexSlicer.slice
+    :param values: np.ndarray, values of the window
+    :return: IntervalStats of the window, computed from all of its values
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    n = int(np.count_nonzero(valid))
+    if n == 0:
+        return IntervalStats(0, np.nan, np.nan, np.nan, np.nan, 0.0)
+    valid_values = values[valid]
+    std = valid_values.std(ddof=1) if n > 1 else np.nan
+    keys = values_to_keys(index_values, index_values.dtype)
+    integral = _trapezoids(keys, values, valid).sum() \
+               / _x_scale(index_values.dtype)
+    return IntervalStats(n, valid_values.mean(), std, valid_values.min(),
+                         valid_values.max(), integral)
+
+
+def stats_text(name, stats, is_time):
+    """:return: str, multi-line description of IntervalStats of an item"""
+    return '\n'.join([
+        name,
+        '  {} values, mean {:.6g}, std {:.6g}'.format(stats.n, stats.mean,
+                                                     stats.std),
+        '  min {:.6g}, max {:.6g}'.format(stats.min, stats.max),
+        # Series on datetime indexes are typically power in W
+        '  energy {:.6g} Wh'.format(stats.integral) if is_time
+        else '  integral {:.6g}'.format(stats.integral),
+    ])
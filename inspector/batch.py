@@ -0,0 +1,208 @@
+"""
+Headless batch processing: `inspector batch [options] FILE ...`
+
+Loads files with the same decoders as the GUI, applies auto-marking rules
+and writes the resulting markings as json (and optionally the series cleaned
+according to them), spreading the files over a process pool. Never imports
+Qt.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import os
+import sys
+import json
+import pickle
+import logging
+import argparse
+import multiprocessing
+logger = logging.getLogger('btch')
+
+from timeit import default_timer
+
+from inspector.constants import Labels
+from inspector.cleaning import clean_series
+from inspector.loaders import load_file
+from inspector.markings import gap_markings, marking_to_json
+
+
+# Auto-marking rules by name, callable(series, **params) -> [marking dict]
+RULES = {
+    'gaps': gap_markings,
+}
+
+DEFAULT_RULES = [
+    {'rule': 'gaps', 'label': Labels.DISCARD, 'gap_limit': '20s'},
+]
+
+
+def parse_rules(rules_arg):
+    """
+    :param rules_arg: str, json list of {'rule': name, **params}, or a path
+        to a file containing such json
+    :return: [dict]
+    """
+    if os.path.exists(rules_arg):
+        with open(rules_arg) as fh:
+            rules = json.load(fh)
+    else:
+        rules = json.loads(rules_arg)
+    for rule in rules:
+        if rule.get('rule') not in RULES:
+            raise ValueError('Unknown rule {!r}, expected one of {}'.format(
+                rule.get('rule'), sorted(RULES)
+            ))
+    return rules
+
+
+def apply_rules(series, rules):
+    """
+    :param series: pd.Series
+    :param rules: [dict], see parse_rules
+    :return: [marking dict] sorted by start
+    """
+    markings = []
+    for rule in rules:
+        params = dict((k, v) for k, v in rule.items() if k != 'rule')
+        markings.extend(RULES[rule['rule']](series, **params))
+    return sorted(markings, key=lambda m: m['start'])
+
+
+def output_path(path, out_dir, suffix):
+    """<out_dir or the directory of path>/<file name of path><suffix>"""
+    directory, filename = os.path.split(path)
+    return os.path.join(out_dir or directory, filename + suffix)
+
+
+def process_file(job):
+    """
+    Load one file, mark each of its series and write the markings, and the
+    cleaned series if asked to
+
+    :param job: (path, rules, out_dir, cleaned)
+    :return: (path, {'n_series': int, 'n_markings': int, 'seconds': float,
+              'cleaned': {label: n points}} | None if the file could not be
+              processed, error str | None)
+    """
+    path, rules, out_dir, cleaned = job
+    start = default_timer()
+    try:
+        seria = load_file(path)
+        if seria is None:
+            return path, None, 'Could not deserialize'
+        markings = {}
+        cleaned_seria = []
+        cleaned_counts = {}
+        for series in seria:
+            series_markings = apply_rules(series, rules)
+            markings[str(series.name)] = list(map(
+                marking_to_json, series_markings
+            ))
+            if cleaned:
+                cleaned_series, counts = clean_series(series,
+                                                      series_markings)
+                cleaned_seria.append(cleaned_series)
+                for label, count in counts.items():
+                    cleaned_counts[label] = \
+                        cleaned_counts.get(label, 0) + count
+        with open(output_path(path, out_dir, '.markings.json'), 'w') as fh:
+            json.dump(markings, fh, indent=1)
+        if cleaned:
+            # A list of series, loadable like any other file
+            with open(output_path(path, out_dir, '.cleaned.pickle'),
+                      'wb') as fh:
+                pickle.dump(cleaned_seria, fh, protocol=2)
+    except Exception as err:
+        logger.debug('Failed processing %s', path, exc_info=True)
+        return path, None, '{}: {}'.format(type(err).__name__, err)
+    return path, {
+        'n_series': len(seria),
+        'n_markings': sum(map(len, markings.values())),
+        'seconds': default_timer() - start,
+        'cleaned': cleaned_counts,
+    }, None
+
+
+def run(paths, rules=None, workers=None, out_dir=None, cleaned=False):
+    """
+    Process paths over a pool of worker processes
+
+    :param paths: [str]
+    :param rules: [dict] | None (DEFAULT_RULES)
+    :param workers: int | None (number of CPUs). With 1, files are processed
+        in this process.
+    :param out_dir: str | None, defaults to writing next to each file
+    :param cleaned: bool, also write <file>.cleaned.pickle with the series
+        cleaned according to the markings
+    :return: {path: error str} for the files that failed
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    workers = workers or multiprocessing.cpu_count()
+    if out_dir and not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    jobs = [(path, rules, out_dir, cleaned) for path in paths]
+
+    pool = None
+    if workers > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(workers, len(jobs)))
+        results = pool.imap_unordered(process_file, jobs, chunksize=1)
+    else:
+        results = map(process_file, jobs)
+
+    failed = {}
+    try:
+        for n, (path, stats, error) in enumerate(results, 1):
+            if error:
+                failed[path] = error
+                logger.error('[{}/{}] {}: {}'.format(n, len(jobs), path, error))
+            else:
+                logger.info(
+                    '[{}/{}] {}: {n_markings} markings in {n_series} series '
+                    '({seconds:.2f} s)'.format(n, len(jobs), path, **stats)
+                )
+                if stats['cleaned']:
+                    logger.info('[{}/{}] {}: cleaned points {}'.format(
+                        n, len(jobs), path, stats['cleaned']
+                    ))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return failed
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='inspector batch',
+        description='Auto-mark files without opening a window',
+    )
+    parser.add_argument('files', nargs='+', help='Files to process')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Number of worker processes (default: #cpus)')
+    parser.add_argument('-o', '--out-dir', default=None,
+                        help='Output directory (default: next to each file)')
+    parser.add_argument('--rules', default=None,
+                        help='Json list of rules, or a file with one, e.g. '
+                             '\'[{"rule": "gaps", "label": "discard", '
+                             '"gap_limit": "20s"}]\'. Available rules: '
+                             '%s' % ', '.join(sorted(RULES)))
+    parser.add_argument('--cleaned', action='store_true',
+                        help='Also write the series cleaned according to '
+                             'the markings, to <file>.cleaned.pickle')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    loglvl = logging.DEBUG if os.environ.get('PYDEBUG', None) else logging.INFO
+    logging.basicConfig(
+        level=loglvl,
+        format="%(asctime)s %(levelname)-8s [%(name)s] : %(message)s"
+    )
+    rules = parse_rules(args.rules) if args.rules else None
+    start = default_timer()
+    failed = run(args.files, rules=rules, workers=args.workers,
+                 out_dir=args.out_dir, cleaned=args.cleaned)
+    logger.info('Processed {} files in {:.1f} s, {} failed'.format(
+        len(args.files), default_timer() - start, len(failed)
+    ))
+    return 1 if failed else 0
@@ -0,0 +1,236 @@
+"""
+Applies the cleaning actions described by marking labels (see
+constants.Labels) to series.
+
+Markings are closed intervals [start, end] on the index. They are resolved to
+positions with searchsorted and turned into runs of per-point label codes by
+sweeping over the interval bounds, after which every action is a vectorized
+pass over the values.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import logging
+logger = logging.getLogger('clng')
+
+import numpy as np
+import pandas as pd
+
+from inspector.constants import Labels
+from inspector.markings import MarkingStore
+from inspector.slicing import index_keys, values_to_keys
+
+# A point covered by markings with different labels is cleaned according to
+# the first of these. Other labels (GOOD, COMMENT) do not change any values.
+LABEL_PRECEDENCE = (
+    Labels.DISCARD,
+    Labels.ZERO,
+    Labels.LINEAR_FILL,
+    Labels.FFILL,
+    Labels.BFILL,
+)
+LABEL_CODES = dict(
+    (label, code) for code, label in enumerate(LABEL_PRECEDENCE, 1)
+)
+# Fill labels come last in LABEL_PRECEDENCE
+_FIRST_FILL_CODE = LABEL_CODES[Labels.LINEAR_FILL]
+
+
+def marking_fields(markings):
+    """
+    :param markings: MarkingStore, or iterable of Marking or of dicts with
+        keys 'start', 'end' and 'label'
+    :return: ([start], [end], np.ndarray of labels)
+    """
+    if isinstance(markings, MarkingStore):
+        return markings.columns()
+    starts, ends, labels = [], [], []
+    for marking in markings:
+        if isinstance(marking, dict):
+            starts.append(marking['start'])
+            ends.append(marking['end'])
+            labels.append(marking['label'])
+        else:
+            starts.append(marking.start)
+            ends.append(marking.end)
+            labels.append(marking.label)
+    return starts, ends, np.array(labels, dtype=object)
+
+
+def label_segments(keys, start_keys, end_keys, labels):
+    """
+    Split the index into runs of points to which the same label applies
+
+    Only the 2 * #markings interval bounds are swept (as a difference array
+    per label), so the cost in the number of points is a single searchsorted.
+
+    :param keys: sorted index keys (see slicing.index_keys)
+    :param start_keys: marking starts, in the same key space as keys
+    :param end_keys: marking ends
+    :param labels: np.ndarray of marking labels
+    :return: (codes, lengths), the code (LABEL_CODES, 0 where no cleaning
+        marking applies) and number of points of each consecutive run
+    """
+    n = len(keys)
+    marking_codes = np.zeros(len(labels), dtype=np.int8)
+    for label in LABEL_PRECEDENCE:
+        marking_codes[labels == label] = LABEL_CODES[label]
+    cleaning = marking_codes > 0
+    if not cleaning.any():
+        return np.zeros(1, dtype=np.int8), np.array([n])
+    marking_codes = marking_codes[cleaning]
+    i0 = np.searchsorted(keys, np.asarray(start_keys)[cleaning], side='left')
+    i1 = np.searchsorted(keys, np.asarray(end_keys)[cleaning], side='right')
+    i1 = np.maximum(i1, i0)
+
+    bounds = np.concatenate([i0, i1])
+    order = np.argsort(bounds, kind='mergesort')
+    bounds = bounds[order]
+    n_markings = len(i0)
+    # Number of markings of each label covering the run after each bound
+    depth = np.zeros((2 * n_markings, len(LABEL_PRECEDENCE) + 1),
+                     dtype=np.int32)
+    depth[np.arange(2 * n_markings), np.tile(marking_codes, 2)[order]] = \
+        np.repeat([1, -1], n_markings)[order]
+    active = np.cumsum(depth, axis=0)[:, 1:] > 0
+    # argmax finds the first, i.e. highest precedence, active label
+    codes = np.where(active.any(axis=1), active.argmax(axis=1) + 1, 0)
+    codes = np.concatenate([[0], codes]).astype(np.int8)
+    lengths = np.diff(np.concatenate([[0], bounds, [n]]))
+    return codes, lengths
+
+
+def label_codes(keys, start_keys, end_keys, labels):
+    """
+    :return: np.int8 array, per point the code (LABEL_CODES) of the label
+        that applies to it, 0 where no cleaning marking applies. See
+        label_segments for the parameters.
+    """
+    return np.repeat(*label_segments(keys, start_keys, end_keys, labels))
+
+
+def apply_codes(keys, values, codes):
+    """
+    Clean values according to codes (see label_codes)
+
+    Filled points take their values from the nearest points that are neither
+    filled nor discarded, and become NaN if there is no such point on the
+    side(s) they need.
+
+    :return: (cleaned values, boolean mask of the points kept)
+    """
+    values = np.array(values, dtype=np.float64)
+    values[codes == LABEL_CODES[Labels.ZERO]] = 0
+    discarded = codes == LABEL_CODES[Labels.DISCARD]
+    filled = codes >= _FIRST_FILL_CODE
+
+    fill_positions = np.flatnonzero(filled)
+    if len(fill_positions):
+        n = len(values)
+        source = ~(filled | discarded)
+        positions = np.arange(n)
+        # Position of the closest source point at or before/after each point,
+        # -1/n if there is none
+        prev = np.where(source, positions, -1)
+        np.maximum.accumulate(prev, out=prev)
+        next_ = np.where(source, positions, n)
+        next_ = np.minimum.accumulate(next_[::-1])[::-1]
+        prev, next_ = prev[fill_positions], next_[fill_positions]
+
+        padded = np.append(values, np.nan)  # Index -1 and n both give NaN
+        prev_values, next_values = padded[prev], padded[np.minimum(next_, n)]
+        fill_codes = codes[fill_positions]
+        filled_values = np.where(
+            fill_codes == LABEL_CODES[Labels.FFILL], prev_values, next_values
+        )
+        linear = fill_codes == LABEL_CODES[Labels.LINEAR_FILL]
+        if linear.any():
+            k = keys[fill_positions[linear]].astype(np.float64)
+            k_prev = keys[np.maximum(prev[linear], 0)].astype(np.float64)
+            k_next = keys[np.minimum(next_[linear], n - 1)]\
+                        .astype(np.float64)
+            weight = (k - k_prev) / (k_next - k_prev)
+            y_prev, y_next = prev_values[linear], next_values[linear]
+            filled_values[linear] = y_prev + weight * (y_next - y_prev)
+        values[fill_positions] = filled_values
+    keep = ~discarded
+    return values[keep], keep
+
+
+def label_counts(codes, lengths=None):
+    """
+    :param codes: label codes, per point or per run (see label_segments)
+    :param lengths: run lengths, if codes are per run
+    :return: {label: number of points cleaned according to it}
+    """
+    counts = np.bincount(codes, weights=lengths,
+                         minlength=len(LABEL_PRECEDENCE) + 1)
+    return dict((label, int(counts[LABEL_CODES[label]]))
+                for label in LABEL_PRECEDENCE)
+
+
+def clean_series(series, markings):
+    """
+    Apply the cleaning actions of markings to series
+
+    :param series: pd.Series
+    :param markings: iterable of Marking or of marking dicts
+    :return: (cleaned pd.Series, {label: number of points affected})
+    """
+    if not series.index.is_monotonic_increasing:
+        series = series.sort_index()
+    keys = index_keys(series.index)
+    starts, ends, labels = marking_fields(markings)
+    dtype = series.index.values.dtype
+    segment_codes, lengths = label_segments(
+        keys,
+        values_to_keys(starts, dtype),
+        values_to_keys(ends, dtype),
+        labels,
+    )
+    codes = np.repeat(segment_codes, lengths)
+    values, keep = apply_codes(keys, series.values, codes)
+    cleaned = pd.Series(values, index=series.index[keep], name=series.name)
+    return cleaned, label_counts(segment_codes, lengths)
+
+
+def clean_window(keys, values, start_keys, end_keys, labels, i0, i1):
+    """
+    Clean only the points [i0:i1] of a series, as clean_series would
+
+    Only markings overlapping the window are applied, together with those
+    adjacent to them that affect which points fills take their values from.
+
+    :param keys: sorted index keys (see slicing.index_keys)
+    :param values: np.ndarray, values of the full series
+    :param start_keys: np.ndarray, marking starts in the key space of keys
+    :param end_keys: np.ndarray, marking ends
+    :param labels: np.ndarray of marking labels
+    :return: (positions of the points in the window that are kept, their
+        cleaned values)
+    """
+    n = len(keys)
+    if i0 >= i1 or not n:
+        return np.arange(0), np.zeros(0)
+    lo, hi = i0, i1
+    while True:
+        # Markings covering the points next to [lo:hi] matter as well, as
+        # those points are fill sources unless they are cleaned themselves
+        k_lo, k_hi = keys[max(lo - 1, 0)], keys[min(hi, n - 1)]
+        relevant = (start_keys <= k_hi) & (end_keys >= k_lo)
+        if not relevant.any():
+            break
+        new_lo = min(lo, int(np.searchsorted(
+            keys, start_keys[relevant].min(), side='left')))
+        new_hi = max(hi, int(np.searchsorted(
+            keys, end_keys[relevant].max(), side='right')))
+        if (new_lo, new_hi) == (lo, hi):
+            break
+        lo, hi = new_lo, new_hi
+    lo, hi = max(lo - 1, 0), min(hi + 1, n)
+
+    codes = label_codes(keys[lo:hi], start_keys[relevant],
+                        end_keys[relevant], labels[relevant])
+    cleaned, keep = apply_codes(keys[lo:hi], values[lo:hi], codes)
+    positions = np.arange(lo, hi)[keep]
+    in_window = (positions >= i0) & (positions < i1)
+    return positions[in_window], cleaned[in_window]
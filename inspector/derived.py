@@ -0,0 +1,516 @@
+"""
+Derived series: expressions over loaded items, evaluated lazily for the
+windows that are displayed
+
+An expression combines items, referred to by name, with arithmetic and a few
+window functions, e.g.
+    mains - (kitchen + heating)
+    rolling(item('meter 1'), '15min')
+    resample(mains, '1h', 'max') / 1000
+    diff(counter) * 4
+
+item('name') refers to items whose names are not identifiers. Functions:
+    rolling(x, window, func='mean')
+        window is a time span ('15min') or a number of values
+    resample(x, rule, func='mean')
+        rule is a fixed frequency ('1h'), datetime indexes only
+    shift(x, periods=1), diff(x, periods=1), abs(x)
+
+Expressions are parsed with `ast` and only the constructs above are accepted,
+nothing is passed to eval.
+
+When two series are combined, the right operand is aligned to the index of
+the left one by searchsorted, taking the last value at or before each index
+value. A window is evaluated from the slices of the source items it depends
+on, widened by what rolling, resample and shift need to look back (count
+windows by their number of values times the median interval of the source,
+see summary.SeriesSummary).
+"""
+from __future__ import print_function, division, unicode_literals
+
+import ast
+import logging
+logger = logging.getLogger('drvd')
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from pandas.tseries.frequencies import to_offset
+
+from inspector.slicing import (
+    IndexSlicer,
+    index_keys,
+    value_to_key,
+    values_to_keys,
+    axis_values,
+)
+
+# Maximum number of values per source in the coarse evaluation of the full
+# range, which is what the outline shows
+COARSE_N_POINTS = 20000
+# Count-based windows look back this many times their median span, so that
+# irregularly sampled sources are covered too
+COUNT_PADDING_FACTOR = 2
+
+ROLLING_FUNCS = ('mean', 'sum', 'min', 'max', 'median', 'std')
+RESAMPLE_FUNCS = ('mean', 'sum', 'min', 'max', 'median', 'first', 'last',
+                  'count')
+
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Pow: np.power,
+}
+
+
+def _widen(lo, hi, before=None, after=None):
+    """:return: (lo - before, hi + after), None meaning unbounded"""
+    if lo is not None and before is not None:
+        lo = lo - before
+    if hi is not None and after is not None:
+        hi = hi + after
+    return lo, hi
+
+
+def _count_span(node, count):
+    """
+    :return: x-span covering count values of node, or None if unknown
+    """
+    interval = node.interval()
+    if interval is None or not count:
+        return None
+    return interval * (abs(count) * COUNT_PADDING_FACTOR)
+
+
+def align(left, right):
+    """
+    :param left: pd.Series
+    :param right: pd.Series
+    :return: np.ndarray, for each index value of left the last value of right
+        at or before it (NaN if there is none)
+    """
+    left_keys = index_keys(left.index)
+    right_keys = values_to_keys(np.asarray(right.index.values),
+                                left.index.values.dtype)
+    if not len(right):
+        return np.full(len(left), np.nan)
+    positions = np.searchsorted(right_keys, left_keys, side='right') - 1
+    values = np.asarray(right.values, dtype=float)[np.maximum(positions, 0)]
+    values[positions < 0] = np.nan
+    return values
+
+
+class Node(object):
+    def evaluate(self, lo, hi, step):
+        """
+        :param lo: index value | None, start of the range that must be
+            correct, None for the start of the data
+        :param hi: index value | None, end of that range
+        :param step: int, take every step:th value of the sources
+        :return: pd.Series, or a number for constants
+        """
+        raise NotImplementedError
+
+    def interval(self):
+        """:return: median interval of the result, see summary.median_interval"""
+        return None
+
+    def items(self):
+        """:return: [DataItem] that the result depends on"""
+        return []
+
+
+class Constant(Node):
+    def __init__(self, value):
+        self.value = value
+
+    def evaluate(self, lo, hi, step):
+        return self.value
+
+
+class ItemNode(Node):
+    def __init__(self, item):
+        self.item = item
+
+    def evaluate(self, lo, hi, step):
+        slicer = self.item.slicer
+        if lo is None and hi is None:
+            i0, i1 = 0, len(slicer)
+        else:
+            i0, i1 = slicer.bounds(
+                slicer.index_values[0] if lo is None else lo,
+                slicer.index_values[-1] if hi is None else hi,
+                remember=False,
+            )
+        index_values = slicer.index_values[i0:i1:step]
+        if slicer.is_time:
+            index = pd.DatetimeIndex(index_values)
+            tz = getattr(self.item.series.index, 'tz', None)
+            if tz is not None:
+                index = index.tz_localize('UTC').tz_convert(tz)
+        else:
+            index = pd.Index(index_values)
+        return pd.Series(slicer.values[i0:i1:step], index=index)
+
+    def interval(self):
+        return self.item.summary.median_interval
+
+    def items(self):
+        return [self.item]
+
+
+class BinaryNode(Node):
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def evaluate(self, lo, hi, step):
+        left = self.left.evaluate(lo, hi, step)
+        # Including the value of right at or before lo
+        right = self.right.evaluate(
+            *_widen(lo, hi, _count_span(self.right, step)), step=step
+        )
+        if isinstance(left, pd.Series):
+            if isinstance(right, pd.Series):
+                right = align(left, right)
+            values = self.operator(np.asarray(left.values, dtype=float),
+                                   right)
+            return pd.Series(values, index=left.index)
+        if isinstance(right, pd.Series):
+            values = self.operator(left, np.asarray(right.values, dtype=float))
+            return pd.Series(values, index=right.index)
+        return self.operator(left, right)
+
+    def interval(self):
+        if isinstance(self.left, Constant):
+            return self.right.interval()
+        return self.left.interval()
+
+    def items(self):
+        return self.left.items() + self.right.items()
+
+
+class UnaryNode(Node):
+    def __init__(self, operator, operand):
+        self.operator = operator
+        self.operand = operand
+
+    def evaluate(self, lo, hi, step):
+        return self.operator(self.operand.evaluate(lo, hi, step))
+
+    def interval(self):
+        return self.operand.interval()
+
+    def items(self):
+        return self.operand.items()
+
+
+class RollingNode(UnaryNode):
+    def __init__(self, operand, window, func='mean'):
+        if func not in ROLLING_FUNCS:
+            raise ValueError('rolling func must be one of {}'.format(
+                ', '.join(ROLLING_FUNCS)
+            ))
+        if isinstance(window, int):
+            if window < 1:
+                raise ValueError('rolling window must be positive')
+            self.span = None
+        else:
+            self.span = pd.to_timedelta(to_offset(window))
+        self.operand = operand
+        self.window = window
+        self.func = func
+
+    def evaluate(self, lo, hi, step):
+        if self.span is None:
+            before = _count_span(self.operand, self.window)
+            window = max(self.window // step, 1)
+        else:
+            before = self.span
+            window = self.window
+        series = self.operand.evaluate(*_widen(lo, hi, before), step=step)
+        return getattr(series.rolling(window, min_periods=1), self.func)()
+
+
+class ResampleNode(UnaryNode):
+    def __init__(self, operand, rule, func='mean'):
+        if func not in RESAMPLE_FUNCS:
+            raise ValueError('resample func must be one of {}'.format(
+                ', '.join(RESAMPLE_FUNCS)
+            ))
+        try:
+            self.span = pd.to_timedelta(to_offset(rule))
+        except (TypeError, ValueError):
+            raise ValueError('resample rule must be a fixed frequency, '
+                             'e.g. "15min", not {!r}'.format(rule))
+        self.operand = operand
+        self.rule = rule
+        self.func = func
+
+    def evaluate(self, lo, hi, step):
+        # Whole bins around lo and hi
+        series = self.operand.evaluate(
+            *_widen(lo, hi, self.span, self.span), step=step
+        )
+        if not isinstance(series.index, pd.DatetimeIndex):
+            raise ValueError('resample needs a datetime index')
+        return getattr(series.resample(self.rule), self.func)()
+
+    def interval(self):
+        return self.span
+
+
+class ShiftNode(UnaryNode):
+    def __init__(self, operand, periods=1, difference=False):
+        if not isinstance(periods, int):
+            raise ValueError('periods must be an integer')
+        self.operand = operand
+        self.periods = periods
+        self.difference = difference
+
+    def evaluate(self, lo, hi, step):
+        span = _count_span(self.operand, self.periods)
+        if self.periods > 0:
+            lo_hi = _widen(lo, hi, before=span)
+        else:
+            lo_hi = _widen(lo, hi, after=span)
+        series = self.operand.evaluate(*lo_hi, step=step)
+        periods = int(round(self.periods / step)) or np.sign(self.periods)
+        if self.difference:
+            return series.diff(periods)
+        return series.shift(periods)
+
+
+FUNCTIONS = {
+    'rolling': RollingNode,
+    'resample': ResampleNode,
+    'shift': ShiftNode,
+    'diff': lambda operand, periods=1: ShiftNode(operand, periods,
+                                                 difference=True),
+    'abs': lambda operand: UnaryNode(np.abs, operand),
+}
+
+
+class ExpressionParser(object):
+    """Builds the Node tree of an expression, see the module docstring"""
+    def __init__(self, items):
+        """
+        :param items: [DataItem], the items expressions may refer to
+        """
+        self.items = OrderedDict()
+        for item in items:
+            self.items.setdefault(str(item.name), item)
+
+    def parse(self, expression):
+        """
+        :return: Node
+        :raises ValueError: if expression is invalid
+        """
+        try:
+            tree = ast.parse(expression.strip(), mode='eval')
+        except SyntaxError as err:
+            raise ValueError('Invalid expression: {}'.format(err))
+        root = self.build(tree.body)
+        if not root.items():
+            raise ValueError('Expression refers to no item')
+        return root
+
+    def item_node(self, name):
+        name = str(name)
+        if name not in self.items:
+            raise ValueError('No item named {!r}'.format(name))
+        item = self.items[name]
+        slicer = item.slicer
+        if isinstance(slicer, DerivedSlicer):
+            # Derived from a derived item
+            return slicer.derived.root
+        return ItemNode(item)
+
+    def build(self, node):
+        if isinstance(node, ast.BinOp):
+            operator = BINARY_OPERATORS.get(type(node.op))
+            if operator is None:
+                raise ValueError('Unsupported operator {}'.format(
+                    type(node.op).__name__
+                ))
+            return BinaryNode(operator, self.build(node.left),
+                              self.build(node.right))
+        if isinstance(node, ast.UnaryOp) and \
+                isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self.build(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            return UnaryNode(np.negative, operand)
+        if isinstance(node, ast.Name):
+            return self.item_node(node.id)
+        if isinstance(node, ast.Call):
+            return self.build_call(node)
+        value = self.literal(node)
+        if isinstance(value, bool) or \
+                not isinstance(value, (int, float)):
+            raise ValueError('Unsupported value {!r}'.format(value))
+        return Constant(value)
+
+    def literal(self, node):
+        try:
+            return ast.literal_eval(node)
+        except ValueError:
+            raise ValueError('Unsupported expression {}'.format(
+                type(node).__name__
+            ))
+
+    def build_call(self, node):
+        name = getattr(node.func, 'id', None)
+        if name == 'item':
+            if len(node.args) != 1 or node.keywords:
+                raise ValueError('item() takes the name of an item')
+            return self.item_node(self.literal(node.args[0]))
+        if name not in FUNCTIONS:
+            raise ValueError('Unknown function {}, use one of: item, {}'.format(
+                name, ', '.join(sorted(FUNCTIONS))
+            ))
+        if not node.args:
+            raise ValueError('{}() needs a series argument'.format(name))
+        args = [self.build(node.args[0])]
+        args += [self.literal(arg) for arg in node.args[1:]]
+        kwargs = dict((keyword.arg, self.literal(keyword.value))
+                      for keyword in node.keywords)
+        try:
+            return FUNCTIONS[name](*args, **kwargs)
+        except TypeError as err:
+            raise ValueError('{}(): {}'.format(name, err))
+
+
+class DerivedSeries(object):
+    """
+    A parsed expression, with an LRU cache of evaluated windows
+    """
+    def __init__(self, expression, items, cache_size=16):
+        """
+        :param expression: str, see the module docstring
+        :param items: [DataItem], the items expression may refer to
+        :raises ValueError: if expression is invalid
+        """
+        self.expression = expression
+        self.root = ExpressionParser(items).parse(expression)
+        self.sources = self.root.items()
+        self.is_time = self.sources[0].slicer.is_time
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def _bound(self, value):
+        """:return: value as an index value comparable to the sources'"""
+        if not self.is_time:
+            return value
+        stamp = pd.Timestamp(value)
+        if stamp.tzinfo is not None:
+            stamp = stamp.tz_convert('UTC').tz_localize(None)
+        return stamp
+
+    def coarse(self, n_points=COARSE_N_POINTS):
+        """
+        Evaluate the full range from every step:th value of the sources, for
+        at most about n_points values per source
+
+        :return: pd.Series
+        """
+        longest = max(len(item.slicer) for item in self.sources)
+        step = max(longest // n_points, 1)
+        series = self.root.evaluate(None, None, step)
+        series.name = self.expression
+        return series
+
+    def evaluate(self):
+        """
+        Evaluate the full range from all values of the sources
+
+        :return: pd.Series
+        """
+        series = self.root.evaluate(None, None, 1)
+        series.name = self.expression
+        return series
+
+    def window(self, x0, x1):
+        """
+        :return: (index values, axis values, values) of the closed interval
+            [x0, x1], see IndexSlicer.slice and IndexSlicer.axis_slice
+        """
+        lo, hi = self._bound(x0), self._bound(x1)
+        # Appending to a source invalidates its windows
+        key = (lo, hi, tuple(len(item.slicer) for item in self.sources))
+        with self.lock:
+            window = self.cache.pop(key, None)
+        if window is None:
+            series = self.root.evaluate(lo, hi, 1)
+            index_values = np.asarray(series.index.values)
+            keys = index_keys(series.index)
+            dtype = index_values.dtype
+            i0 = np.searchsorted(keys, value_to_key(lo, dtype), side='left')
+            i1 = np.searchsorted(keys, value_to_key(hi, dtype), side='right')
+            index_values = index_values[i0:i1]
+            window = (index_values, axis_values(index_values),
+                      np.asarray(series.values[i0:i1], dtype=float))
+        with self.lock:
+            self.cache[key] = window  # Most recently used
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return window
+
+
+def _evaluated_per_window(name):
+    """:return: property failing for arrays of the full derived series"""
+    def fail(self):
+        raise NotImplementedError(
+            'The {} of a derived series are only evaluated per window, use '
+            'slice, axis_slice or window_arrays'.format(name)
+        )
+    return property(fail)
+
+
+class DerivedSlicer(IndexSlicer):
+    """
+    IndexSlicer of a DerivedSeries. Slices of windows are evaluated exactly,
+    and the arrays of the full series are not available: the coarse
+    evaluation is for the outline only.
+    """
+    keys = _evaluated_per_window('keys')
+    index_values = _evaluated_per_window('index values')
+    values = _evaluated_per_window('values')
+    axis_values = _evaluated_per_window('axis values')
+
+    def __init__(self, series, derived):
+        """
+        :param series: pd.Series, DerivedSeries.coarse()
+        :param derived: DerivedSeries
+        """
+        self.is_time = derived.is_time
+        self.index_dtype = series.index.values.dtype
+        self.derived = derived
+
+    def bounds(self, x0, x1, remember=True):
+        raise NotImplementedError('Derived series have no positions, use '
+                                  'slice, axis_slice or window_arrays')
+
+    def slice(self, x0, x1, remember=True):
+        index_values, _, values = self.derived.window(x0, x1)
+        return index_values, values
+
+    def axis_slice(self, x0, x1, remember=True):
+        _, x_values, values = self.derived.window(x0, x1)
+        return x_values, values
+
+    def window_arrays(self, x0, x1):
+        """
+        :return: see IndexSlicer.window_arrays, with arrays of the window
+            only as the values around it are not evaluated
+        """
+        index_values, x_values, values = self.derived.window(x0, x1)
+        keys = values_to_keys(index_values, index_values.dtype)
+        return keys, x_values, values, 0, len(values)
@@ -0,0 +1,202 @@
+"""
+Bulk export and import of the markings of many items to/from local files
+
+Two formats, chosen by file name:
+    *.csv, *.csv.gz
+        One row per marking: item, metadata (json), start, end, label, note
+    anything else
+        lz4-compressed stream of msgpack maps, one per item, holding the
+        marking columns as raw arrays (see MarkingStore)
+
+Files are written and read item by item (csv in chunks), so memory use is
+bounded by the largest item rather than the whole file.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import json
+import logging
+logger = logging.getLogger('xchg')
+
+import numpy as np
+import pandas as pd
+
+FORMAT_NAME = 'inspector-markings'
+FORMAT_VERSION = 1
+CSV_COLUMNS = ['item', 'metadata', 'start', 'end', 'label', 'note']
+CSV_CHUNKSIZE = 200000
+
+
+def is_csv(path):
+    return path.endswith('.csv') or path.endswith('.csv.gz')
+
+
+def _binary_modules():
+    try:
+        import msgpack
+        import lz4.frame
+    except ImportError:
+        logger.info('To exchange markings in binary format, '
+                    'install packages "msgpack" and "lz4"')
+        raise
+    return msgpack, lz4.frame
+
+
+def _metadata_json(metadata):
+    return json.dumps(metadata or {}, sort_keys=True, default=str)
+
+
+def item_record(item):
+    """
+    :return: dict with the markings of item as raw column bytes, for msgpack
+    """
+    store = item.markings
+    rows = store.rows
+    x_dtype = '<i8' if store.is_time else '<f8'
+    return {
+        'name': item.name,
+        'metadata': _metadata_json(item.metadata),
+        'is_time': store.is_time,
+        'start': rows['start'].astype(x_dtype).tobytes(),
+        'end': rows['end'].astype(x_dtype).tobytes(),
+        'labels': list(store.labels),
+        'label': rows['label'].astype('<i2').tobytes(),
+        'notes': list(store.notes),
+        'note': rows['note'].astype('<i4').tobytes(),
+    }
+
+
+def record_columns(record):
+    """
+    Inverse of item_record
+
+    :return: (starts, ends, labels, notes) arrays, starts and ends as
+        datetime64[ns] if the record is on a time axis
+    """
+    x_dtype = '<i8' if record['is_time'] else '<f8'
+    starts = np.frombuffer(record['start'], dtype=x_dtype)
+    ends = np.frombuffer(record['end'], dtype=x_dtype)
+    if record['is_time']:
+        starts = starts.astype(np.int64).view('datetime64[ns]')
+        ends = ends.astype(np.int64).view('datetime64[ns]')
+    label_codes = np.frombuffer(record['label'], dtype='<i2')
+    labels = np.array(record['labels'], dtype=object)[label_codes]
+    note_ids = np.frombuffer(record['note'], dtype='<i4')
+    notes = np.array(list(record['notes']) + [None], dtype=object)[note_ids]
+    return starts, ends, labels, notes
+
+
+def export_markings(path, items):
+    """
+    Write the markings of items to path
+
+    :param items: [DataItem]
+    :return: int, number of markings written
+    """
+    n_written = 0
+    if is_csv(path):
+        compression = 'gzip' if path.endswith('.gz') else None
+        header = True
+        for item in items:
+            frame = item.markings.to_frame()
+            if item.markings.is_time:
+                # Much faster than to_csv(date_format=...), which formats
+                # every value in python
+                for column in ['start', 'end']:
+                    frame[column] = np.datetime_as_string(
+                        frame[column].values, unit='ns'
+                    )
+            frame.insert(0, 'metadata', _metadata_json(item.metadata))
+            frame.insert(0, 'item', item.name)
+            frame.to_csv(path, mode='w' if header else 'a', header=header,
+                         index=False, compression=compression)
+            header = False
+            n_written += len(frame)
+        if header:  # No items, write an empty file with a header
+            pd.DataFrame(columns=CSV_COLUMNS).to_csv(path, index=False)
+    else:
+        msgpack, lz4_frame = _binary_modules()
+        packer = msgpack.Packer(use_bin_type=True)
+        with lz4_frame.open(path, 'wb') as fh:
+            fh.write(packer.pack({'format': FORMAT_NAME,
+                                  'version': FORMAT_VERSION}))
+            for item in items:
+                fh.write(packer.pack(item_record(item)))
+                n_written += len(item.markings)
+    logger.info('Exported {} markings of {} items to {}'.format(
+        n_written, len(items), path
+    ))
+    return n_written
+
+
+def iter_records(path):
+    """
+    Read markings file at path item by item
+
+    :return: iterator of (name, metadata dict, (starts, ends, labels, notes))
+        where starts and ends are datetime64[ns] arrays in binary files and
+        strings or numbers in csv files
+    """
+    if is_csv(path):
+        chunks = pd.read_csv(path, chunksize=CSV_CHUNKSIZE,
+                             dtype={'item': object, 'metadata': object,
+                                    'label': object, 'note': object})
+        for chunk in chunks:
+            for (name, metadata), group in chunk.groupby(['item', 'metadata'],
+                                                         sort=False):
+                notes = group['note'].values.astype(object)
+                notes[pd.isnull(notes)] = None
+                yield name, json.loads(metadata), (
+                    group['start'].values,
+                    group['end'].values,
+                    group['label'].values,
+                    notes,
+                )
+    else:
+        msgpack, lz4_frame = _binary_modules()
+        with lz4_frame.open(path, 'rb') as fh:
+            unpacker = msgpack.Unpacker(fh, raw=False)
+            header = next(unpacker, None)
+            if not isinstance(header, dict) or \
+                    header.get('format') != FORMAT_NAME:
+                raise ValueError('{} is not a markings file'.format(path))
+            for record in unpacker:
+                yield (record['name'], json.loads(record['metadata']),
+                       record_columns(record))
+
+
+def import_markings(path, model, only_visible=False):
+    """
+    Add the markings in the file at path to the matching items in model,
+    through the bulk Model.add_markings. Items are matched on metadata, or on
+    name for items without metadata.
+
+    :param model: Model
+    :return: int, number of markings added
+    """
+    n_added = 0
+    n_unmatched = 0
+    for name, metadata, columns in iter_records(path):
+        items = model.matching_items(name, metadata,
+                                     only_visible=only_visible)
+        if not items:
+            n_unmatched += len(columns[0])
+            continue
+        starts, ends, labels, notes = columns
+        for item in items:
+            item_starts, item_ends = starts, ends
+            try:
+                if not item.markings.is_time:
+                    # csv columns shared with time markings are strings
+                    item_starts = np.asarray(starts, dtype=np.float64)
+                    item_ends = np.asarray(ends, dtype=np.float64)
+                n_added += len(model.add_markings(item, item_starts, item_ends,
+                                                  labels, notes))
+            except (ValueError, TypeError) as err:
+                logger.warning('Skipping markings for item {} of another '
+                               'x-axis type: {}'.format(item.name, err))
+    if n_unmatched:
+        logger.warning('{} markings in {} matched no item'.format(
+            n_unmatched, path
+        ))
+    logger.info('Imported {} markings from {}'.format(n_added, path))
+    return n_added
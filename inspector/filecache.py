@@ -0,0 +1,218 @@
+"""
+On-disk cache of decoded data files, so that opening the same file again
+skips decoding
+
+Entries are content-addressed by the sha1 of the file, and hold the index and
+value arrays of every series decoded from the file, plus its outline (the
+resampled series shown in the outline view), as .npy files that are
+memory-mapped on load. A small stat file per (path, size, mtime) maps to the
+content hash, so unchanged files are not even hashed again.
+
+The cache is evicted, least recently used entries first, down to a size
+budget after every store.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+logger = logging.getLogger('fcch')
+
+from timeit import default_timer
+
+import numpy as np
+
+from inspector.paths import user_cache_dir
+from inspector.session import arrays_series, series_arrays
+
+CACHE_VERSION = 1
+DEFAULT_BUDGET_MB = 2048
+META_FILE = 'meta.json'
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """:return: str, sha1 hex digest of the contents of the file at path"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stat_key(path):
+    """:return: str, identifying path together with its size and mtime"""
+    stat = os.stat(path)
+    text = '{}|{}|{!r}'.format(os.path.abspath(path), stat.st_size,
+                               stat.st_mtime)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def open_decoded_cache():
+    """
+    :return: DecodedFileCache with the budget in megabytes given by the
+        environment variable INSPECTOR_FILE_CACHE_MB, or None if that is 0
+    """
+    budget_mb = float(os.environ.get('INSPECTOR_FILE_CACHE_MB',
+                                     DEFAULT_BUDGET_MB))
+    if budget_mb <= 0:
+        return None
+    try:
+        return DecodedFileCache(budget_bytes=int(budget_mb * 1e6))
+    except (IOError, OSError) as err:
+        logger.warning('Not caching decoded files: {}'.format(err))
+        return None
+
+
+class DecodedFileCache(object):
+    """
+    Directory of decoded files, see the module docstring
+    """
+    def __init__(self, directory=None, budget_bytes=DEFAULT_BUDGET_MB * 10**6):
+        """
+        :param directory: str | None, defaults to a directory in
+            paths.user_cache_dir
+        :param budget_bytes: int, total size of entries kept
+        """
+        self.directory = directory or user_cache_dir('decoded')
+        self.stat_dir = os.path.join(self.directory, 'stat')
+        for path in [self.directory, self.stat_dir]:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self.budget_bytes = budget_bytes
+
+    def _entry_dir(self, digest):
+        return os.path.join(self.directory,
+                            'v{}-{}'.format(CACHE_VERSION, digest))
+
+    def digest(self, path):
+        """
+        :return: str, content hash of the file at path, looked up by size and
+            mtime if the file was hashed before
+        """
+        stat_path = os.path.join(self.stat_dir, stat_key(path))
+        try:
+            with open(stat_path) as fh:
+                return fh.read().strip()
+        except (IOError, OSError):
+            pass
+        digest = file_digest(path)
+        with open(stat_path, 'w') as fh:
+            fh.write(digest)
+        return digest
+
+    def get(self, path):
+        """
+        :return: [(pd.Series, outline pd.Series | None)] memory-mapped, or
+            None if path is not cached
+        """
+        try:
+            entry_dir = self._entry_dir(self.digest(path))
+            with open(os.path.join(entry_dir, META_FILE)) as fh:
+                meta = json.load(fh)
+        except (IOError, OSError, ValueError):
+            return None
+        load = lambda name: np.load(os.path.join(entry_dir, name),
+                                    mmap_mode='c')
+        seria = []
+        for desc in meta['series']:
+            series = arrays_series(load(desc['index']), load(desc['values']),
+                                   tz=desc['tz'], name=desc['name'])
+            outline = None
+            if desc.get('outline_index'):
+                outline = arrays_series(load(desc['outline_index']),
+                                        load(desc['outline_values']),
+                                        tz=desc['tz'], name=desc['name'])
+            seria.append((series, outline))
+        # Modification time of the meta file is the last use, for eviction
+        os.utime(os.path.join(entry_dir, META_FILE), None)
+        logger.debug('Loaded {} series of {} from cache'.format(len(seria),
+                                                                path))
+        return seria
+
+    def put(self, path, seria, outlines=None):
+        """
+        Store the series decoded from the file at path
+
+        :param seria: [pd.Series]
+        :param outlines: [pd.Series | None] | None, outline of each series
+        :return: bool, stored
+        """
+        start_time = default_timer()
+        digest = self.digest(path)
+        entry_dir = self._entry_dir(digest)
+        if os.path.isdir(entry_dir):
+            return True
+        tmp_dir = '{}.{}.tmp'.format(entry_dir, os.getpid())
+        os.makedirs(tmp_dir)
+        try:
+            descs = []
+            size = 0
+            for i, (series, outline) in enumerate(zip(
+                    seria, outlines or [None] * len(seria))):
+                desc = {'name': str(series.name)}
+                arrays = series_arrays(series)
+                desc['tz'] = arrays[2]
+                to_save = [('index', arrays[0]), ('values', arrays[1])]
+                if outline is not None:
+                    outline_arrays = series_arrays(outline)
+                    to_save += [('outline_index', outline_arrays[0]),
+                                ('outline_values', outline_arrays[1])]
+                for field, array in to_save:
+                    desc[field] = 'series{}.{}.npy'.format(i, field)
+                    np.save(os.path.join(tmp_dir, desc[field]), array)
+                    size += array.nbytes
+                descs.append(desc)
+            with open(os.path.join(tmp_dir, META_FILE), 'w') as fh:
+                json.dump({'source': os.path.abspath(path), 'size': size,
+                           'series': descs}, fh)
+            os.rename(tmp_dir, entry_dir)
+        except (ValueError, IOError, OSError) as err:
+            logger.warning('Could not cache {}: {}'.format(path, err))
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        logger.debug('Cached {} ({:.1f} MB) in {:.3f} s'.format(
+            path, size / 1e6, default_timer() - start_time
+        ))
+        self.evict()
+        return True
+
+    def entries(self):
+        """:return: [(last use, size in bytes, entry directory)]"""
+        entries = []
+        for name in os.listdir(self.directory):
+            meta_path = os.path.join(self.directory, name, META_FILE)
+            try:
+                with open(meta_path) as fh:
+                    size = json.load(fh)['size']
+                entries.append((os.path.getmtime(meta_path), size,
+                                os.path.join(self.directory, name)))
+            except (IOError, OSError, ValueError, KeyError):
+                continue
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until within the budget"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        n_evicted = 0
+        while entries and total > self.budget_bytes:
+            _, size, entry_dir = entries.pop(0)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            n_evicted += 1
+            logger.debug('Evicted {} from cache'.format(entry_dir))
+        if n_evicted:
+            self._remove_stale_stat_files()
+
+    def _remove_stale_stat_files(self):
+        for name in os.listdir(self.stat_dir):
+            stat_path = os.path.join(self.stat_dir, name)
+            try:
+                with open(stat_path) as fh:
+                    digest = fh.read().strip()
+                if not os.path.isdir(self._entry_dir(digest)):
+                    os.remove(stat_path)
+            except (IOError, OSError):
+                continue
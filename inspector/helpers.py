@@ -1,8 +1,15 @@
 from __future__ import print_function, division, unicode_literals
 
 import os
+import re
 import logging
+import pstats
+from datetime import datetime
 from functools import wraps
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
 from matplotlib.backends.qt_compat import QtWidgets, QtCore, QtGui, is_pyqt5
 if is_pyqt5():
@@ -12,6 +19,8 @@ else:
 
 import cProfile
 
+from inspector.tracing import slot_metrics, callable_name, fit_arguments
+
 
 def profileit(name):
     def inner(func):
@@ -25,6 +34,76 @@ def profileit(name):
     return inner
 
 
+def profile_summary(profile, top_n=30, sort_by='cumulative'):
+    """
+    :param profile: cProfile.Profile
+    :return: str, the top_n entries of the stats sorted by sort_by
+    """
+    stream = StringIO()
+    stats = pstats.Stats(profile, stream=stream)
+    stats.strip_dirs().sort_stats(sort_by).print_stats(top_n)
+    return stream.getvalue()
+
+
+class ActionProfiler(QtCore.QObject):
+    """
+    When armed, runs the next call of any wrapped callback (menu, plugin and
+    CLI actions) under cProfile, saves the stats with a timestamped name and
+    emits sig_profile_saved(action name, path, top-N cumulative summary).
+    """
+    sig_profile_saved = pyqtSignal(object, object, object)
+
+    def __init__(self, output_dir=None, top_n=30):
+        super(ActionProfiler, self).__init__()
+        self.armed = False
+        self.output_dir = output_dir or \
+                os.environ.get('INSPECTOR_PROFILE_DIR', os.getcwd())
+        self.top_n = top_n
+
+    def arm(self, armed=True):
+        self.armed = bool(armed)
+        logging.info('Profiling of next action %s',
+                     'armed' if self.armed else 'disarmed')
+
+    def profile_path(self, name):
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', name).strip('-').lower()
+        return os.path.join(
+            self.output_dir,
+            datetime.now().strftime(
+                'inspector-profile-{}-%Y%m%d-%H%M%S.prof'.format(slug)
+            )
+        )
+
+    def wrap(self, func, name):
+        """
+        :return: func wrapped to be profiled when armed, or func itself if
+            its signature is unknown (see fit_arguments)
+        """
+        call = fit_arguments(func)
+        if call is None:
+            return func
+
+        @wraps(func)
+        def maybe_profiled(*args, **kwargs):
+            if not self.armed:
+                return call(*args, **kwargs)
+            self.armed = False
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(call, *args, **kwargs)
+            finally:
+                path = self.profile_path(name)
+                profile.dump_stats(path)
+                logging.info('Saved profile of "%s" to %s', name, path)
+                self.sig_profile_saved.emit(
+                    name, path, profile_summary(profile, self.top_n)
+                )
+        return maybe_profiled
+
+
+action_profiler = ActionProfiler()
+
+
 def print_out(text):
     """Function that currently just wraps print"""
     logging.info(text)
@@ -42,9 +121,38 @@ def debug_decorator(fcn, msg):
     return debug_logged
 
 
+def signal_name(signal):
+    """Name of a bound signal, e.g. 'sig_item_added'"""
+    signature = getattr(signal, 'signal', None)  # e.g. '2sig_item_added(...)'
+    if not signature:
+        return repr(signal)
+    return str(signature).lstrip('0123456789').split('(')[0]
+
+
+def instrument_slot(slot, signal_name, debug_msg=None):
+    """
+    Wrap a slot, before connecting it, with the opt-in instrumentation:
+    debug logging (PYDEBUG) and per-slot metrics (INSPECTOR_SLOT_METRICS)
+    """
+    if not debug_msg:
+        debug_msg = callable_name(slot)
+    slot = slot_metrics.instrument(slot, signal_name)
+    if os.environ.get('PYDEBUG', None):
+        fitted = fit_arguments(slot)
+        if fitted is not None:
+            slot = debug_decorator(fitted, debug_msg)
+    return slot
+
+
 def create_action(text, parent, tip=None, shortcut=None, icon=None,
                   connect=None, connect_bool=None, add_to=None,
-                  checkable=False):
+                  checkable=False, profile=True):
+    """
+    Create a QAction and connect its triggered signal to the callbacks
+
+    :param profile: bool, let `action_profiler` profile the callbacks when
+        armed ("Profile next action")
+    """
     action = QtWidgets.QAction(text, parent, checkable=checkable)
     if icon:
         action.setIcon(icon)
@@ -63,8 +171,10 @@ def create_action(text, parent, tip=None, shortcut=None, icon=None,
     if connect_bool:
         slots = (connect_bool if isinstance(connect, (list, tuple))
                               else [connect_bool])
-        if os.environ.get('PYDEBUG', None):
-            slots = [debug_decorator(cb, 'Triggered: ' + text) for cb in slots]
+        if profile:
+            slots = [action_profiler.wrap(cb, text) for cb in slots]
+        slots = [instrument_slot(cb, 'action: ' + text, 'Triggered: ' + text)
+                 for cb in slots]
         # Slots must/should take single bool
         for slot in slots:
             action.triggered[bool].connect(slot)
@@ -72,8 +182,10 @@ def create_action(text, parent, tip=None, shortcut=None, icon=None,
     if connect:
         slots = (connect if isinstance(connect, (list, tuple))
                          else [connect])
-        if os.environ.get('PYDEBUG', None):
-            slots = [debug_decorator(cb, 'Triggered: ' + text) for cb in slots]
+        if profile:
+            slots = [action_profiler.wrap(cb, text) for cb in slots]
+        slots = [instrument_slot(cb, 'action: ' + text, 'Triggered: ' + text)
+                 for cb in slots]
         # Slots must/should take no arguments
         for slot in slots:
             if is_pyqt5():
@@ -0,0 +1,321 @@
+"""
+Append-only journal of marking changes, for cheap crash-safe persistence of
+markings between explicit saves
+
+The journal is a file with one json object per line:
+    {"op": "add", "item": key, "name": str, "metadata": {}, "is_time": bool,
+     "keys": [str], "start": [x], "end": [x], "label": [str],
+     "note": [str | null]}
+    {"op": "remove", "keys": [str]}
+    {"op": "label", "keys": [str], "label": str}
+
+Markings are identified by keys '<session>:<marking id>', as marking ids are
+only unique within one process. x-values are int nanoseconds on a time axis,
+else floats. Items are identified by their metadata, or if they have none by
+their name together with the file they were loaded from (if any), so that
+markings don't replay onto same-named columns of other files.
+
+Every entry is flushed to the OS when written, fsync is batched to at most one
+per `sync_interval` seconds. The file is compacted (rewritten with one "add"
+entry per item) when opened and whenever it has grown to many more entries
+than items.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import os
+import json
+import uuid
+import logging
+logger = logging.getLogger('jrnl')
+
+from collections import OrderedDict
+from timeit import default_timer
+
+import numpy as np
+
+DEFAULT_SYNC_INTERVAL = 2.0
+COMPACT_MIN_ENTRIES = 1000
+
+
+def item_key(item):
+    """
+    :param item: DataItem
+    :return: str identifying item across sessions
+    """
+    if item.metadata:
+        return 'metadata:' + json.dumps(item.metadata, sort_keys=True,
+                                        default=str)
+    if item.source:
+        return 'source:' + json.dumps([os.path.abspath(item.source),
+                                       item.name])
+    return 'name:' + item.name
+
+
+def open_journal(journal=None):
+    """
+    :param journal: MarkingJournal | str (path) | None
+        If None, the path in the environment variable INSPECTOR_JOURNAL is
+        used if set, with the sync interval in INSPECTOR_JOURNAL_SYNC.
+    :return: MarkingJournal | None
+    """
+    if journal is None:
+        journal = os.environ.get('INSPECTOR_JOURNAL') or None
+        if journal is None:
+            return None
+        sync_interval = float(os.environ.get('INSPECTOR_JOURNAL_SYNC',
+                                             DEFAULT_SYNC_INTERVAL))
+        return MarkingJournal(journal, sync_interval=sync_interval)
+    if isinstance(journal, MarkingJournal):
+        return journal
+    return MarkingJournal(journal)
+
+
+class MarkingJournal(object):
+    """
+    Journal file together with the markings it describes, kept in memory
+    for replaying onto items loaded later and for compaction
+    """
+    def __init__(self, path, sync_interval=DEFAULT_SYNC_INTERVAL,
+                 compact_min_entries=COMPACT_MIN_ENTRIES):
+        """
+        :param path: str, journal file, created if missing
+        :param sync_interval: float, seconds between fsyncs
+        :param compact_min_entries: int, never compact smaller journals
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.compact_min_entries = compact_min_entries
+        self.session = uuid.uuid4().hex[:12]
+        # item key -> {'name', 'metadata', 'is_time',
+        #              'markings': {marking key: [start, end, label, note]}}
+        self.items = OrderedDict()
+        self._item_of = {}  # marking key -> item key
+        self._keys = {}  # marking id -> marking key, for replayed markings
+        self.n_entries = 0
+        # Incremented on compaction, which invalidates file offsets
+        self.generation = 0
+        self._fh = None
+        self._unsynced = False
+        self.last_sync = default_timer()
+        if os.path.exists(path):
+            self._read()
+        self.compact(force=self.n_entries > 0)
+
+    # Reading
+
+    def _read(self):
+        n_bad = 0
+        with open(self.path) as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line after a crash
+                    n_bad += 1
+                    continue
+                self._apply(entry)
+                self.n_entries += 1
+        if n_bad:
+            logger.warning('Skipped {} unreadable entries in journal {}'
+                           ''.format(n_bad, self.path))
+        logger.info('Read {} entries for {} items from journal {}'.format(
+            self.n_entries, len(self.items), self.path
+        ))
+
+    def _apply(self, entry):
+        """Apply a journal entry to the in-memory state"""
+        op = entry['op']
+        if op == 'add':
+            key = entry['item']
+            state = self.items.get(key)
+            if state is None:
+                state = self.items[key] = {
+                    'name': entry['name'],
+                    'metadata': entry['metadata'],
+                    'is_time': entry['is_time'],
+                    'markings': OrderedDict(),
+                }
+            markings = state['markings']
+            for marking_key, values in zip(entry['keys'], zip(
+                    entry['start'], entry['end'], entry['label'],
+                    entry['note'])):
+                markings[marking_key] = list(values)
+                self._item_of[marking_key] = key
+        elif op == 'remove':
+            for marking_key in entry['keys']:
+                key = self._item_of.pop(marking_key, None)
+                if key is not None:
+                    self.items[key]['markings'].pop(marking_key, None)
+        elif op == 'label':
+            for marking_key in entry['keys']:
+                key = self._item_of.get(marking_key)
+                if key is not None:
+                    self.items[key]['markings'][marking_key][2] = \
+                        entry['label']
+        else:
+            logger.warning('Unknown journal entry {!r}'.format(op))
+
+    def entries_since(self, offset=0):
+        """
+        Journal entries written after offset, e.g. for a storage plugin
+        shipping the journal in segments. Offsets are only valid within a
+        generation.
+
+        :param offset: int, file offset returned by a previous call
+        :return: ([dict] entries, int offset of the end of the entries)
+        """
+        self.flush()
+        entries = []
+        if not os.path.exists(self.path):
+            return entries, offset
+        with open(self.path, 'rb') as fh:
+            fh.seek(offset)
+            for line in fh:
+                if not line.endswith(b'\n'):
+                    break  # Being written
+                entries.append(json.loads(line.decode('utf-8')))
+                offset += len(line)
+        return entries, offset
+
+    # Writing
+
+    def _write(self, entry):
+        self._apply(entry)
+        if self._fh is None:
+            self._fh = open(self.path, 'a')
+        self._fh.write(json.dumps(entry) + '\n')
+        self._fh.flush()
+        self.n_entries += 1
+        self._unsynced = True
+        if default_timer() - self.last_sync >= self.sync_interval:
+            self.sync()
+        if self.n_entries > self.compact_min_entries:
+            self.compact()
+
+    def flush(self):
+        if self._fh is not None:
+            self._fh.flush()
+
+    def sync(self):
+        """fsync any entries written since the last sync"""
+        if self._fh is not None and self._unsynced:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        self._unsynced = False
+        self.last_sync = default_timer()
+
+    def close(self):
+        if self._fh is not None:
+            self.sync()
+            self._fh.close()
+            self._fh = None
+
+    def key(self, marking_id):
+        """:return: str, journal key of marking_id in this session"""
+        key = self._keys.get(marking_id)
+        if key is None:
+            return '{}:{}'.format(self.session, marking_id)
+        return key
+
+    def record_added(self, item, ids):
+        """
+        :param item: DataItem
+        :param ids: ids of markings just added to item.markings
+        """
+        if not len(ids):
+            return
+        store = item.markings
+        rows = store.rows
+        rows = rows[np.searchsorted(rows['id'], ids)]
+        notes = store.notes + [None]
+        self._write({
+            'op': 'add',
+            'item': item_key(item),
+            'name': item.name,
+            'metadata': item.metadata,
+            'is_time': store.is_time,
+            'keys': [self.key(marking_id) for marking_id in ids],
+            'start': rows['start'].tolist(),
+            'end': rows['end'].tolist(),
+            'label': [store.labels[code] for code in rows['label']],
+            'note': [notes[note_id] for note_id in rows['note']],
+        })
+
+    def record_removed(self, markings):
+        """:param markings: [Marking]"""
+        if markings:
+            self._write({'op': 'remove',
+                         'keys': [self.key(m.id) for m in markings]})
+
+    def record_relabeled(self, marking):
+        """:param marking: Marking, with its new label"""
+        self._write({'op': 'label', 'keys': [self.key(marking.id)],
+                     'label': marking.label})
+
+    # Replay
+
+    def journaled_markings(self, item):
+        """
+        Markings journaled for an item like item, e.g. in an earlier session
+
+        :param item: DataItem
+        :return: ([marking key], (starts, ends, labels, notes)) with starts
+            and ends as stored by the MarkingStore of item
+        """
+        state = self.items.get(item_key(item))
+        if state is None or not state['markings'] or \
+                state['is_time'] != item.markings.is_time:
+            return [], None
+        keys = list(state['markings'])
+        starts, ends, labels, notes = zip(*state['markings'].values())
+        if state['is_time']:
+            starts = np.array(starts, dtype=np.int64).view('datetime64[ns]')
+            ends = np.array(ends, dtype=np.int64).view('datetime64[ns]')
+        return keys, (starts, ends, labels, notes)
+
+    def bind(self, ids, keys):
+        """
+        Identify markings replayed with new ids by their journaled keys
+        """
+        for marking_id, key in zip(ids, keys):
+            self._keys[int(marking_id)] = key
+
+    # Compaction
+
+    def compact(self, force=False):
+        """
+        Rewrite the journal with one "add" entry per item holding its live
+        markings, replacing the file atomically
+        """
+        if not force and self.n_entries <= 2 * len(self.items):
+            return
+        start_time = default_timer()
+        self.close()
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        n_entries = 0
+        with open(tmp_path, 'w') as fh:
+            for key, state in self.items.items():
+                if not state['markings']:
+                    continue
+                starts, ends, labels, notes = zip(*state['markings'].values())
+                fh.write(json.dumps({
+                    'op': 'add', 'item': key, 'name': state['name'],
+                    'metadata': state['metadata'],
+                    'is_time': state['is_time'],
+                    'keys': list(state['markings']), 'start': starts,
+                    'end': ends, 'label': labels, 'note': notes,
+                }) + '\n')
+                n_entries += 1
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.rename(tmp_path, self.path)
+        logger.debug('Compacted journal {} from {} to {} entries in {:.3f} s'
+                     ''.format(self.path, self.n_entries, n_entries,
+                               default_timer() - start_time))
+        self.items = OrderedDict(
+            (key, state) for key, state in self.items.items()
+            if state['markings']
+        )
+        self.n_entries = n_entries
+        self.generation += 1
+        self.last_sync = default_timer()
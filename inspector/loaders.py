@@ -0,0 +1,101 @@
+"""
+Decoding of data files into pandas Series, shared by the GUI (View.load_file)
+and the headless tools. Does not depend on Qt.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import os
+import gzip
+import pickle  # Could use cPickle if python2
+import logging
+logger = logging.getLogger('load')
+
+from operator import itemgetter
+
+import pandas as pd
+
+
+def msgpack_lz4_to_series(data):
+    try:
+        import msgpack
+        import lz4
+    except ImportError:
+        logging.info('To load lz4-msgpacked data, '
+                     'install packages "python-msgpack" and "lz4"')
+        raise
+    content = msgpack.loads(lz4.decompress(data))
+    series_load = lambda d: pd.Series(
+        data=d['values'],
+        index=d['index'] if d['index'][-1] <= 1e9 \
+                         else pd.DatetimeIndex(d['index']),
+        name=d['id']
+    )
+    seria = list(map(series_load, content))
+
+    return seria
+
+
+def load_methods():
+    """Deserializers tried in order by `decode_bytes`"""
+    methods = [msgpack_lz4_to_series]
+    if hasattr(pd, 'read_msgpack'):  # Removed in later pandas versions
+        methods.append(pd.read_msgpack)
+    methods.append(pickle.loads)
+    return methods
+
+
+def read_file(path):
+    """
+    :return: bytes, contents of the (possibly gzipped) file
+    """
+    open_ = gzip.open if path.endswith('.gz') else open
+    with open_(path, 'rb') as fh:
+        return fh.read()
+
+
+def decode_bytes(bytestring, data_source=''):
+    """
+    Deserialize contents with the first of `load_methods` that succeeds
+
+    :param bytestring: bytes
+    :param data_source: str, used for naming unnamed series and for logging
+    :return: [pd.Series] | None
+    """
+    methods = load_methods()
+    seria = None
+    for loader in methods:
+        try:
+            loaded = loader(bytestring)
+        except Exception:
+            continue
+        if isinstance(loaded, pd.Series):
+            seria = [loaded]
+        elif isinstance(loaded, pd.DataFrame):
+            seria = list(map(itemgetter(1), loaded.items()))
+        elif isinstance(loaded, list):
+            seria = loaded
+        else:
+            logger.error('Unexpected object found: {:.30}... (using '
+                         'deserializer {})'.format(str(loaded), loader))
+            return None
+        break
+    if seria is None:
+        logger.error('Could not deserialize contents of {} with any of {}'
+                     ''.format(data_source, methods))
+        return None
+
+    for idx, series in enumerate(seria):
+        if not series.name:
+            if os.path.exists(data_source):
+                prefix = os.path.split(data_source)[1]
+            else:
+                prefix = data_source
+            series.name = '{}_{}'.format(prefix, idx)
+    return seria
+
+
+def load_file(path):
+    """
+    :return: [pd.Series] | None
+    """
+    return decode_bytes(read_file(path), data_source=path)
@@ -4,6 +4,7 @@ from __future__ import print_function, division, unicode_literals
 import sys
 import os
 import logging
+import importlib
 logger = logging.getLogger('main')
 
 import numpy as np
@@ -11,29 +12,13 @@ import pandas as pd
 
 from datetime import datetime
 
-from inspector.model import Model
-from inspector.view import View
+# NOTE: Qt, matplotlib backends, the model and the view are imported when an
+#       Inspector is created rather than here, so that `import inspector` stays
+#       cheap (e.g. for tools that never open a window).
 
 # import sip
 # sip.setapi('QVariant', 2)
 
-from matplotlib.backends.qt_compat import QtWidgets, QtGui, is_pyqt5
-
-
-# ==============================================================================
-# Monkey-patch pandas.tools.plotting._get_xlim to avoid IndexError
-# ==============================================================================
-def _get_xlim(lines):
-    left, right = np.inf, -np.inf
-    for l in lines:
-        x = l.get_xdata(orig=False)
-        left = min(x[0] if len(x) else left, left)
-        right = max(x[-1] if len(x) else right, right)
-    return left, right
-
-from pandas import tools
-tools.plotting._get_xlim = _get_xlim
-
 
 def get_ipython_if_any():
     try:
@@ -58,7 +43,10 @@ class Inspector(object):
             If not run in an interactive prompt, set this to False. Used for
             configuring inputhook under ipython.
         """
-        global QtGui
+        from matplotlib.backends.qt_compat import QtWidgets, QtGui, is_pyqt5
+        from inspector.model import Model
+        from inspector.view import View
+
         logging.basicConfig(
             level=loglevel,
             format="%(asctime)s %(levelname)-8s [%(name)s] : %(message)s"
@@ -90,6 +78,17 @@ class Inspector(object):
         """
         self.view.load_seria(series_container, name=name)
 
+    def add_derived_series(self, expression, name=None):
+        """
+        Add a series computed from the loaded ones, e.g.
+        "mains - (kitchen + heating)", see inspector.derived
+
+        :param expression: str
+        :param name: str | None, defaults to expression
+        :raises ValueError: if expression is invalid
+        """
+        return self.model.add_derived_item(expression, name=name)
+
 
 def example_series(datetimeindex=True):
     x = np.arange(1000, 49005.0, 1)
@@ -110,7 +109,18 @@ def quicktest():
     return inspector
 
 
+# `inspector <command> ...` runs these modules' main(argv) without a window
+HEADLESS_COMMANDS = {
+    'batch': 'inspector.batch',
+    'render': 'inspector.render',
+}
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in HEADLESS_COMMANDS:
+        # Qt is never imported
+        command = importlib.import_module(HEADLESS_COMMANDS[sys.argv[1]])
+        sys.exit(command.main(sys.argv[2:]))
     loglvl = logging.DEBUG if os.environ.get('PYDEBUG', None) else logging.INFO
     inspector = Inspector(call_exec=True, loglevel=loglvl, interactive=False)
     return inspector
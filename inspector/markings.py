@@ -0,0 +1,473 @@
+"""
+Markings and marking logic that only need pandas/numpy, usable without a
+window (e.g. by `inspector batch`) as well as from the model and plugins.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import logging
+logger = logging.getLogger('mark')
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pandas.tseries.frequencies import to_offset
+
+from inspector.constants import LABEL_COLOR_MAP
+
+
+def gap_markings(series, label, gap_limit='20s'):
+    """
+    Mark every gap between consecutive samples longer than gap_limit
+
+    :param series: pd.Series with a sorted index
+    :param label: str, one of LABEL_COLOR_MAP
+    :param gap_limit: str (freqstr) for a DatetimeIndex, number otherwise
+    :return: [dict] with keys 'start', 'end', 'label' and 'note'
+    """
+    if label not in LABEL_COLOR_MAP:
+        raise ValueError('Bad label {}'.format(label))
+    index = series.index
+    if isinstance(index, pd.DatetimeIndex):
+        gap_delta = np.timedelta64(to_offset(gap_limit).nanos, 'ns')
+    else:
+        gap_delta = float(gap_limit)
+
+    gap_indices = np.flatnonzero(np.diff(index.values) > gap_delta)
+    starts = index[gap_indices]
+    ends = index[gap_indices + 1]
+    if isinstance(index, pd.DatetimeIndex):
+        starts, ends = starts.to_pydatetime(), ends.to_pydatetime()
+    return [
+        {'start': start, 'end': end, 'label': label, 'note': None}
+        for start, end in zip(starts, ends)
+    ]
+
+
+def marking_to_json(marking):
+    """
+    :param marking: dict with keys 'start', 'end', 'label' and 'note'
+    :return: dict, json serializable (datetimes as ISO 8601 strings)
+    """
+    def value(x):
+        if isinstance(x, datetime):
+            return x.isoformat()
+        elif isinstance(x, np.generic):
+            return x.item()
+        return x
+    return dict((key, value(x)) for key, x in marking.items())
+
+
+FIELDS = ('start', 'end', 'label', 'note')
+
+class _IdSource(object):
+    """
+    Marking ids, unique across all stores so that a marking keeps its
+    identity (and hash) when it is removed from its store
+    """
+    def __init__(self):
+        self.next_id = 1
+
+    def take(self, n=1):
+        """:return: int, the first of n consecutive new ids"""
+        first = self.next_id
+        self.next_id += n
+        return first
+
+
+_marking_ids = _IdSource()
+
+
+def _field_property(index, name):
+    def getter(self):
+        if self._store is None:
+            return self._values[index]
+        return self._store.get_field(self.id, name)
+
+    def setter(self, value):
+        if self._store is None:
+            self._values[index] = value
+        else:
+            self._store.set_field(self.id, name, value)
+    return property(getter, setter)
+
+
+class Marking(object):
+    """
+    Lightweight class for storing information about a labeled time interval
+
+    Once added to a MarkingStore the values live in the store, and Marking
+    objects are views of a row, created on access. Markings compare and hash
+    by id, so any view of the same row can be used e.g. as a dict key.
+    """
+    __slots__ = ('id', '_store', '_values')
+
+    def __init__(self, start, end, label, note=None):
+        """
+        :param start: datetime | float
+        :param end: datetime | float
+        :param label: str
+        :param note: str | None
+        """
+        self.id = _marking_ids.take()
+        self._store = None
+        self._values = [start, end, label, note]
+
+    @classmethod
+    def view(cls, store, marking_id):
+        marking = cls.__new__(cls)
+        marking.id = marking_id
+        marking._store = store
+        marking._values = None
+        return marking
+
+    start = _field_property(0, 'start')
+    end = _field_property(1, 'end')
+    label = _field_property(2, 'label')
+    note = _field_property(3, 'note')
+
+    def __eq__(self, other):
+        return isinstance(other, Marking) and other.id == self.id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return 'Marking({!r}, {!r}, {!r}, note={!r})'.format(
+            self.start, self.end, self.label, self.note
+        )
+
+    def to_json(self):
+        attrs = ['start', 'end', 'label', 'note']
+        return dict([(attr, str(getattr(self, attr))) for attr in attrs])
+
+
+class MarkingStore(object):
+    """
+    Columnar storage of the markings of one item: a structured numpy array
+    with a row (id, start, end, label code, note id) per marking, in id
+    order. Labels and notes are interned.
+
+    Starts and ends are stored as int64 nanoseconds if the item has a
+    datetime index, else as float64. Marking objects are only created when
+    iterating or indexing.
+
+    Removed rows move to a second array, in order of removal, so that any
+    view of a removed marking stays readable (see `removed`). It holds the
+    same rows as the deleted markings kept for saving, in a compact form.
+    """
+    def __init__(self, is_time):
+        """
+        :param is_time: bool, markings are on a datetime axis
+        """
+        self.is_time = is_time
+        self.dtype = np.dtype([
+            ('id', np.int64),
+            ('start', np.int64 if is_time else np.float64),
+            ('end', np.int64 if is_time else np.float64),
+            ('label', np.int16),
+            ('note', np.int32),  # -1 for None
+        ])
+        self._rows = np.zeros(16, dtype=self.dtype)
+        self._n = 0
+        self.labels = []
+        self._label_codes = {}
+        self.notes = []
+        self._note_ids = {}
+        # Chunks of removed rows, and all of them sorted by id for lookups
+        self._removed_chunks = []
+        self._removed_by_id = None
+        # Incremented on every change, for caches
+        self.version = 0
+
+    def _to_stored(self, values):
+        """Sequence of x-values to the stored representation"""
+        if not self.is_time:
+            return np.asarray(values, dtype=np.float64)
+        if isinstance(values, np.ndarray) and values.dtype.kind == 'M':
+            return values.astype('datetime64[ns]').view(np.int64)
+        if not isinstance(values, np.ndarray):
+            values = list(values)
+        return pd.DatetimeIndex(pd.to_datetime(values)).values\
+                 .astype('datetime64[ns]').view(np.int64)
+
+    def _from_stored(self, values):
+        """Stored values to datetime64[ns] | float64 arrays"""
+        return values.view('datetime64[ns]') if self.is_time else values
+
+    def _value(self, stored):
+        if self.is_time:
+            return pd.Timestamp(int(stored))
+        return float(stored)
+
+    def _label_code(self, label):
+        code = self._label_codes.get(label)
+        if code is None:
+            code = self._label_codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def _note_id(self, note):
+        if note is None:
+            return -1
+        note_id = self._note_ids.get(note)
+        if note_id is None:
+            note_id = self._note_ids[note] = len(self.notes)
+            self.notes.append(note)
+        return note_id
+
+    @property
+    def rows(self):
+        """Structured array of the markings (a view, do not modify)"""
+        return self._rows[:self._n]
+
+    def __len__(self):
+        return self._n
+
+    def __bool__(self):
+        return self._n > 0
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        return iter(self.views(self.rows['id']))
+
+    def __getitem__(self, index):
+        ids = self.rows['id'][index]
+        if isinstance(index, slice):
+            return self.views(ids)
+        return Marking.view(self, int(ids))
+
+    def __contains__(self, marking):
+        return self._row(getattr(marking, 'id', None)) is not None
+
+    def views(self, ids):
+        """:return: [Marking] views of the markings with ids"""
+        return [Marking.view(self, int(marking_id)) for marking_id in ids]
+
+    def _row(self, marking_id):
+        """:return: row position of marking_id, or None"""
+        if marking_id is None:
+            return None
+        ids = self.rows['id']
+        position = int(np.searchsorted(ids, marking_id))
+        if position < self._n and ids[position] == marking_id:
+            return position
+        return None
+
+    def _checked_row(self, marking_id):
+        position = self._row(marking_id)
+        if position is None:
+            raise KeyError('No marking with id {} in store'.format(marking_id))
+        return position
+
+    def _removed_rows(self):
+        """:return: structured array of the removed rows, sorted by id"""
+        if self._removed_by_id is None:
+            rows = np.concatenate(self._removed_chunks or
+                                  [np.zeros(0, dtype=self.dtype)])
+            self._removed_by_id = rows[np.argsort(rows['id'], kind='stable')]
+        return self._removed_by_id
+
+    def _locate(self, marking_id):
+        """:return: (rows, position) of marking_id, removed or not"""
+        position = self._row(marking_id)
+        if position is not None:
+            return self._rows, position
+        rows = self._removed_rows()
+        position = int(np.searchsorted(rows['id'], marking_id))
+        if position < len(rows) and rows[position]['id'] == marking_id:
+            return rows, position
+        raise KeyError('No marking with id {} in store'.format(marking_id))
+
+    def _add_removed(self, rows):
+        self._removed_chunks.append(rows.copy())
+        self._removed_by_id = None
+
+    def get_field(self, marking_id, name):
+        rows, position = self._locate(marking_id)
+        value = rows[position][name]
+        if name in ('start', 'end'):
+            return self._value(value)
+        elif name == 'label':
+            return self.labels[value]
+        return None if value < 0 else self.notes[value]
+
+    def set_field(self, marking_id, name, value):
+        """Set a field of a marking in the store, not of removed markings"""
+        position = self._checked_row(marking_id)
+        if name in ('start', 'end'):
+            value = self._to_stored([value])[0]
+        elif name == 'label':
+            value = self._label_code(value)
+        else:
+            value = self._note_id(value)
+        self._rows[position][name] = value
+        self.version += 1
+
+    def _reserve(self, n_new):
+        needed = self._n + n_new
+        if needed > len(self._rows):
+            rows = np.zeros(max(needed, 2 * len(self._rows)),
+                            dtype=self.dtype)
+            rows[:self._n] = self.rows
+            self._rows = rows
+
+    def append(self, marking):
+        """
+        Add marking, after which it becomes a view of its row in this store
+        """
+        if marking._store is not None:
+            raise ValueError('{} already belongs to a store'.format(marking))
+        start, end, label, note = marking._values
+        self._reserve(1)
+        row = (marking.id, self._to_stored([start])[0],
+               self._to_stored([end])[0], self._label_code(label),
+               self._note_id(note))
+        if self._n and marking.id < self._rows[self._n - 1]['id']:
+            # Keep rows in id order
+            position = int(np.searchsorted(self.rows['id'], marking.id))
+            self._rows[position + 1:self._n + 1] = \
+                self._rows[position:self._n].copy()
+        else:
+            position = self._n
+        self._rows[position] = row
+        self._n += 1
+        marking._store = self
+        marking._values = None
+        self.version += 1
+
+    def extend(self, starts, ends, labels, notes=None):
+        """
+        Add many markings at once
+
+        :param starts: sequence of x-values (datetimes, np.datetime64 array,
+            numbers)
+        :param ends: sequence of x-values
+        :param labels: sequence of str
+        :param notes: sequence of str | None, or None
+        :return: np.ndarray of the ids of the new markings
+        """
+        starts = self._to_stored(starts)
+        n_new = len(starts)
+        if not n_new:
+            return np.zeros(0, dtype=np.int64)
+        # factorize hashes, much faster than np.unique on object arrays
+        label_positions, unique_labels = pd.factorize(
+            np.asarray(labels, dtype=object)
+        )
+        label_codes = np.array([self._label_code(label)
+                                for label in unique_labels], dtype=np.int16)
+        first_id = _marking_ids.take(n_new)
+        ids = np.arange(first_id, first_id + n_new, dtype=np.int64)
+        self._reserve(n_new)
+        new_rows = self._rows[self._n:self._n + n_new]
+        new_rows['id'] = ids
+        new_rows['start'] = starts
+        new_rows['end'] = self._to_stored(ends)
+        new_rows['label'] = label_codes[label_positions]
+        if notes is None:
+            new_rows['note'] = -1
+        else:
+            # None (and NaN) get position -1, same as the stored 'no note'
+            note_positions, unique_notes = pd.factorize(
+                np.asarray(notes, dtype=object)
+            )
+            note_ids = np.array([self._note_id(note) for note in unique_notes]
+                                + [-1], dtype=np.int32)
+            new_rows['note'] = note_ids[note_positions]
+        self._n += n_new
+        self.version += 1
+        return ids
+
+    def remove(self, marking):
+        """
+        Remove marking, which keeps its values (detached from the store).
+        Other views of it stay readable, see `removed`.
+        """
+        position = self._checked_row(marking.id)
+        marking._values = [self.get_field(marking.id, name) for name in FIELDS]
+        marking._store = None
+        self._add_removed(self._rows[position:position + 1])
+        self._rows[position:self._n - 1] = self._rows[position + 1:self._n]
+        self._n -= 1
+        self.version += 1
+
+    def remove_ids(self, ids):
+        """
+        Remove the markings with ids, vectorized. Views of them stay
+        readable, see `removed`.
+
+        :return: [Marking], views of the markings removed
+        """
+        rows = self.rows
+        keep = ~np.isin(rows['id'], ids)
+        n_kept = int(keep.sum())
+        if n_kept == self._n:
+            return []
+        removed = rows[~keep]
+        self._add_removed(removed)
+        self._rows[:n_kept] = rows[keep]
+        self._n = n_kept
+        self.version += 1
+        return self.views(removed['id'])
+
+    def removed(self):
+        """:return: [Marking], views of the removed markings, oldest first"""
+        return [Marking.view(self, int(marking_id))
+                for chunk in self._removed_chunks for marking_id in chunk['id']]
+
+    def columns(self):
+        """
+        :return: (starts, ends, labels), datetime64[ns] or float64 arrays and
+            an object array of label strings
+        """
+        rows = self.rows
+        labels = np.array(self.labels + [None], dtype=object)[rows['label']]
+        return (self._from_stored(rows['start']),
+                self._from_stored(rows['end']), labels)
+
+    def extent(self):
+        """:return: (earliest start, latest end) | None if empty"""
+        if not self._n:
+            return None
+        rows = self.rows
+        return self._value(rows['start'].min()), self._value(rows['end'].max())
+
+    def ids_within(self, x0, x1):
+        """:return: ids of the markings strictly within (x0, x1)"""
+        k0, k1 = self._to_stored([x0, x1])
+        rows = self.rows
+        inside = (rows['start'] > k0) & (rows['start'] < k1) & \
+                 (rows['end'] > k0) & (rows['end'] < k1)
+        return rows['id'][inside]
+
+    def to_frame(self):
+        """
+        :return: pd.DataFrame with columns start, end, label and note
+        """
+        starts, ends, labels = self.columns()
+        notes = np.array(self.notes + [None], dtype=object)[
+            self.rows['note']
+        ]
+        return pd.DataFrame(
+            {'start': starts, 'end': ends, 'label': labels, 'note': notes},
+            columns=list(FIELDS),
+        )
+
+    def to_records(self):
+        """
+        :return: [dict] with keys start, end, label and note, e.g. for
+            storage plugins
+        """
+        return self.to_frame().to_dict('records')
+
+    def to_json(self):
+        """
+        :return: str, json list of records with ISO 8601 datetimes
+        """
+        return self.to_frame().to_json(orient='records', date_format='iso',
+                                       date_unit='ns')
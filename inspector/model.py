@@ -10,7 +10,7 @@ import pandas as pd
 
 from pandas.tseries.frequencies import to_offset
 from datetime import datetime, timedelta
-from operator import attrgetter, itemgetter
+from operator import attrgetter, itemgetter, methodcaller
 
 from matplotlib.backends.qt_compat import QtWidgets, QtCore, QtGui
 
@@ -22,6 +22,14 @@ from inspector.constants import (
     Labels,
     DEFAULT_GAP_LIMIT,
 )
+from inspector.slicing import IndexSlicer, values_to_keys
+from inspector.cleaning import clean_series
+from inspector.summary import summarize, merge_summaries, summary_text
+from inspector.derived import DerivedSeries, DerivedSlicer
+from inspector.aggregates import IntervalAggregates, window_stats
+from inspector.journal import open_journal
+# Marking is imported from here by plugins
+from inspector.markings import Marking, MarkingStore
 
 XAXIS_TIME = 'time'
 XAXIS_NUMBER = 'number'
@@ -30,11 +38,22 @@ class Model(QtCore.QObject):
     """
     Contains state of current loaded items (data), and exposes methods (slots)
     and signals for manipulating the items.
+
+    Items and markings are added and removed with one signal for the whole
+    batch (sig_items_added etc.) that the views use, followed by the signal
+    for each single one (sig_item_added etc.) for plugins, see
+    View.avail_signals.
     """
     sig_item_added = pyqtSignal(object)
     sig_item_removed = pyqtSignal(object)
+    sig_items_added = pyqtSignal(object)
+    sig_items_removed = pyqtSignal(object)
+    sig_item_appended = pyqtSignal(object)
+    sig_items_appended = pyqtSignal(object)  # [DataItem] with new data
     sig_marking_added = pyqtSignal(object, object)
+    sig_markings_added = pyqtSignal(object, object)  # item, [Marking]
     sig_marking_removed = pyqtSignal(object, object)
+    sig_markings_removed = pyqtSignal(object, object)  # item, [Marking]
     sig_save_markings = pyqtSignal(object, object)
     sig_item_interval_tagged = pyqtSignal(object, object, object, object)
     sig_load_markings = pyqtSignal(object, object, object)
@@ -50,13 +69,26 @@ class Model(QtCore.QObject):
                 signals[attrname] = getattr(self, attrname)
         return signals
 
-    def __init__(self):
+    def __init__(self, journal=None):
+        """
+        :param journal: journal.MarkingJournal | str (path) | None
+            Journal of all marking changes, see `journal.open_journal`
+        """
         super(Model, self).__init__()
         self.items = []
         self.item_model = QtGui.QStandardItemModel(self)
         self.current_label = None
         self.xaxis_unit = None # Default value, will be set upon first data
         self.total_items_ever_added = 0
+        self.journal = open_journal(journal)
+        if self.journal is not None:
+            # Also fsync when no more changes arrive
+            self.journal_timer = QtCore.QTimer(self)
+            self.journal_timer.timeout.connect(self.journal.sync)
+            self.journal_timer.start(int(self.journal.sync_interval * 1000))
+            app = QtCore.QCoreApplication.instance()
+            if app is not None:
+                app.aboutToQuit.connect(self.journal.close)
 
     def set_current_label(self, value):
         if value not in LABEL_COLOR_MAP:
@@ -64,7 +96,8 @@ class Model(QtCore.QObject):
         else:
             self.current_label = value
 
-    def add_dataitem(self, series, name=None, metadata=None):
+    def add_dataitem(self, series, name=None, metadata=None, source=None,
+                     outline=None, slicer=None, summary=None):
         """
         Add dataitem to model
 
@@ -72,15 +105,81 @@ class Model(QtCore.QObject):
         ----------
         series : pandas.Series
         name : object | str | None
+        source : str | None
+            Path of the file the series was loaded from
+        outline : pandas.Series | None
+            Precomputed outline view series, see OutlineView.outline_series
+        slicer : slicing.IndexSlicer | None
+            Slicer of series, e.g. a derived.DerivedSlicer
+        summary : summary.SeriesSummary | None
+            Precomputed summary of series, e.g. from a session
+
+        Returns
+        -------
+        DataItem | None if the series could not be added
+        """
+        items = self.add_dataitems([dict(series=series, name=name,
+                                         metadata=metadata, source=source,
+                                         outline=outline, slicer=slicer,
+                                         summary=summary)])
+        return items[0] if items else None
+
+    def add_derived_item(self, expression, name=None):
+        """
+        Add a virtual item computed from the loaded items and evaluated per
+        displayed window, see derived
+
+        :param expression: str, e.g. "mains - rolling(kitchen, '15min')"
+        :param name: str | None, defaults to expression
+        :return: DataItem | None
+        :raises ValueError: if expression is invalid
+        """
+        derived = DerivedSeries(expression, self.items)
+        series = derived.coarse()
+        return self.add_dataitem(series, name=name or expression,
+                                 metadata={'expression': expression},
+                                 slicer=DerivedSlicer(series, derived))
+
+    def add_dataitems(self, descriptions):
         """
-        row_idx = min(len(self.items), len(COLORS)) if self.items else 0
+        Add many dataitems, emitting a single sig_items_added so that views
+        attach them and update limits once. sig_item_added is emitted for
+        each item afterwards, for plugins (see View.avail_signals).
+
+        :param descriptions: iterable of dict, keyword arguments of
+            add_dataitem, e.g. {'series': pd.Series, 'name': 'a'}
+        :return: [DataItem] added
+        """
+        items = []
+        for description in descriptions:
+            item = self._new_dataitem(**description)
+            if item is not None:
+                items.append(item)
+        if items:
+            self.sig_items_added.emit(items)
+            for item in items:
+                self.sig_item_added.emit(item)
+            if self.journal is not None:
+                for item in items:
+                    self.replay_journal(item)
+        return items
+
+    def _new_dataitem(self, series, name=None, metadata=None, source=None,
+                      outline=None, slicer=None, summary=None):
+        """
+        Check series, then create its DataItem and list row, see add_dataitem
+
+        :return: DataItem | None
+        """
+        row_idx = len(self.items)
         if not isinstance(series, pd.Series):
             logger.error('Cannot add item of type {}: {}'
                          ''.format(type(series), str(series)[:100]))
             return
         if name is None:
             if series.name is None:
-                name = '{} - {}'.format(COLORS[row_idx], len(series))
+                name = '{} - {}'.format(COLORS[row_idx % len(COLORS)],
+                                        len(series))
                 logger.warn('Found no name for series, using color and '
                             'number of values: "{}"'.format(name))
             else:
@@ -109,12 +208,14 @@ class Model(QtCore.QObject):
             return
 
 #       NOTE: Item color examples: http://ynonperek.com/q.t-mvc-customize-items
-        item_color = QtGui.QColor(COLORS[row_idx])
+        item_color = QtGui.QColor(COLORS[row_idx % len(COLORS)])
         item_color.setAlphaF(DATA_ALPHA)
 
-        item = DataItem(series, name, metadata=metadata)
+        item = DataItem(series, name, metadata=metadata, source=source,
+                        outline=outline, slicer=slicer, summary=summary)
         item.setCheckState(Qt.Checked)
         item.setCheckable(True)
+        item.setToolTip(summary_text(item.summary))
 
         self.items.append(item)
         self.total_items_ever_added += 1
@@ -127,19 +228,33 @@ class Model(QtCore.QObject):
 
         self.item_model.setItem(row_idx, 0, colorpatch_item)
         self.item_model.setItem(row_idx, 1, item)
+        return item
 
-        self.sig_item_added.emit(item)
+    def replay_journal(self, item):
+        """
+        Add the markings journaled for item, e.g. in an earlier session
+        """
+        keys, columns = self.journal.journaled_markings(item)
+        if not keys:
+            return
+        ids = item.markings.extend(*columns)
+        self.journal.bind(ids, keys)
+        logger.info('Restored {} journaled markings to {}'.format(
+            len(ids), item.name
+        ))
+        self._emit_markings_added(item, item.markings.views(ids))
 
     def remove_dataitem(self, item):
         """
         Remove dataitem from model
         """
-        self.items.remove(item)
-        self.item_model.removeRow(item.row())
-        self.sig_item_removed.emit(item)
+        self.remove_dataitems([item])
 
     def remove_marking(self, item, marking):
         item.remove_marking(marking)
+        if self.journal is not None:
+            self.journal.record_removed([marking])
+        self.sig_markings_removed.emit(item, [marking])
         self.sig_marking_removed.emit(item, marking)
         logger.info(
             "Removed '{name}' {start} <==> {end} ({td}) {label}  | note: {note}"
@@ -153,6 +268,23 @@ class Model(QtCore.QObject):
             )
         )
 
+    def remove_markings(self, item, ids):
+        """
+        Bulk version of remove_marking, journaling the removal at once
+
+        :param ids: ids of markings of item
+        """
+        removed = item.markings.remove_ids(ids)
+        if not removed:
+            return
+        if self.journal is not None:
+            self.journal.record_removed(removed)
+        logger.info('Removed {} markings from {}'.format(len(removed),
+                                                         item.name))
+        self.sig_markings_removed.emit(item, removed)
+        for marking in removed:
+            self.sig_marking_removed.emit(item, marking)
+
     def tag_items(self, tag, only_visible):
         for item in self.get_items(only_visible=only_visible):
             self.tag_full_item_interval(item, tag=tag)
@@ -160,8 +292,8 @@ class Model(QtCore.QObject):
     def tag_full_item_interval(self, item, tag):
         self.sig_item_interval_tagged.emit(
             item.metadata,
-            item.series.first_valid_index(),
-            item.series.last_valid_index(),
+            item.summary.first_valid,
+            item.summary.last_valid,
             tag,
         )
 
@@ -172,14 +304,60 @@ class Model(QtCore.QObject):
     def tag_item_interval_between_outer_markings(self, item, tag):
         if not item.markings:
             return
-        start = min(map(attrgetter('start'), item.markings))
-        end = max(map(attrgetter('end'), item.markings))
+        start, end = item.markings.extent()
         self.sig_item_interval_tagged.emit(item.metadata, start, end, tag)
 
+    def remove_dataitems(self, items):
+        """
+        Remove many dataitems, emitting a single sig_items_removed, then
+        sig_item_removed for each item, for plugins
+        """
+        items = list(items)
+        if not items:
+            return
+        removed = set(map(id, items))
+        # In place, the views share the list
+        self.items[:] = [item for item in self.items if id(item) not in removed]
+        for row_idx in sorted(map(methodcaller('row'), items), reverse=True):
+            self.item_model.removeRow(row_idx)
+        self.sig_items_removed.emit(items)
+        for item in items:
+            self.sig_item_removed.emit(item)
+
+    def append_data(self, item, series):
+        """
+        Append series to the data of item, see DataItem.append. Derived items
+        computed from item are evaluated again. Emits a single
+        sig_items_appended with all the updated items, then sig_item_appended
+        for each, for plugins.
+
+        :param item: DataItem, not derived
+        :param series: pd.Series, with an index following that of item.series
+        :return: [DataItem] updated
+        :raises ValueError: if item is derived
+        """
+        if item.is_derived:
+            raise ValueError('Cannot append to derived item {}, append to '
+                             'its sources instead'.format(item.name))
+        item.append(series)
+        items = [item]
+        updated = {id(item)}
+        # Derived items come after their sources, including derived ones
+        for other in self.items:
+            if other.is_derived and any(
+                    id(source) in updated
+                    for source in other.slicer.derived.sources):
+                other.reevaluate()
+                items.append(other)
+                updated.add(id(other))
+        self.sig_items_appended.emit(items)
+        for updated in items:
+            self.sig_item_appended.emit(updated)
+        return items
+
     def remove_rows(self, rows):
-        for row_idx in reversed(sorted(rows)):
-            item = self.item_model.item(row_idx, 1)
-            self.remove_dataitem(item)
+        self.remove_dataitems([self.item_model.item(row_idx, 1)
+                               for row_idx in rows])
 
     def set_items_visible(self, how='invert'):
         for item in self.items:
@@ -242,12 +420,47 @@ class Model(QtCore.QObject):
             marking_metadata,
             self.items
         )
+        if not matching_items or not markings:
+            return
+        columns = list(zip(*map(itemgetter('start', 'end', 'label', 'note'),
+                                markings)))
         for item in matching_items:
-            for marking in markings:
-                self.new_marking_for_item(
-                    item,
-                    *itemgetter('start', 'end', 'label', 'note')(marking)
-                )
+            self.add_markings(item, *columns)
+
+    def matching_items(self, name, metadata, only_visible=False):
+        """
+        Items matching metadata, or named name if metadata is empty
+
+        :return: [DataItem]
+        """
+        items = self.get_items(only_visible=only_visible)
+        if metadata:
+            return self._filter_matching_metadata(metadata, items)
+        return [item for item in items if item.name == name]
+
+    def add_markings(self, item, starts, ends, labels, notes=None):
+        """
+        Bulk version of new_marking_for_item, emitting a single
+        sig_markings_added (then sig_marking_added per marking, see Model)
+
+        :param starts: sequence of x-values
+        :param ends: sequence of x-values
+        :param labels: sequence of str
+        :param notes: sequence of str | None, or None
+        :return: np.ndarray, ids of the new markings
+        """
+        ids = item.markings.extend(starts, ends, labels, notes)
+        if self.journal is not None:
+            self.journal.record_added(item, ids)
+        if len(ids):
+            logger.info('Added {} markings to {}'.format(len(ids), item.name))
+            self._emit_markings_added(item, item.markings.views(ids))
+        return ids
+
+    def _emit_markings_added(self, item, markings):
+        self.sig_markings_added.emit(item, markings)
+        for marking in markings:
+            self.sig_marking_added.emit(item, marking)
 
     def load_markings(self, only_visible=True):
         for item in  (self.visible_items() if only_visible else self.items):
@@ -255,19 +468,30 @@ class Model(QtCore.QObject):
             # and start & end values to allow them to filter markings properly
             self.sig_load_markings.emit(
                 item.metadata,
-                item.series.index[0],
-                item.series.index[-1],
+                item.summary.first,
+                item.summary.last,
             )
 
     def apply_on_visible(self, callback):
+        """
+        Call callback(series, metadata) for each visible item. Derived items
+        are evaluated over their full range, rather than passing their coarse
+        evaluation (see DerivedSeries.coarse).
+        """
         for item in self.visible_items():
-            callback(item.series, item.metadata)
+            if item.is_derived:
+                series = item.slicer.derived.evaluate()
+            else:
+                series = item.series
+            callback(series, item.metadata)
 
     def new_marking_for_item(self, item, start, end, label, note=None):
         mark = Marking(start, end, label, note=note)
         item.add_marking(mark)
+        if self.journal is not None:
+            self.journal.record_added(item, [mark.id])
         logger.info("Marked {} <==> {} ({})".format(start, end, end - start))
-        self.sig_marking_added.emit(item, mark)
+        self._emit_markings_added(item, [mark])
 
     def new_marking(self, start, end, only_visible=True):
         if not self.current_label:
@@ -282,18 +506,17 @@ class Model(QtCore.QObject):
             logger.error('Current label not set')
             return
         marking.label = self.current_label
+        if self.journal is not None:
+            self.journal.record_relabeled(marking)
         self.sig_marking_label_updated.emit(marking)
 
     def delete_all_markings_for_visible(self):
         for item in self.visible_items():
-            for mark in item.markings[:]:
-                self.remove_marking(item, mark)
+            self.remove_markings(item, item.markings.rows['id'])
 
     def delete_markings_in_interval(self, x0, x1, only_visible=True):
         for item in self.get_items(only_visible=only_visible):
-            for mark in item.markings[:]:
-                if (x0 < mark.start < x1) and (x0 < mark.end < x1):
-                    self.remove_marking(item, mark)
+            self.remove_markings(item, item.markings.ids_within(x0, x1))
 
 
 class DataItem(QtGui.QStandardItem):
@@ -304,7 +527,8 @@ class DataItem(QtGui.QStandardItem):
 
     Be careful of any attribute name collisions from QStandardItem (ie: .data)
     """
-    def __init__(self, series, name, metadata=None):
+    def __init__(self, series, name, metadata=None, source=None,
+                 outline=None, slicer=None, summary=None):
         """
         :param series: pd.Series
         :param name: str
@@ -313,18 +537,34 @@ class DataItem(QtGui.QStandardItem):
                 Signify that this item contains mains data
             Will be sent alongside with raw data or markings when exporting
             markings or data to, e.g. a database-plugin.
+        :param source: str | None, path of the file the series was loaded
+            from, if any
+        :param outline: pd.Series | None, precomputed outline of series
+        :param slicer: IndexSlicer | None, defaults to IndexSlicer(series)
+        :param summary: SeriesSummary | None, defaults to summarize(series)
         """
         super(DataItem, self).__init__(name)
         self.series = series
+        self.slicer = IndexSlicer(series) if slicer is None else slicer
         self.name = name
         self.metadata = metadata or {}
-        self.markings = []
-        self.deleted_markings = []
+        self.source = source
+        self.outline = outline
+        self.markings = MarkingStore(is_time=self.slicer.is_time)
+        self._marking_keys = None
+        self._marking_keys_version = None
+        self._aggregates = None
+        self.summary = summarize(series) if summary is None else summary
 
     def __hash__(self):
         """QStandardItem is not hashable in python3"""
         return id(self)
 
+    @property
+    def markings_version(self):
+        """Incremented on every change of the markings, for caches"""
+        return self.markings.version
+
     def add_marking(self, marking):
         """
         :param mark: Marking
@@ -333,30 +573,95 @@ class DataItem(QtGui.QStandardItem):
 
     def remove_marking(self, marking):
         self.markings.remove(marking)
-        self.deleted_markings.append(marking)
 
     @property
-    def visible(self):
-        return self.checkState() == Qt.Checked
+    def deleted_markings(self):
+        """:return: [Marking], the markings removed, oldest first"""
+        return self.markings.removed()
 
+    def data_limits(self):
+        """
+        :return: ((xmin, xmax), (ymin, ymax)) of the series
+        """
+        summary = self.summary
+        return (summary.first, summary.last), (summary.min, summary.max)
 
-class Marking(object):
-    """
-    Lightweight class for storing information about a labeled time interval
-    """
-    def __init__(self, start, end, label, note=None):
+    def append(self, series):
+        """
+        Append series, with an index following that of self.series, updating
+        the summary incrementally. The outline is recomputed when next shown.
+        Use Model.append_data, which updates the views.
+
+        :raises ValueError: if the item is derived
+        """
+        if self.is_derived:
+            raise ValueError('Derived items are evaluated from their sources')
+        self.series = pd.concat([self.series, series])
+        self.slicer = IndexSlicer(self.series)
+        self.summary = merge_summaries(self.summary, summarize(series))
+        self.outline = None
+        self.setToolTip(summary_text(self.summary))
+
+    def reevaluate(self):
+        """
+        Evaluate the coarse series of a derived item again, e.g. after data
+        was appended to its sources. Windows are evaluated anew anyway, see
+        DerivedSeries.window.
         """
-        :param start: datetime | float
-        :param end: datetime | float
-        :param label: str
-        :param note: str | None
+        self.series = self.slicer.derived.coarse()
+        self.summary = summarize(self.series)
+        self.outline = None
+        self.setToolTip(summary_text(self.summary))
+
+    @property
+    def is_derived(self):
+        """Whether the item is a derived series, see Model.add_derived_item"""
+        return isinstance(self.slicer, DerivedSlicer)
+
+    def interval_stats(self, x0, x1):
+        """
+        :return: aggregates.IntervalStats of the closed interval [x0, x1].
+            Derived items are evaluated over the interval, not looked up.
+        """
+        if self.is_derived:
+            return window_stats(*self.slicer.slice(x0, x1, remember=False))
+        return self.aggregates.query(x0, x1)
+
+    @property
+    def aggregates(self):
+        """
+        IntervalAggregates of the series, built on first use (and again after
+        append). Not available for derived items, see interval_stats.
+        """
+        if self._aggregates is None or \
+                self._aggregates.slicer is not self.slicer:
+            self._aggregates = IntervalAggregates(self.slicer)
+        return self._aggregates
+
+    def marking_keys(self):
+        """
+        :return: (start keys, end keys, labels) of the markings as arrays,
+            in the key space of slicer.keys
         """
-        self.start = start
-        self.end = end
-        self.label = label
-        self.note = note
+        if self._marking_keys_version != self.markings_version:
+            starts, ends, labels = self.markings.columns()
+            dtype = self.slicer.index_dtype
+            self._marking_keys = (
+                values_to_keys(starts, dtype),
+                values_to_keys(ends, dtype),
+                labels,
+            )
+            self._marking_keys_version = self.markings_version
+        return self._marking_keys
 
-    def to_json(self):
-        attrs = ['start', 'end', 'label', 'note']
-        return dict([(attr, str(getattr(self, attr))) for attr in attrs])
+    def cleaned(self):
+        """
+        Series with the cleaning actions of the markings applied
 
+        :return: (pd.Series, {label: number of points affected})
+        """
+        return clean_series(self.series, self.markings)
+
+    @property
+    def visible(self):
+        return self.checkState() == Qt.Checked
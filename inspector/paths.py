@@ -0,0 +1,29 @@
+from __future__ import print_function, division
+
+import os
+import errno
+
+
+def user_cache_dir(*parts):
+    """
+    Return (and create) a directory for Inspector's on-disk caches.
+
+    Defaults to $XDG_CACHE_HOME/inspector (~/.cache/inspector), and can be
+    overridden with the INSPECTOR_CACHE_DIR environment variable.
+
+    :param parts: str, optional subdirectory names
+    """
+    root = os.environ.get('INSPECTOR_CACHE_DIR')
+    if not root:
+        root = os.path.join(
+            os.environ.get('XDG_CACHE_HOME') or
+                os.path.join(os.path.expanduser('~'), '.cache'),
+            'inspector'
+        )
+    path = os.path.join(root, *parts)
+    try:
+        os.makedirs(path)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+    return path
@@ -1,7 +1,9 @@
 from __future__ import print_function, division, unicode_literals
 
 import os
+import json
 import logging
+import importlib
 import pandas as pd
 import numpy as np
 
@@ -9,20 +11,15 @@ from operator import attrgetter, itemgetter
 from itertools import starmap, chain
 from datetime import date, datetime, timedelta
 
-from pandas.tseries.frequencies import to_offset
-from inspector.constants import CLEANED, LABEL_COLOR_MAP, Labels
+from inspector.constants import CLEANED, Labels
 from inspector.helpers import print_out, create_action
+from inspector.markings import gap_markings
+from inspector.paths import user_cache_dir
 
 from matplotlib.backends.qt_compat import QtWidgets, QtCore
 
 from inspector.helpers import pyqtSignal, Qt
 
-from pkg_resources import iter_entry_points
-
-
-from mock import Mock
-MockMarkingsTable = Mock()
-
 
 # Plugin libraries are expected to install entry points under this group,
 # e.g.
@@ -38,44 +35,197 @@ PLUGINS_RESOURCE_GROUP = 'inspector.plugins'
 
 
 _discovered_plugins = {}
+_mock_markings_table = None
+
+
+def mock_markings_table():
+    """Stand-in markings table used by MarkingsIO when no table is given.
+    Created on first use, so that importing mock does not slow down startup.
+    """
+    global _mock_markings_table
+    if _mock_markings_table is None:
+        try:
+            from unittest.mock import Mock
+        except ImportError:
+            from mock import Mock
+        _mock_markings_table = Mock()
+    return _mock_markings_table
+
+
+def iter_entry_points(group):
+    """
+    List entry points installed under `group`, using importlib.metadata
+    (much faster than pkg_resources, which scans every distribution on
+    import) when available.
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        from pkg_resources import iter_entry_points as pkg_iter_entry_points
+        return list(pkg_iter_entry_points(group=group))
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        return list(eps.select(group=group))
+    # Python < 3.10 returns a dict of group name -> entry points
+    return list(eps.get(group, []))
+
 
 def all_plugins():
+    """
+    :return: {plugin name: PluginRef}
+    """
     assert _discovered_plugins  # discover_plugins() should be called first
     return _discovered_plugins
 
 
-def discover_plugins():
-    global _discovered_plugins
-    plugins = {}
-    def is_strict_subclass(klass, superklass):
-        return isinstance(klass, type) \
-                and issubclass(klass, superklass) \
-                and (klass is not superklass)
-    for obj in globals().values():
-        if not is_strict_subclass(obj, PluginBase):
+class PluginRef(object):
+    """
+    Reference to a plugin class by module and class name. The module is only
+    imported when `load` is called, i.e. when the plugin gets enabled.
+    """
+    def __init__(self, name, module, class_name, class_=None):
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self._class = class_
+
+    def load(self):
+        if self._class is None:
+            module = importlib.import_module(self.module)
+            self._class = getattr(module, self.class_name)
+        return self._class
+
+    def __repr__(self):
+        return 'PluginRef({!r}, {}.{})'.format(
+            self.name, self.module, self.class_name
+        )
+
+
+def load_plugin(plugin):
+    """
+    :param plugin: PluginRef | PluginBase subclass
+    :return: PluginBase subclass
+    """
+    return plugin.load() if isinstance(plugin, PluginRef) else plugin
+
+
+def _is_strict_subclass(klass, superklass):
+    return isinstance(klass, type) \
+            and issubclass(klass, superklass) \
+            and (klass is not superklass)
+
+
+def _entry_point_key(entry_point):
+    """Identify an entry point together with its distribution's version"""
+    dist = getattr(entry_point, 'dist', None)
+    if dist is None:
+        dist_text = '?'
+    elif hasattr(dist, 'project_name'):  # pkg_resources
+        dist_text = '{}=={}'.format(dist.project_name, dist.version)
+    else:
+        dist_text = '{}=={}'.format(dist.metadata['Name'], dist.version)
+    return '{} {}={}'.format(dist_text, entry_point.name, entry_point.value
+                             if hasattr(entry_point, 'value')
+                             else entry_point.module_name)
+
+
+def manifest_path():
+    return os.path.join(user_cache_dir(), 'plugin_manifest.json')
+
+
+def _read_manifest(key):
+    try:
+        with open(manifest_path()) as fh:
+            manifest = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return None
+    if manifest.get('key') != key:
+        logging.debug('Plugin manifest is stale, rediscovering plugins')
+        return None
+    return manifest['plugins']
+
+
+def _write_manifest(key, entries):
+    path = manifest_path()
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmp_path, 'w') as fh:
+            json.dump({'key': key, 'plugins': entries}, fh, indent=1)
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as err:
+        logging.warning('Could not write plugin manifest %s: %s', path, err)
+
+
+def _scan_entry_points(entry_points):
+    """
+    Import entry point modules and list the plugin classes found in them
+
+    :return: [{'name': str, 'module': str, 'class': str}]
+    """
+    entries = []
+    for entry_point in entry_points:
+        try:
+            module = entry_point.load()
+        except Exception:
+            logging.exception('Could not load plugin entry point %s',
+                              entry_point)
             continue
-        else:
-            plugins[obj.name] = obj
-    for entry_point in iter_entry_points(group=PLUGINS_RESOURCE_GROUP):
-        module = entry_point.load()
         for objname in dir(module):
             if objname.startswith('__'):
                 continue
             else:
                 obj = getattr(module, objname)
             desc = {'obj': obj, 'entry_point': entry_point}
-            if not is_strict_subclass(obj, PluginBase):
+            if not _is_strict_subclass(obj, PluginBase):
                 logging.debug('Object is not a PluginBase, skipping: %s', desc)
                 continue
             if not hasattr(obj, 'name'):
                 logging.error('Plugin is missing a name atttribute: %s', desc)
                 continue
-            if obj.name in plugins:
-                logging.error('Could not load plugin because of name conflict',
-                              desc)
-                continue
-            plugins[obj.name] = obj
-            logging.debug('Discovered plugin: %s', obj.name)
+            entries.append({
+                'name': obj.name,
+                'module': obj.__module__,
+                'class': obj.__name__,
+            })
+    return entries
+
+
+def discover_plugins(refresh=False):
+    """
+    Find built-in plugins and plugins installed under PLUGINS_RESOURCE_GROUP.
+
+    Installed plugins are listed in a manifest cached on disk, keyed by the
+    installed entry points and their distribution versions. Plugin modules
+    are therefore only imported when the set of installed plugins changes,
+    or when a plugin is enabled (see `PluginRef.load`).
+
+    :param refresh: bool, ignore any cached manifest
+    :return: {plugin name: PluginRef}
+    """
+    global _discovered_plugins
+    plugins = {}
+    for obj in list(globals().values()):
+        if not _is_strict_subclass(obj, PluginBase):
+            continue
+        else:
+            plugins[obj.name] = PluginRef(obj.name, obj.__module__,
+                                          obj.__name__, class_=obj)
+
+    entry_points = iter_entry_points(group=PLUGINS_RESOURCE_GROUP)
+    key = sorted(map(_entry_point_key, entry_points))
+    entries = None if refresh else _read_manifest(key)
+    if entries is None:
+        entries = _scan_entry_points(entry_points)
+        _write_manifest(key, entries)
+    for entry in entries:
+        if entry['name'] in plugins:
+            logging.error('Could not load plugin because of name conflict: %s',
+                          entry)
+            continue
+        plugins[entry['name']] = PluginRef(
+            entry['name'], entry['module'], entry['class']
+        )
+        logging.debug('Discovered plugin: %s', entry['name'])
 
     _discovered_plugins = plugins
 
@@ -268,11 +418,12 @@ class MarkingsIO(PluginBase):
 
     name = 'MarkingsIO'
 
-    def __init__(self, db_table=MockMarkingsTable):
+    def __init__(self, db_table=None):
         super(MarkingsIO, self).__init__()
         self.logger = logging.getLogger(self.name)
         self.already_loaded_metadatas = []
-        self.db_table = db_table
+        self.db_table = db_table if db_table is not None \
+                                 else mock_markings_table()
         self.actions = [
             create_action(
                 'Auto-mark gaps',
@@ -394,29 +545,10 @@ class MarkingsIO(PluginBase):
             )
 
     def auto_mark_gaps(self, series, metadata, label, gap_limit='20s'):
-        if isinstance(series.index, pd.DatetimeIndex):
-            gap_delta = np.timedelta64(to_offset(gap_limit).nanos, 'ns')
-        else:
-            gap_delta = float(gap_limit)
-        if label not in LABEL_COLOR_MAP:
-            self.logger.error('Bad label {}'.format(label))
+        try:
+            markings = gap_markings(series, label, gap_limit=gap_limit)
+        except ValueError as err:
+            self.logger.error(str(err))
             return
 
-        gap_indices = np.where(
-            np.diff(series.index.values) > gap_delta
-        )[0]
-        markings = []
-        for gap_idx in list(gap_indices):
-            gap_x0 = series.index[gap_idx]
-            gap_x1 = series.index[gap_idx+1]
-            if isinstance(series.index, pd.DatetimeIndex):
-                gap_x0 = gap_x0.to_datetime()
-                gap_x1 = gap_x1.to_datetime()
-            markings.append({
-                'start': gap_x0,
-                'end': gap_x1,
-                'label': label,
-                'note': None
-            })
-
         self.sig_new_markings.emit(markings, metadata)
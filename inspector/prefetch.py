@@ -0,0 +1,100 @@
+from __future__ import print_function, division
+
+import logging
+logger = logging.getLogger('pfch')
+
+import threading
+from collections import OrderedDict
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+
+def window_key(x0, x1):
+    """
+    Key for a window in axis coordinates. Rounded, since limits that went
+    through date conversions differ in the last few bits.
+    """
+    return round(x0, 8), round(x1, 8)
+
+
+class WindowPrefetcher(object):
+    """
+    Prepares windows in a background thread, before they are asked for, and
+    keeps a bounded LRU cache of the results.
+
+    Requests carry their own snapshot of whatever state `prepare` needs, as
+    it is called outside the GUI thread. `invalidate` drops all cached and
+    pending windows; results of preparations that were running at that point
+    are discarded.
+    """
+    def __init__(self, prepare, capacity=6):
+        """
+        :param prepare: callable(*args, **kwargs) -> prepared window
+        :param capacity: int, maximum number of prepared windows kept
+        """
+        self.prepare = prepare
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.queue = Queue()
+        self._pending = set()
+        self._worker = None
+
+    def get(self, key):
+        """
+        :return: the prepared window for key, or None if not (yet) prepared
+        """
+        with self.lock:
+            prepared = self.cache.pop(key, None)
+            if prepared is not None:
+                self.cache[key] = prepared  # Most recently used
+            return prepared
+
+    def request(self, key, *args, **kwargs):
+        """
+        Prepare prepare(*args, **kwargs) in the background and store it
+        under key
+        """
+        with self.lock:
+            if key in self.cache or key in self._pending:
+                return
+            self._pending.add(key)
+            generation = self.generation
+        self.queue.put((generation, key, args, kwargs))
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work,
+                                            name='window-prefetcher')
+            self._worker.daemon = True
+            self._worker.start()
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.cache.clear()
+            self._pending.clear()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                break
+
+    def _work(self):
+        while True:
+            generation, key, args, kwargs = self.queue.get()
+            if generation != self.generation:
+                continue
+            try:
+                prepared = self.prepare(*args, **kwargs)
+            except Exception:
+                logger.exception('Could not prefetch window %s', key)
+                prepared = None
+            with self.lock:
+                self._pending.discard(key)
+                if prepared is None or generation != self.generation:
+                    continue
+                self.cache[key] = prepared
+                while len(self.cache) > self.capacity:
+                    self.cache.popitem(last=False)
@@ -0,0 +1,287 @@
+"""
+Offscreen rendering of series snapshots: `inspector render [options] MANIFEST`
+
+Draws intervals of series, with their markings, to PNG files in the style of
+the DetailView, using the Agg backend directly (no Qt, no pyplot). Manifest
+rows are grouped per file and spread over a process pool, so that each file
+is decoded only once.
+
+The manifest is a csv file with the header `file,item,start,end[,out]`, or a
+json list of objects with those keys. `item` is the series name (empty means
+the first series in the file), `start`/`end` may be empty for the full
+series, and `out` defaults to a name derived from the row.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import os
+import re
+import sys
+import csv
+import json
+import logging
+import argparse
+import multiprocessing
+logger = logging.getLogger('rndr')
+
+from collections import OrderedDict
+from timeit import default_timer
+
+import numpy as np
+import pandas as pd
+
+from inspector.constants import (
+    LINEWIDTH,
+    DATA_ALPHA,
+    SPAN_ALPHA,
+    AXISBG,
+    FIG_FACECOLOR,
+    XTICK_ROTATION,
+    MINIMUM_Y_RANGE,
+    LABEL_COLOR_MAP,
+    COLORS,
+)
+from inspector.loaders import load_file
+from inspector.slicing import (
+    IndexSlicer,
+    nanminmax,
+    minmax_decimate,
+    date_numbers,
+)
+
+MARKINGS_SUFFIX = '.markings.json'  # As written by `inspector batch`
+
+
+def read_manifest(path):
+    """
+    :return: [dict] with keys 'file', 'item', 'start', 'end' and 'out'
+    """
+    with open(path) as fh:
+        if path.endswith('.json'):
+            rows = json.load(fh)
+        else:
+            rows = list(csv.DictReader(fh))
+    for row in rows:
+        if not row.get('file'):
+            raise ValueError('Manifest row without file: {}'.format(row))
+        for key in ['item', 'start', 'end', 'out']:
+            row[key] = row.get(key) or None
+    return rows
+
+
+def load_markings(path, markings_dir=None):
+    """
+    :return: {series name: [marking dict]}, empty if there is no markings
+        file for path
+    """
+    directory, filename = os.path.split(path)
+    markings_path = os.path.join(markings_dir or directory,
+                                 filename + MARKINGS_SUFFIX)
+    if not os.path.exists(markings_path):
+        return {}
+    with open(markings_path) as fh:
+        return json.load(fh)
+
+
+def to_x(value, is_time):
+    """Manifest or marking x-value (str | number | None) to an index value"""
+    if value is None:
+        return None
+    if is_time:
+        return pd.Timestamp(value).to_datetime64()
+    return float(value)
+
+
+def snapshot_name(row, n):
+    parts = [os.path.basename(row['file']), row['item'] or '',
+             row['start'] or '', row['end'] or '', str(n)]
+    return re.sub(r'[^\w.-]+', '_', '_'.join(parts)) + '.png'
+
+
+def _date_numbers(values):
+    return date_numbers(pd.DatetimeIndex(values).values)
+
+
+def render_snapshot(series, markings, out_path, start=None, end=None,
+                    size=(8.0, 3.0), dpi=90, color=COLORS[0]):
+    """
+    Render series (and the markings overlapping [start, end]) to out_path
+
+    :param series: pd.Series
+    :param markings: [dict] with keys 'start', 'end' and 'label'
+    :param start: index value | None
+    :param end: index value | None
+    :param size: (width, height) in inches
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    slicer = IndexSlicer(series)
+    start = slicer.index_values[0] if start is None else start
+    end = slicer.index_values[-1] if end is None else end
+    x_values, y_values = slicer.slice(start, end, remember=False)
+    # Two points per horizontal pixel is as much as can be seen
+    x_values, y_values = minmax_decimate(x_values, y_values,
+                                         int(size[0] * dpi) * 2)
+    to_axis = _date_numbers if slicer.is_time else np.asarray
+
+    fig = Figure(size, dpi=dpi, facecolor=FIG_FACECOLOR)
+    FigureCanvasAgg(fig)
+    axes = fig.add_subplot(1, 1, 1)
+    # set_axis_bgcolor in matplotlib < 2.0
+    (getattr(axes, 'set_facecolor', None) or axes.set_axis_bgcolor)(AXISBG)
+    axes.plot(to_axis(x_values), y_values, color=color, alpha=DATA_ALPHA,
+              linewidth=LINEWIDTH)
+    for marking in markings:
+        m_start = to_x(marking['start'], slicer.is_time)
+        m_end = to_x(marking['end'], slicer.is_time)
+        if m_end < start or m_start > end:
+            continue
+        m_x0, m_x1 = to_axis([m_start, m_end])
+        axes.axvspan(m_x0, m_x1, color=LABEL_COLOR_MAP[marking['label']],
+                     alpha=SPAN_ALPHA)
+    if slicer.is_time:
+        axes.xaxis_date()
+    x0, x1 = to_axis([start, end])
+    if x0 != x1:
+        axes.set_xlim(x0, x1)
+    ymin, ymax = nanminmax(y_values)
+    if not np.isnan(ymin):
+        # Same limits as DetailView.prepare_interval
+        ymin, ymax = min(ymin, 0), max(ymax, 0)
+        yspan = max(abs(ymax - ymin), MINIMUM_Y_RANGE)
+        axes.set_ylim(ymin - yspan * 0.02, ymax + yspan * 0.02)
+    axes.set_title(str(series.name), fontsize='small')
+    for label in axes.get_xticklabels():
+        label.set_rotation(XTICK_ROTATION)
+    fig.tight_layout()
+    fig.savefig(out_path, facecolor=FIG_FACECOLOR)
+
+
+def render_file(job):
+    """
+    Render all manifest rows of one file
+
+    :param job: (path, [(n, row)], options dict)
+    :return: (n_rendered, {row number: error str})
+    """
+    path, rows, options = job
+    try:
+        seria = load_file(path)
+        if seria is None:
+            raise ValueError('Could not deserialize')
+        markings = load_markings(path, options.get('markings_dir'))
+    except Exception as err:
+        error = '{}: {}'.format(type(err).__name__, err)
+        return 0, dict((n, error) for n, _ in rows)
+
+    by_name = OrderedDict((str(s.name), s) for s in seria)
+    n_rendered, failed = 0, {}
+    for n, row in rows:
+        try:
+            name = row['item'] or next(iter(by_name))
+            series = by_name[name]
+            is_time = isinstance(series.index, pd.DatetimeIndex)
+            out_path = os.path.join(options.get('out_dir') or '.',
+                                    row['out'] or snapshot_name(row, n))
+            render_snapshot(
+                series,
+                markings.get(name, []),
+                out_path,
+                start=to_x(row['start'], is_time),
+                end=to_x(row['end'], is_time),
+                size=options.get('size', (8.0, 3.0)),
+                dpi=options.get('dpi', 90),
+            )
+            n_rendered += 1
+        except Exception as err:
+            logger.debug('Failed rendering row %s', n, exc_info=True)
+            failed[n] = '{}: {}'.format(type(err).__name__, err)
+    return n_rendered, failed
+
+
+def run(rows, workers=None, out_dir=None, markings_dir=None,
+        size=(8.0, 3.0), dpi=90):
+    """
+    Render manifest rows over a pool of worker processes
+
+    :param rows: [dict], see read_manifest
+    :param workers: int | None (number of CPUs). With 1, rows are rendered
+        in this process.
+    :param out_dir: str | None, defaults to the working directory
+    :param markings_dir: str | None, where to look for <file>.markings.json,
+        defaults to next to each file
+    :return: {row number: error str} for the rows that failed
+    """
+    workers = workers or multiprocessing.cpu_count()
+    if out_dir and not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    options = {'out_dir': out_dir, 'markings_dir': markings_dir,
+               'size': size, 'dpi': dpi}
+    rows_by_file = OrderedDict()
+    for n, row in enumerate(rows):
+        rows_by_file.setdefault(row['file'], []).append((n, row))
+    jobs = [(path, file_rows, options)
+            for path, file_rows in rows_by_file.items()]
+
+    pool = None
+    if workers > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(workers, len(jobs)))
+        results = pool.imap_unordered(render_file, jobs, chunksize=1)
+    else:
+        results = map(render_file, jobs)
+
+    start = default_timer()
+    n_rendered, failed = 0, {}
+    try:
+        for n_file_rendered, file_failed in results:
+            n_rendered += n_file_rendered
+            failed.update(file_failed)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    for n, error in sorted(failed.items()):
+        logger.error('Row {} ({}): {}'.format(n, rows[n]['file'], error))
+    seconds = default_timer() - start
+    logger.info('Rendered {} images in {:.1f} s ({:.1f} images/s)'.format(
+        n_rendered, seconds, n_rendered / seconds if seconds else 0
+    ))
+    return failed
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='inspector render',
+        description='Render series snapshots to PNG without opening a window',
+    )
+    parser.add_argument('manifest',
+                        help='csv (file,item,start,end[,out]) or json file')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Number of worker processes (default: #cpus)')
+    parser.add_argument('-o', '--out-dir', default=None,
+                        help='Output directory (default: working directory)')
+    parser.add_argument('--markings-dir', default=None,
+                        help='Directory with <file>%s files (default: next '
+                             'to each file)' % MARKINGS_SUFFIX)
+    parser.add_argument('--size', type=float, nargs=2, default=(8.0, 3.0),
+                        metavar=('WIDTH', 'HEIGHT'), help='Inches')
+    parser.add_argument('--dpi', type=int, default=90)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    loglvl = logging.DEBUG if os.environ.get('PYDEBUG', None) else logging.INFO
+    logging.basicConfig(
+        level=loglvl,
+        format="%(asctime)s %(levelname)-8s [%(name)s] : %(message)s"
+    )
+    failed = run(
+        read_manifest(args.manifest),
+        workers=args.workers,
+        out_dir=args.out_dir,
+        markings_dir=args.markings_dir,
+        size=tuple(args.size),
+        dpi=args.dpi,
+    )
+    return 1 if failed else 0
@@ -0,0 +1,64 @@
+from __future__ import print_function, division
+
+import logging
+logger = logging.getLogger('schd')
+
+from collections import defaultdict
+from timeit import default_timer
+
+from matplotlib.backends.qt_compat import QtCore
+
+
+class RedrawScheduler(QtCore.QObject):
+    """
+    Central place for requesting redraws of the canvas.
+
+    Views mark layers as dirty, and the scheduler renders at most once per
+    frame interval (capped at `target_fps`). Any number of requests arriving
+    before the frame is due are coalesced into a single render, and nothing
+    is rendered if nothing was marked dirty.
+    """
+    LAYERS = ('lines', 'spans', 'axes', 'ticks')
+
+    def __init__(self, render, target_fps=60):
+        """
+        :param render: callable taking {view: set(layers)}, renders the canvas
+        :param target_fps: int, maximum number of renders per second
+        """
+        super(RedrawScheduler, self).__init__()
+        self.render = render
+        self.frame_interval = 1 / target_fps
+        self.dirty = defaultdict(set)
+        self.last_render = -float('inf')
+        self.n_renders = 0
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def request(self, view, *layers):
+        """
+        Mark layers of view as dirty and schedule a render
+
+        :param view: object the layers belong to (e.g. a SpanView)
+        :param layers: str, any of LAYERS
+        """
+        self.dirty[view].update(layers or self.LAYERS)
+        if self.timer.isActive():
+            return
+        wait = self.last_render + self.frame_interval - default_timer()
+        self.timer.start(max(int(wait * 1000), 0))
+
+    def flush(self):
+        """Render now if anything is dirty"""
+        self.timer.stop()
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, defaultdict(set)
+        self.last_render = default_timer()
+        self.n_renders += 1
+        logger.debug('Rendering dirty layers %s', dict(dirty))
+        self.render(dirty)
+
+    @property
+    def pending(self):
+        return bool(self.dirty)
@@ -0,0 +1,295 @@
+"""
+Session snapshots: the loaded items, their markings and the view state, saved
+to a directory that reopens quickly
+
+A session directory holds session.json and one .npy file per array:
+    session.json
+        Format, current label, displayed window (x-axis coordinates) and per
+        item its name, metadata, visibility, source file, summary and array
+        files
+    item<i>.index.npy, item<i>.values.npy
+        The series of items embedded rather than referenced by source file
+    item<i>.outline_index.npy, item<i>.outline_values.npy
+        The outline of the item, see OutlineView.outline_series
+    item<i>.markings.npy
+        The rows of the MarkingStore of the item
+
+Derived items (see derived) are saved as their expression, without arrays.
+
+Embedded arrays are memory-mapped (copy-on-write) when the session is
+restored, and the saved summaries and outlines are reused, so reopening does
+not read the series data up front.
+"""
+from __future__ import print_function, division, unicode_literals
+
+import os
+import json
+import errno
+import logging
+logger = logging.getLogger('sesn')
+
+import numpy as np
+import pandas as pd
+
+from inspector.loaders import decode_bytes, read_file
+from inspector.summary import SeriesSummary
+
+FORMAT_NAME = 'inspector-session'
+FORMAT_VERSION = 1
+SESSION_FILE = 'session.json'
+
+
+def is_session(path):
+    return os.path.isfile(os.path.join(path, SESSION_FILE))
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+
+
+def series_arrays(series):
+    """
+    :return: (index array, values array, tz name | None), the index as
+        datetime64 in UTC for a DatetimeIndex
+    """
+    index = series.index
+    tz = None
+    if isinstance(index, pd.DatetimeIndex):
+        if index.tz is not None:
+            tz = str(index.tz)
+            index = index.tz_convert('UTC').tz_localize(None)
+    index_values = np.asarray(index.values)
+    values = np.asarray(series.values)
+    for array in [index_values, values]:
+        if array.dtype.hasobject:
+            raise ValueError('Cannot embed series {} of dtype object'.format(
+                series.name
+            ))
+    return index_values, values, tz
+
+
+def arrays_series(index_values, values, tz=None, name=None):
+    """Inverse of series_arrays, without copying the arrays"""
+    if index_values.dtype.kind == 'M':
+        index = pd.DatetimeIndex(index_values, copy=False)
+        if tz is not None:
+            index = index.tz_localize('UTC').tz_convert(tz)
+    else:
+        index = pd.Index(index_values, copy=False)
+    return pd.Series(values, index=index, name=name, copy=False)
+
+
+def _x_to_json(x):
+    """x-value or interval of a SeriesSummary to a json value"""
+    if isinstance(x, pd.Timestamp):
+        return {'ns': x.value, 'tz': str(x.tz) if x.tz is not None else None}
+    if isinstance(x, pd.Timedelta):
+        return {'ns': x.value}
+    if x is None:
+        return None
+    return float(x)
+
+
+def _x_from_json(value):
+    """Inverse of _x_to_json"""
+    if not isinstance(value, dict):
+        return value
+    if 'tz' not in value:
+        return pd.Timedelta(value['ns'])
+    x = pd.Timestamp(value['ns'])
+    if value['tz'] is not None:
+        x = x.tz_localize('UTC').tz_convert(value['tz'])
+    return x
+
+
+def summary_to_json(summary):
+    """:return: dict, json serializable SeriesSummary"""
+    return dict((field, _x_to_json(value))
+                for field, value in summary._asdict().items())
+
+
+def summary_from_json(entry):
+    """:return: SeriesSummary, see summary_to_json"""
+    summary = SeriesSummary(**dict(
+        (field, _x_from_json(entry[field])) for field in SeriesSummary._fields
+    ))
+    return summary._replace(n=int(summary.n), n_nan=int(summary.n_nan))
+
+
+def _save_series(path, prefix, entry, item, embed):
+    """
+    Add the source file or the embedded arrays of item to entry, together
+    with its summary and outline
+
+    :return: bool, False if the series of item cannot be saved
+    """
+    source = getattr(item, 'source', None)
+    if not embed and source and os.path.isfile(source):
+        entry['source'] = os.path.abspath(source)
+    else:
+        try:
+            index_values, values, tz = series_arrays(item.series)
+        except ValueError as err:
+            logger.error('Not saving item {}: {}'.format(item.name, err))
+            return False
+        entry['index'] = prefix + '.index.npy'
+        entry['values'] = prefix + '.values.npy'
+        entry['tz'] = tz
+        np.save(os.path.join(path, entry['index']), index_values)
+        np.save(os.path.join(path, entry['values']), values)
+    entry['summary'] = summary_to_json(item.summary)
+    entry['sorted'] = bool(item.series.index.is_monotonic_increasing)
+    if item.outline is not None:
+        index_values, values, tz = series_arrays(item.outline)
+        entry['outline_index'] = prefix + '.outline_index.npy'
+        entry['outline_values'] = prefix + '.outline_values.npy'
+        entry['outline_tz'] = tz
+        np.save(os.path.join(path, entry['outline_index']), index_values)
+        np.save(os.path.join(path, entry['outline_values']), values)
+    return True
+
+
+def save_session(path, items, window=None, current_label=None, embed=False):
+    """
+    Write a session directory at path
+
+    :param items: [DataItem]
+    :param window: (x0, x1) | None, displayed interval in axis coordinates
+    :param current_label: str | None
+    :param embed: bool, embed the series of all items. Otherwise only items
+        without an existing source file are embedded.
+    :return: int, number of items saved
+    """
+    _makedirs(path)
+    entries = []
+    for i, item in enumerate(items):
+        prefix = 'item{}'.format(i)
+        entry = {
+            'name': item.name,
+            'metadata': item.metadata,
+            'visible': bool(item.visible),
+            'source': None,
+        }
+        if getattr(item, 'is_derived', False):
+            # Derived again when restored, from the restored items
+            entry['expression'] = item.slicer.derived.expression
+        elif not _save_series(path, prefix, entry, item, embed):
+            continue
+        store = item.markings
+        entry['markings'] = {
+            'file': prefix + '.markings.npy',
+            'is_time': store.is_time,
+            'labels': list(store.labels),
+            'notes': list(store.notes),
+        }
+        np.save(os.path.join(path, entry['markings']['file']), store.rows)
+        entries.append(entry)
+
+    # Written last, a session is complete once it has its session.json
+    tmp_path = os.path.join(path, SESSION_FILE + '.tmp')
+    with open(tmp_path, 'w') as fh:
+        json.dump({
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'items': entries,
+            'window': list(window) if window is not None else None,
+            'current_label': current_label,
+        }, fh, indent=1, default=str)
+    os.rename(tmp_path, os.path.join(path, SESSION_FILE))
+    logger.info('Saved session of {} items to {}'.format(len(entries), path))
+    return len(entries)
+
+
+def read_session(path):
+    """:return: dict, contents of session.json"""
+    with open(os.path.join(path, SESSION_FILE)) as fh:
+        session = json.load(fh)
+    if session.get('format') != FORMAT_NAME:
+        raise ValueError('{} is not a session'.format(path))
+    return session
+
+
+def iter_series(path, session, mmap=True):
+    """
+    Series of the items in session, embedded ones memory-mapped and
+    referenced ones decoded from their source files (each read once).
+    Derived items are not included.
+
+    :return: iterator of (item entry, pd.Series)
+    """
+    mmap_mode = 'c' if mmap else None
+    sources = {}
+    for entry in session['items']:
+        if entry.get('expression'):
+            continue  # Derived, see derived_entries
+        source = entry.get('source')
+        if source is None:
+            series = arrays_series(
+                np.load(os.path.join(path, entry['index']),
+                        mmap_mode=mmap_mode),
+                np.load(os.path.join(path, entry['values']),
+                        mmap_mode=mmap_mode),
+                tz=entry.get('tz'),
+                name=entry['name'],
+            )
+        else:
+            if source not in sources:
+                try:
+                    seria = decode_bytes(read_file(source), data_source=source)
+                except (IOError, OSError) as err:
+                    logger.error('Could not read {}: {}'.format(source, err))
+                    seria = None
+                sources[source] = dict(
+                    (str(series.name), series) for series in seria or []
+                )
+            series = sources[source].get(entry['name'])
+            if series is None:
+                logger.error('Found no series {} in {}'.format(
+                    entry['name'], source
+                ))
+                continue
+        yield entry, series
+
+
+def derived_entries(session):
+    """
+    :return: [item entry] of the derived items in session, to be derived
+        again (see Model.add_derived_item) once the other items are restored
+    """
+    return [entry for entry in session['items'] if entry.get('expression')]
+
+
+def entry_outline(path, entry):
+    """:return: pd.Series | None, the saved outline of the item entry"""
+    if not entry.get('outline_index'):
+        return None
+    return arrays_series(np.load(os.path.join(path, entry['outline_index'])),
+                         np.load(os.path.join(path, entry['outline_values'])),
+                         tz=entry.get('outline_tz'), name=entry['name'])
+
+
+def entry_summary(entry):
+    """:return: SeriesSummary | None, the saved summary of the item entry"""
+    if not entry.get('summary'):
+        return None
+    return summary_from_json(entry['summary'])
+
+
+def marking_columns(path, entry):
+    """
+    :return: (starts, ends, labels, notes) of the saved markings of the item
+        entry, for MarkingStore.extend
+    """
+    markings = entry['markings']
+    rows = np.load(os.path.join(path, markings['file']))
+    starts, ends = rows['start'], rows['end']
+    if markings['is_time']:
+        starts = starts.view('datetime64[ns]')
+        ends = ends.view('datetime64[ns]')
+    labels = np.array(markings['labels'], dtype=object)[rows['label']]
+    notes = np.array(markings['notes'] + [None], dtype=object)[rows['note']]
+    return starts, ends, labels, notes
@@ -0,0 +1,265 @@
+from __future__ import print_function, division
+
+import logging
+logger = logging.getLogger('slic')
+
+import warnings
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def index_keys(index):
+    """
+    Return the raw, sortable key array behind a pandas index without copying
+    when possible (int64 nanoseconds for datetime indexes, numbers otherwise)
+
+    :param index: pd.Index
+    :return: np.ndarray
+    """
+    if isinstance(index, pd.DatetimeIndex):
+        return index.values.view(np.int64)
+    return np.asarray(index.values)
+
+
+def value_to_key(value, dtype):
+    """
+    Convert a single x-value (datetime, pd.Timestamp, np.datetime64 or number)
+    to the same key space as `index_keys`
+
+    :param dtype: np.dtype of the index values
+    """
+    if dtype.kind == 'M':
+        return np.datetime64(value).astype(dtype).astype(np.int64)
+    return value
+
+
+def values_to_keys(values, dtype):
+    """
+    Vectorized `value_to_key`, for a sequence of x-values (datetimes, ISO 8601
+    strings, np.datetime64 or numbers)
+
+    :return: np.ndarray
+    """
+    if dtype.kind == 'M':
+        if isinstance(values, np.ndarray) and values.dtype.kind == 'M':
+            return values.astype(dtype).astype(np.int64)
+        # Much faster than np.asarray(values, 'datetime64[ns]') for
+        # pd.Timestamps and datetimes
+        return pd.DatetimeIndex(list(values)).values.astype(dtype)\
+                 .astype(np.int64)
+    return np.asarray(values)
+
+
+def _date_epoch():
+    """:return: float, matplotlib date number of 1970-01-01"""
+    from matplotlib.dates import date2num
+    return date2num(datetime(1970, 1, 1))
+
+
+def date_numbers(values):
+    """
+    Vectorized conversion of datetime64 values (naive, UTC) to matplotlib
+    date numbers
+
+    :param values: np.ndarray of datetime64, in any unit
+    :return: np.ndarray of float64
+    """
+    unit = np.datetime_data(values.dtype)[0]
+    per_day = np.timedelta64(1, 'D') // np.timedelta64(1, unit)
+    return _date_epoch() + values.view(np.int64) / per_day
+
+
+def date_number(value):
+    """
+    :param value: datetime, pd.Timestamp or np.datetime64
+    :return: float, matplotlib date number of value
+    """
+    return _date_epoch() + pd.Timestamp(value).value / 86400e9
+
+
+def from_date_number(number):
+    """:return: naive datetime (UTC) of a matplotlib date number"""
+    micros = int(round((number - _date_epoch()) * 86400e6))
+    return datetime(1970, 1, 1) + timedelta(microseconds=micros)
+
+
+def axis_values(values):
+    """
+    :param values: np.ndarray of index values
+    :return: np.ndarray of float64 x-coordinates on a matplotlib axis
+    """
+    if values.dtype.kind == 'M':
+        return date_numbers(values)
+    return np.asarray(values, dtype=float)
+
+
+def nanminmax(values):
+    """
+    Return (min, max) of values ignoring NaN, or (nan, nan) if there are no
+    valid values.
+    """
+    if not len(values):
+        return np.nan, np.nan
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmin(values), np.nanmax(values)
+
+
+def _gallop(keys, key, hint, side):
+    """
+    np.searchsorted(keys, key, side), but starting from position `hint` and
+    widening the searched range exponentially. Costs O(log d) where d is the
+    distance between hint and the result, instead of O(log n).
+    """
+    n = len(keys)
+    hint = min(max(hint, 0), n)
+    if side == 'left':
+        before = lambda i: keys[i] < key
+    else:
+        before = lambda i: keys[i] <= key
+
+    if hint < n and before(hint):
+        # Result lies to the right of hint
+        lo = hint + 1
+        hi = lo
+        step = 1
+        while hi < n and before(hi):
+            lo = hi + 1
+            hi = lo + step
+            step *= 2
+        hi = min(hi, n)
+    else:
+        # Result lies at or to the left of hint
+        hi = hint
+        step = 1
+        lo = hi - step
+        while lo > 0 and not before(lo):
+            hi = lo
+            step *= 2
+            lo = hi - step
+        lo = max(lo, 0)
+    return lo + int(np.searchsorted(keys[lo:hi], key, side=side))
+
+
+class IndexSlicer(object):
+    """
+    Resolves x-intervals of a series to positional bounds using searchsorted
+    on the raw index array, and hands out zero-copy views of index and values.
+
+    The bounds of the last lookup are remembered, so that consecutive lookups
+    of nearby intervals (panning, paging) only search locally.
+    """
+    def __init__(self, series, is_sorted=False):
+        """
+        :param series: pd.Series
+        :param is_sorted: bool, the index is known to be sorted, e.g. when
+            restored from a session, which skips checking it
+        """
+        index = series.index
+        self.is_time = isinstance(index, pd.DatetimeIndex)
+        if not is_sorted and not index.is_monotonic_increasing:
+            logger.warning('Index of series %s is not sorted, sorting a copy',
+                           series.name)
+            series = series.sort_index()
+            index = series.index
+        self.keys = index_keys(index)
+        self.index_values = index.values
+        self.index_dtype = self.index_values.dtype
+        self.values = series.values
+        self._axis_values = None
+        self._last_keys = None
+        self._last_bounds = (0, 0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def axis_values(self):
+        """
+        Index as float64 x-coordinates on a matplotlib axis (date numbers for
+        datetime indexes), converted once on first use
+        """
+        if self._axis_values is None:
+            self._axis_values = axis_values(self.index_values)
+        return self._axis_values
+
+    def bounds(self, x0, x1, remember=True):
+        """
+        Return positions (i0, i1) such that [i0:i1] covers all index values
+        in the closed interval [x0, x1], same as `series.loc[x0:x1]`
+
+        :param remember: bool, cache the result as the last lookup. Lookups
+            made from other threads than the GUI thread must pass False.
+        """
+        k0 = value_to_key(x0, self.index_values.dtype)
+        k1 = value_to_key(x1, self.index_values.dtype)
+        if remember and self._last_keys == (k0, k1):
+            return self._last_bounds
+        hint0, hint1 = self._last_bounds
+        i0 = _gallop(self.keys, k0, hint0, side='left')
+        i1 = max(_gallop(self.keys, k1, hint1, side='right'), i0)
+        if remember:
+            self._last_keys = (k0, k1)
+            self._last_bounds = (i0, i1)
+        return i0, i1
+
+    def slice(self, x0, x1, remember=True):
+        """
+        :return: (index values, values) as views for the interval [x0, x1]
+        """
+        i0, i1 = self.bounds(x0, x1, remember=remember)
+        return self.index_values[i0:i1], self.values[i0:i1]
+
+    def axis_slice(self, x0, x1, remember=True):
+        """
+        :return: (axis_values, values) as views for the interval [x0, x1]
+        """
+        i0, i1 = self.bounds(x0, x1, remember=remember)
+        return self.axis_values[i0:i1], self.values[i0:i1]
+
+    def window_arrays(self, x0, x1):
+        """
+        :return: (keys, axis values, values, i0, i1), arrays covering the
+            interval [x0, x1] and its positions in them. For algorithms that
+            look beyond the interval, such as cleaning.clean_window.
+        """
+        i0, i1 = self.bounds(x0, x1, remember=False)
+        return self.keys, self.axis_values, self.values, i0, i1
+
+    def head(self, n):
+        return self.index_values[:n], self.values[:n]
+
+
+def minmax_decimate(x_values, y_values, max_points):
+    """
+    Reduce (x, y) to at most about `max_points` points, keeping the minimum
+    and maximum of each bucket so that peaks survive decimation. Very long
+    inputs are strided first to bound the cost.
+
+    :return: (x, y) views if no decimation was needed, else new arrays
+    """
+    n = len(y_values)
+    if n <= max_points:
+        return x_values, y_values
+    stride = n // (max_points * 64)
+    if stride > 1:
+        x_values, y_values = x_values[::stride], y_values[::stride]
+        n = len(y_values)
+    n_buckets = max(max_points // 2, 1)
+    bucket_size = -(-n // n_buckets)  # ceil
+    n_full = (n // bucket_size) * bucket_size
+    buckets = y_values[:n_full].reshape(-1, bucket_size)
+    offsets = np.arange(0, n_full, bucket_size)
+    positions = np.sort(np.column_stack([
+        offsets + buckets.argmin(axis=1),
+        offsets + buckets.argmax(axis=1),
+    ]), axis=1).ravel()
+    if n_full < n:
+        tail = y_values[n_full:]
+        positions = np.concatenate([positions, np.sort(
+            n_full + np.array([tail.argmin(), tail.argmax()])
+        )])
+    return x_values[positions], y_values[positions]
@@ -2,16 +2,28 @@ from __future__ import print_function, division
 
 import logging
 
+import numpy as np
 import pandas as pd
 
-from operator import itemgetter, attrgetter
-from collections import defaultdict
+from operator import attrgetter
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+from timeit import default_timer
 
 from matplotlib.widgets import SpanSelector
-from matplotlib.dates import date2num, num2date, DateLocator
-from matplotlib.patches import Polygon
+from matplotlib.lines import Line2D
+from matplotlib.collections import LineCollection, PolyCollection
 
 from inspector.helpers import pyqtSignal
+from inspector.slicing import (
+    nanminmax,
+    minmax_decimate,
+    axis_values,
+    date_number,
+    from_date_number,
+)
+from inspector.cleaning import clean_window
+from inspector.tracing import tracer
 from matplotlib.backends.qt_compat import QtWidgets, QtCore, QtGui
 
 from inspector.constants import (
@@ -29,7 +41,195 @@ from inspector.constants import (
 logger = logging.getLogger('span')
 
 
+# Data for displaying an interval in DetailView
+# slices: [(DataItem, x values, y values)], ylim: (ymin, ymax)
+PreparedInterval = namedtuple('PreparedInterval', ['x0', 'x1', 'slices', 'ylim'])
+
+
+def item_positions(items):
+    """:return: {id(item): position in items}, for picking colors"""
+    return dict((id(item), idx) for idx, item in enumerate(items))
+
+
+def item_color(idx):
+    """:return: (r, g, b) of the line of the item at position idx"""
+    return QtGui.QColor(COLORS[idx % len(COLORS)]).getRgbF()[:3]
+
+
+class CollectionLine(object):
+    """
+    The line of one item drawn as part of an OutlineCollection. Stands in for
+    a Line2D towards SpanView (visibility, visibility callbacks, data, color).
+    """
+    def __init__(self, collection, vertices, color, label):
+        """
+        :param vertices: (n, 2) float array in axis coordinates
+        """
+        self.collection = collection
+        self.vertices = vertices
+        self.color = color
+        self.label = label
+        self.visible = True
+        self._callbacks = []
+
+    def get_xdata(self):
+        return self.vertices[:, 0]
+
+    def get_ydata(self):
+        return self.vertices[:, 1]
+
+    def get_color(self):
+        return self.color
+
+    def get_label(self):
+        return self.label
+
+    def get_visible(self):
+        return self.visible
+
+    def set_visible(self, visible):
+        if visible == self.visible:
+            return
+        self.visible = visible
+        self.collection.changed()
+        for func in self._callbacks:
+            func(self)
+
+    def set_data(self, x_values, y_values):
+        """:param x_values: array in axis coordinates"""
+        self.vertices = np.column_stack([np.asarray(x_values, dtype=float),
+                                         np.asarray(y_values, dtype=float)])
+        self.collection.changed()
+
+    def add_callback(self, func):
+        self._callbacks.append(func)
+        return len(self._callbacks) - 1
+
+    def remove(self):
+        self.collection.remove_line(self)
+
+
+class OutlineCollection(LineCollection):
+    """
+    A single LineCollection drawing the lines of many items, cheaper to build
+    and draw than one Line2D per item. Segments are gathered from the visible
+    CollectionLines when drawn, so adding, removing and hiding lines is cheap.
+    """
+    def __init__(self, **kwargs):
+        super(OutlineCollection, self).__init__([], **kwargs)
+        self.lines = []
+        self._dirty = False
+
+    def add_line(self, x_values, y_values, color, label):
+        """
+        :param x_values: array in axis coordinates
+        :return: CollectionLine
+        """
+        vertices = np.column_stack([np.asarray(x_values, dtype=float),
+                                    np.asarray(y_values, dtype=float)])
+        line = CollectionLine(self, vertices, color, label)
+        self.lines.append(line)
+        self.changed()
+        return line
+
+    def remove_line(self, line):
+        self.lines.remove(line)
+        self.changed()
+
+    def changed(self):
+        self._dirty = True
+        self.stale = True
+
+    def draw(self, renderer):
+        if self._dirty:
+            visible = [line for line in self.lines if line.visible]
+            self.set_segments([line.vertices for line in visible])
+            self.set_color([line.color for line in visible])
+            self._dirty = False
+        super(OutlineCollection, self).draw(renderer)
+
+
+class MarkingCollection(PolyCollection):
+    """
+    A single PolyCollection drawing the spans of all markings of one label in
+    a SpanView, cheaper to build and draw than one axvspan per marking. Like
+    OutlineCollection, the spans of the visible items are gathered when
+    drawn. Picks are mapped back to markings by their index (see marking_at).
+    """
+    def __init__(self, axes, is_visible, **kwargs):
+        """
+        :param is_visible: function item -> bool, whether the spans of item
+            are shown
+        """
+        super(MarkingCollection, self).__init__(
+            [], transform=axes.get_xaxis_transform(), picker=True, **kwargs
+        )
+        self.is_visible = is_visible
+        # marking -> (item, x0, x1), x in axis coordinates
+        self.spans = OrderedDict()
+        # The markings drawn, in the order of their paths
+        self.drawn = []
+        self._dirty = False
+
+    def add_span(self, item, marking, x0, x1):
+        self.spans[marking] = (item, x0, x1)
+        self.changed()
+
+    def remove_span(self, marking):
+        """:return: the item of marking"""
+        item, x0, x1 = self.spans.pop(marking)
+        self.changed()
+        return item
+
+    def remove_item(self, item):
+        """:return: [Marking], the markings of item removed"""
+        removed = [marking for marking, (span_item, x0, x1)
+                   in self.spans.items() if span_item is item]
+        for marking in removed:
+            del self.spans[marking]
+        if removed:
+            self.changed()
+        return removed
+
+    def marking_at(self, idx):
+        """:return: (item, marking) drawn as the path at idx"""
+        marking = self.drawn[idx]
+        return self.spans[marking][0], marking
+
+    def changed(self):
+        self._dirty = True
+        self.stale = True
+
+    def draw(self, renderer):
+        if self._dirty:
+            self.drawn = []
+            bounds = []
+            for marking, (item, x0, x1) in self.spans.items():
+                if self.is_visible(item):
+                    self.drawn.append(marking)
+                    bounds.append((x0, x1))
+            vertices = np.zeros((len(bounds), 4, 2))
+            if bounds:
+                bounds = np.array(bounds, dtype=float)
+                vertices[:, :2, 0] = bounds[:, :1]
+                vertices[:, 2:, 0] = bounds[:, 1:]
+                vertices[:, 1:3, 1] = 1  # Axes height, see axvspan
+            self.set_verts(vertices)
+            self._dirty = False
+        super(MarkingCollection, self).draw(renderer)
+
+
 class CompatibleSpanSelector(SpanSelector):
+    def set_background(self, background):
+        """
+        Use background, from canvas.copy_from_bbox, to blit the selector
+        over. Unlike update_background, never redraws the canvas.
+        """
+        if hasattr(self, '_save_blit_background'):  # matplotlib >= 3.10
+            self._save_blit_background(background)
+        else:
+            self.background = background
+
     def ignore(self, event):
         if self.ax.figure.canvas.toolbar.mode != '':
             return True
@@ -43,7 +243,7 @@ class SpanView(QtCore.QObject):
     (outline-view and detail-view)
     Handles coordinate transformations and various object lookup mappings
     """
-    sig_redraw_request = pyqtSignal()
+    sig_redraw_request = pyqtSignal(object, object)  # view, layers
     def __init__(self, axes, span_facecolor):
         super(SpanView, self).__init__()
         self.axes = axes
@@ -57,29 +257,34 @@ class SpanView(QtCore.QObject):
             'horizontal',
             useblit=True,
             rectprops=self.span_plotprops.copy(),  # NOTE: copy, will be mutated
+            onmove_callback=self.on_span_move,
         )
-        # TODO Use real index-providing datastructure
+        # Marking -> the MarkingCollection of its label
         self.marking2span = {}
-        self.span2marking = {}
-        self.span2item = {}
-        self.item2spans = defaultdict(lambda: [])
+        self.label2spans = OrderedDict()
         self.item2line = {}
-
-    def axis_has_datelocator(self, axis):
-        return any(map(
-            lambda locator: isinstance(locator, DateLocator),
-            [axis.get_minor_locator(), axis.get_major_locator()]
-        ))
+        # Whether the x-axis shows dates, resolved by the first items added
+        self.is_time = None
+        # Axes without spans as of the last render, see render_spans
+        self.background = None
+
+    def set_axis_kind(self, is_time):
+        """Make the x-axis a date axis if is_time, once"""
+        if self.is_time is not None:
+            return
+        self.is_time = is_time
+        if is_time:
+            self.axes.xaxis_date()
 
     def from_xaxis(self, value):
-        if self.axis_has_datelocator(self.axes.xaxis):
-            return num2date(value).replace(tzinfo=None)
+        if self.is_time:
+            return from_date_number(value)
         else:
             return value
 
     def to_xaxis(self, value):
-        if self.axis_has_datelocator(self.axes.xaxis):
-            return date2num(value)
+        if self.is_time:
+            return date_number(value)
         else:
             return value
 
@@ -94,6 +299,23 @@ class SpanView(QtCore.QObject):
         logger.debug('Setting ylim (%s)' %self)
         self.axes.set_ylim(y0, y1)
 
+    def make_line(self, x_values, y_values, color, label):
+        """
+        Add a Line2D of x values in axis coordinates (see
+        IndexSlicer.axis_values)
+        """
+        line = Line2D(
+            x_values,
+            y_values,
+            label=label,
+            picker=5,
+            color=color,
+            alpha=DATA_ALPHA,
+            linewidth=LINEWIDTH,
+        )
+        self.axes.add_line(line)
+        return line
+
     def item_changed(self, item):
         check_state = item.checkState()
         try:
@@ -108,84 +330,187 @@ class SpanView(QtCore.QObject):
             self.toggle_visible(item, check_state)
 
     def toggle_visible(self, item, new_value=None):
-        if new_value is not None:
-            self.item2line[item].set_visible(new_value)
-        else:
-            self.item2line[item].set_visible(
-                not self.item2line[item].get_visible()
-            )
-        self.redraw()
+        line = self.item2line[item]
+        if new_value is None:
+            new_value = not line.get_visible()
+        elif bool(new_value) == line.get_visible():
+            return
+        line.set_visible(bool(new_value))
+        for spans in self.label2spans.values():
+            spans.changed()
+        self.redraw('lines', 'spans')
 
     def on_span_select(self, x0, x1):
         raise NotImplementedError('has to be overridden in subclass')
 
-    def make_span(self, x0, x1, color, draw=True, alpha=SPAN_ALPHA):
-        logger.debug('Creating span (%s)' %self)
-        x0_ordinal, x1_ordinal = list(map(self.to_xaxis, [x0, x1]))
-        span = self.axes.axvspan(
-            x0_ordinal,
-            x1_ordinal,
-            color=color,
-            alpha=alpha,
-            picker=5,
-        )
-        self.axes.draw_artist(span)
-        self.redraw()
+    def on_span_move(self, x0, x1):
+        """Called continuously while a span is being dragged"""
+        pass
+
+    def label_spans(self, label):
+        """:return: MarkingCollection of the markings of label"""
+        spans = self.label2spans.get(label, None)
+        if spans is None:
+            spans = MarkingCollection(
+                self.axes,
+                lambda item: self.item2line[item].get_visible(),
+                facecolor=LABEL_COLOR_MAP[label],
+                edgecolor=LABEL_COLOR_MAP[label],
+                alpha=SPAN_ALPHA,
+            )
+            self.axes.add_collection(spans, autolim=False)
+            self.label2spans[label] = spans
+        return spans
+
+    def redraw(self, *layers):
+        """
+        Request a redraw of the given layers (see RedrawScheduler.LAYERS),
+        or of everything if none are given
+        """
+        logger.debug('Requesting redraw of %s (%s)', layers, self)
+        self.sig_redraw_request.emit(self, layers)
+
+    def span_artists(self):
+        """:return: [Artist], the visible spans"""
+        return [spans for spans in self.label2spans.values()
+                if spans.get_visible()]
+
+    def overlay_artists(self):
+        """
+        :return: [Artist], the visible spans and data lines in z-order (the
+            spans below the lines), drawn over the background
+        """
+        data = [artist for artist in list(self.axes.lines)
+                + list(self.axes.collections)
+                if not isinstance(artist, MarkingCollection)]
+        return sorted([artist for artist in data if artist.get_visible()]
+                      + self.span_artists(), key=lambda a: a.get_zorder())
+
+    @contextmanager
+    def overlay_hidden(self):
+        """Hide the overlay artists, e.g. while the background is drawn"""
+        artists = self.overlay_artists()
+        for artist in artists:
+            artist.set_visible(False)
+        try:
+            yield
+        finally:
+            for artist in artists:
+                artist.set_visible(True)
+
+    def draw_overlay(self, canvas):
+        """
+        Save the axes drawn without the overlay as the background, then draw
+        the overlay over it. The selector saves the result as its own
+        background.
+        """
+        self.background = canvas.copy_from_bbox(self.axes.bbox)
+        for artist in self.overlay_artists():
+            self.axes.draw_artist(artist)
+        self.selector.set_background(canvas.copy_from_bbox(self.axes.bbox))
 
-        return span
+    @tracer.traced('span.render_spans')
+    def render_spans(self, canvas):
+        """
+        Redraw only the spans and the lines over them, over the background
+        of the last render
+        """
+        canvas.restore_region(self.background)
+        for artist in self.overlay_artists():
+            self.axes.draw_artist(artist)
+        self.selector.set_background(canvas.copy_from_bbox(self.axes.bbox))
+        canvas.blit(self.axes.bbox)
+
+    @tracer.traced('span.render_band')
+    def render_band(self, canvas, band):
+        """
+        Redraw only the axes, with its ticks and labels, and the spans
 
-    def redraw(self):
-        logger.debug('Requesting redraw (%s)' %self)
-        self.sig_redraw_request.emit()
+        :param band: Bbox in display coordinates, the part of the figure
+            holding this view and nothing else, see View.render_figure
+        :return: bool, False if texts around the axes, e.g. an offset text
+            above it, reach out of band and the figure has to be redrawn
+        """
+        figure = canvas.figure
+        # Clear the band with the figure background
+        figure.patch.set_clip_box(band)
+        try:
+            figure.draw_artist(figure.patch)
+        finally:
+            figure.patch.set_clip_box(None)
+        with self.overlay_hidden():
+            figure.draw_artist(self.axes)
+        renderer = canvas.get_renderer()
+        axes = self.axes
+        for text in [axes.title, axes.xaxis.label, axes.yaxis.label,
+                     axes.xaxis.offsetText, axes.yaxis.offsetText]:
+            if not (text.get_visible() and text.get_text()):
+                continue
+            extent = text.get_window_extent(renderer)
+            if extent.y0 < band.y0 or extent.y1 > band.y1:
+                return False
+        self.draw_overlay(canvas)
+        canvas.blit(band)
+        return True
 
     def data_limits(self):
-        seria = [i.series for i in self.items]
-        ymin = min([s.min() for s in seria])
-        ymax = max([s.max() for s in seria])
-        xmin = min([s.index.min() for s in seria])
-        xmax = max([s.index.max() for s in seria])
-        return (xmin, xmax), (ymin, ymax)
+        xlims, ylims = zip(*[item.data_limits() for item in self.items])
+        xmins, xmaxs = zip(*xlims)
+        ymins, ymaxs = zip(*ylims)
+        return (min(xmins), max(xmaxs)), (min(ymins), max(ymaxs))
 
     def remove_item(self, item):
-        for span in self.item2spans[item]:
-            self.span2item.pop(span)
-            marking = self.span2marking.pop(span)
-            self.marking2span.pop(marking)
-            span.remove()
-        self.item2spans.pop(item)
+        self.detach_item(item)
+        self.redraw('lines', 'spans')
+
+    def remove_items(self, items):
+        for item in items:
+            self.detach_item(item)
+        self.redraw('lines', 'spans')
+
+    def detach_item(self, item):
+        """Remove the artists of item, without redrawing"""
+        for spans in self.label2spans.values():
+            for marking in spans.remove_item(item):
+                del self.marking2span[marking]
         line = self.item2line.pop(item)
         line.remove()
-        self.redraw()
 
-    def add_marking_span(self, item, marking):
-        span = self.make_span(
-            marking.start,
-            marking.end,
-            color=LABEL_COLOR_MAP[marking.label],
-        )
-        self.span2item[span] = item
-        self.span2marking[span] = marking
-        self.marking2span[marking] = span
-        self.item2spans[item].append(span)
-        self.item2line[item].add_callback(
-            lambda line: span.set_visible(line.get_visible())
-        )
-        self.redraw()
+    def add_marking_span(self, item, marking, draw=True):
+        self.add_marking_spans(item, [marking], draw)
+
+    @tracer.traced('span.create')
+    def add_marking_spans(self, item, markings, draw=True):
+        """Add spans for many markings, requesting a single redraw"""
+        logger.debug('Creating %d spans (%s)', len(markings), self)
+        for marking in markings:
+            spans = self.label_spans(marking.label)
+            spans.add_span(item, marking, self.to_xaxis(marking.start),
+                           self.to_xaxis(marking.end))
+            self.marking2span[marking] = spans
+        # Spans of hidden items change nothing visible
+        if draw and self.item2line[item].get_visible():
+            self.redraw('spans')
 
     def update_span_color(self, mark):
-        self.marking2span[mark].set_color(LABEL_COLOR_MAP[mark.label])
-        self.redraw()
+        """Move the span of mark to the collection of its new label"""
+        item = self.marking2span[mark].remove_span(mark)
+        self.add_marking_spans(item, [mark])
 
     def remove_marking_span(self, item, mark):
-        span = self.marking2span.pop(mark)
-        self.span2marking.pop(span)
-        self.span2item.pop(span)
-        self.item2spans[item].remove(span)
-        span.remove()
+        self.remove_marking_spans(item, [mark])
+
+    def remove_marking_spans(self, item, markings):
+        """Remove the spans of many markings, requesting a single redraw"""
+        for marking in markings:
+            self.marking2span.pop(marking).remove_span(marking)
+        if self.item2line[item].get_visible():
+            self.redraw('spans')
 
 
 class OutlineView(SpanView):
     sig_interval_selected = pyqtSignal(object, object)
+    sig_interval_previewed = pyqtSignal(object, object)
     def __init__(self, axes, item_container):
         """
         axes : matplotlib Axes
@@ -197,11 +522,25 @@ class OutlineView(SpanView):
         self.items = item_container
         self.do_resample_threshold = 8000
         self.resampled_n_points = 2000
+        # Items added this many at a time are drawn by one LineCollection
+        self.collection_min_items = 50
+        self.collection = None
         self.current_span = None
+        # Live preview of the detail view while dragging, at most this often
+        self.live_preview = True
+        self.preview_interval_s = 1 / 25
+        self._last_preview = 0
+
+    def set_live_preview(self, enabled):
+        self.live_preview = bool(enabled)
 
     def remove_item(self, item):
-        super(OutlineView, self).remove_item(item)
+        self.remove_items([item])
+
+    def remove_items(self, items):
+        super(OutlineView, self).remove_items(items)
         self.set_axes_limits_from_data()
+        self.redraw('axes', 'ticks')
 
     def set_axes_limits_from_data(self):
         if not self.items:
@@ -210,14 +549,30 @@ class OutlineView(SpanView):
         self.set_xlim(*xlim)
         self.set_ylim(*ylim)
 
-    def add_item(self, item):
-        n_data = len(item.series)
+    def outline_series(self, item):
+        """
+        Return the series of item as shown in the outline, precomputed (e.g.
+        by the decoded-file cache or a session) or resampled. The resampled
+        series is kept as item.outline, e.g. for saving in sessions.
+        """
+        if item.outline is None:
+            item.outline = self.resample(item.series)
+        return item.outline
+
+    @tracer.traced('outline.resample')
+    def resample(self, series):
+        """
+        Return series resampled to about `resampled_n_points` values if it is
+        longer than `do_resample_threshold`
+        """
+        n_data = len(series)
+        original = series
         if n_data < self.do_resample_threshold:
-            series = item.series
-        elif isinstance(item.series.index, pd.DatetimeIndex):
-            if len(item.series) >= 2:
+            pass
+        elif isinstance(series.index, pd.DatetimeIndex):
+            if len(series) >= 2:
                 time_span = (
-                    item.series.index[-1] - item.series.index[0]
+                    series.index[-1] - series.index[0]
                 ).total_seconds()
                 new_period = time_span / self.resampled_n_points
                 if time_span / n_data <= 0.1:  # If the avg freq is > 10Hz
@@ -232,58 +587,117 @@ class OutlineView(SpanView):
                     )
                 logging.debug('Using new period {} for outline resample'
                               ''.format(new_period))
-                series = item.series.resample(new_period).mean()
+                series = series.resample(new_period).mean()
         else:
-            take_every_nth = int(len(item.series) / self.resampled_n_points)
-            series = item.series.iloc[::take_every_nth]
+            take_every_nth = int(len(series) / self.resampled_n_points)
+            series = series.iloc[::take_every_nth]
         logging.debug(
             'Resampled outline view from {} to {}'.format(
-                len(item.series),
+                len(original),
                 len(series)
             )
         )
-        idx = self.items.index(item)
-        rgb_tuple = QtGui.QColor(COLORS[min(idx, len(COLORS))]).getRgbF()[:3]
-        series.plot(
-            ax=self.axes,
-            label=item.name,
-            x_compat=True,
-            picker=5,
-            rot=0,
-            color=rgb_tuple,
-            alpha=DATA_ALPHA,
-            linewidth=LINEWIDTH,
-        )
-        if not self.item2line:
+        return series
+
+    def add_item(self, item):
+        self.add_items([item])
+
+    @tracer.traced('outline.add_items')
+    def add_items(self, items):
+        """
+        Plot items, then select the initial interval (if these are the
+        first items) and update the limits once
+        """
+        first_items = not self.item2line
+        self.set_axis_kind(items[0].slicer.is_time)
+        positions = item_positions(self.items)
+        in_collection = len(items) >= self.collection_min_items
+        for item in items:
+            self.plot_item(item, positions[id(item)], in_collection)
+        if first_items:
+            item = items[0]
             end_idx = min(50000, len(item.series) // FRACTION_PRESHOWN)
             self.on_span_select(
                 self.to_xaxis(item.series.index[0]),
                 self.to_xaxis(item.series.index[end_idx])
             )
-        self.item2line[item] = self.axes.lines[-1]
         self.set_axes_limits_from_data()
-        self.redraw()
+        self.redraw('lines', 'axes', 'ticks')
+
+    def plot_item(self, item, idx, in_collection=False):
+        """
+        :param in_collection: bool, draw item as part of the OutlineCollection
+            rather than as a Line2D of its own
+        """
+        series = self.outline_series(item)
+        x_values = axis_values(np.asarray(series.index.values))
+        y_values = np.asarray(series.values)
+        with tracer.span('outline.plot'):
+            if in_collection:
+                if self.collection is None:
+                    self.collection = OutlineCollection(alpha=DATA_ALPHA,
+                                                        linewidths=LINEWIDTH)
+                    self.axes.add_collection(self.collection, autolim=False)
+                line = self.collection.add_line(x_values, y_values,
+                                                item_color(idx), item.name)
+            else:
+                line = self.make_line(x_values, y_values, item_color(idx),
+                                      item.name)
+        self.item2line[item] = line
+
+    @tracer.traced('outline.replot_items')
+    def replot_items(self, items):
+        """
+        Plot the outline of items again, e.g. after data was appended (see
+        Model.append_data), then update the limits once
+        """
+        for item in items:
+            series = self.outline_series(item)
+            self.item2line[item].set_data(
+                axis_values(np.asarray(series.index.values)),
+                np.asarray(series.values)
+            )
+        self.set_axes_limits_from_data()
+        self.redraw('lines', 'axes', 'ticks')
+
+    def span_artists(self):
+        spans = super(OutlineView, self).span_artists()
+        if self.current_span is not None and self.current_span.get_visible():
+            spans.append(self.current_span)
+        return spans
 
     def set_current_span(self, x0, x1):
         if self.current_span is not None:
             self.current_span.remove()
         self.current_span = self.axes.axvspan(x0, x1, **self.span_plotprops)
+        self.redraw('spans')
 
     def display_maximal_interval(self):
         if not self.items:
             firsts, lasts = [0], [1]
         elif any(map(attrgetter('visible'), self.items)):
             firsts, lasts = zip(*
-                [itemgetter(0, -1)(d.series.index) for d in self.items if d.visible]
+                [(d.summary.first, d.summary.last) for d in self.items if d.visible]
             )
         else: # Use global data min-max if none are visible
             firsts, lasts = zip(*
-                [itemgetter(0, -1)(d.series.index) for d in self.items]
+                [(d.summary.first, d.summary.last) for d in self.items]
             )
         xmin = self.to_xaxis(min(firsts))
         xmax = self.to_xaxis(max(lasts))
         self.on_span_select(xmin, xmax)
 
+    def on_span_move(self, x0, x1):
+        if not self.live_preview or x0 == x1:
+            return
+        now = default_timer()
+        if now - self._last_preview < self.preview_interval_s:
+            return
+        self._last_preview = now
+        self.sig_interval_previewed.emit(self.from_xaxis(x0),
+                                         self.from_xaxis(x1))
+
+    @tracer.traced('outline.select')
     def on_span_select(self, x0, x1):
         if x0 == x1:
             return
@@ -303,44 +717,86 @@ class DetailView(SpanView):
         super(DetailView, self).__init__(axes, span_facecolor='red')
         self.axes.set_autoscaley_on(False)
         self.items = item_container
+        # Maximum number of points per line while previewing an interval
+        self.preview_n_points = 2000
+        # Maximum number of points per line in prefetched windows, high
+        # enough to look the same as full resolution at any window width
+        self.prefetch_n_points = 20000
+        # Overlay of the cleaned version of each item, see set_show_cleaned
+        self.show_cleaned = False
+        self.item2cleaned_line = {}
+        # (item, item.markings_version, x0, x1) -> (x values, y values)
+        self.cleaned_cache = OrderedDict()
+        self.cleaned_cache_size = 64
 
     def add_item(self, item):
+        self.add_items([item])
+
+    @tracer.traced('detail.add_items')
+    def add_items(self, items):
+        """Plot items, then display the interval once"""
         if not self.item2line:
+            item = items[0]
             start = item.series.index[0]
             end_idx = min(50000, len(item.series) // FRACTION_PRESHOWN)
             end = item.series.index[end_idx]
         else:
             start, end = self.get_xlim()
-        idx = self.items.index(item)
-        data_slice = item.series.loc[start:end]
-        if data_slice.empty:
-            data_slice = item.series.iloc[0:10]
-        rgb_tuple = QtGui.QColor(COLORS[min(idx, len(COLORS))]).getRgbF()[:3]
-        data_slice.plot(
-            ax=self.axes,
-            label=item.name,
-            x_compat=True,
-            picker=5,
-            rot=XTICK_ROTATION,
-            color=rgb_tuple,
-            alpha=DATA_ALPHA,
-            linewidth=LINEWIDTH,
-        )
-        self.item2line[item] = self.axes.lines[-1]
+        self.set_axis_kind(items[0].slicer.is_time)
+        positions = item_positions(self.items)
+        for item in items:
+            self.plot_item(item, positions[id(item)], start, end)
+        for label in self.axes.get_xticklabels():
+            label.set_rotation(XTICK_ROTATION)
         self.display_interval(start, end)
-        self.redraw()
+
+    def plot_item(self, item, idx, start, end):
+        x_values, y_values = item.slicer.axis_slice(start, end)
+        if not len(y_values):
+            # Start from the first value, until a window with data is shown
+            first = item.summary.first
+            x_values, y_values = item.slicer.axis_slice(first, first)
+        with tracer.span('detail.plot'):
+            line = self.make_line(x_values, y_values, item_color(idx),
+                                  item.name)
+        self.item2line[item] = line
 
     def toggle_line_drawstyle_steps(self):
         for line in self.item2line.values():
             line.set_drawstyle(
                 'default' if line.get_drawstyle() == 'steps' else 'steps'
             )
-        self.redraw()
+        self.redraw('lines')
 
     def toggle_line_vertex_markers(self):
         for line in self.item2line.values():
             line.set_marker('*' if line.get_marker() == 'None' else 'None')
-        self.redraw()
+        self.redraw('lines')
+
+    def toggle_visible(self, item, new_value=None):
+        super(DetailView, self).toggle_visible(item, new_value)
+        self.update_cleaned()
+
+    def detach_item(self, item):
+        cleaned_line = self.item2cleaned_line.pop(item, None)
+        if cleaned_line is not None:
+            cleaned_line.remove()
+        self.forget_cleaned(item)
+        super(DetailView, self).detach_item(item)
+
+    def forget_cleaned(self, item):
+        """Drop the cached cleaned windows of item"""
+        for key in [key for key in self.cleaned_cache if key[0] is item]:
+            del self.cleaned_cache[key]
+
+    def replot_items(self, items):
+        """
+        Display the current interval again with the data of items, e.g. after
+        data was appended (see Model.append_data)
+        """
+        for item in items:
+            self.forget_cleaned(item)
+        self.display_interval(*self.get_xlim())
 
     def on_span_select(self, x0, x1):
         if x0 == x1:
@@ -349,38 +805,147 @@ class DetailView(SpanView):
         x1_val = self.from_xaxis(x1)
         self.sig_span_selected.emit(x0_val, x1_val)
 
+    @tracer.traced('detail.display_interval')
     def display_interval(self, x0, x1):
         logger.debug('Displaying interval [%s, %s] (%s)' %(x0,x1,self))
+        self.show_prepared(self.prepare_interval(x0, x1))
+
+    @tracer.traced('detail.preview_interval')
+    def preview_interval(self, x0, x1):
+        """
+        Cheaper display_interval used while dragging in the outline view,
+        drawing min/max-decimated data (see `preview_n_points`)
+        """
+        self.show_prepared(
+            self.prepare_interval(x0, x1, max_points=self.preview_n_points)
+        )
+
+    @tracer.traced('detail.slice')
+    def prepare_interval(self, x0, x1, items=None, max_points=None,
+                         remember=True):
+        """
+        Compute everything needed to display [x0, x1] without touching any
+        artists, so that it can also run in a background thread (see
+        prefetch.WindowPrefetcher)
+
+        :param items: [(DataItem, visible)] | None
+            Items and their visibility, defaults to all items. Must be given
+            when not called from the GUI thread.
+        :param max_points: int | None, min/max-decimate slices to this size
+        :param remember: bool, see IndexSlicer.bounds
+        :return: PreparedInterval
+        """
+        if items is None:
+            items = [(item, item.visible) for item in self.items]
         ymin, ymax = 0, 0
-        for item in self.items:
-            data_slice = item.series.loc[x0:x1]
-            line = self.item2line[item]
-            # Extract values as datetime64 instead of pd.Timestamp
-            # (in case of datetimeindex, otherwise we can just use .index)
-            x_values = data_slice.index.values
-            line.set_data(x_values, data_slice)
-            if item.visible:
-                ymin = min(ymin, data_slice.min())
-                ymax = max(ymax, data_slice.max())
-
-        self.set_xlim(x0, x1)
+        slices = []
+        for item, visible in items:
+            # Views of the float x-coordinates and raw values
+            x_values, y_values = item.slicer.axis_slice(x0, x1,
+                                                        remember=remember)
+            if max_points:
+                x_values, y_values = minmax_decimate(x_values, y_values,
+                                                     max_points)
+            slices.append((item, x_values, y_values))
+            if visible:
+                slice_min, slice_max = nanminmax(y_values)
+                if not np.isnan(slice_min):
+                    ymin = min(ymin, slice_min)
+                    ymax = max(ymax, slice_max)
         yspan = max(abs(ymax - ymin), MINIMUM_Y_RANGE)
-        self.set_ylim(ymin - yspan * 0.02, ymax + yspan * 0.02)
+        ylim = (ymin - yspan * 0.02, ymax + yspan * 0.02)
+        return PreparedInterval(x0, x1, slices, ylim)
+
+    @tracer.traced('detail.show')
+    def show_prepared(self, prepared):
+        """
+        :param prepared: PreparedInterval
+        """
+        for item, x_values, y_values in prepared.slices:
+            line = self.item2line.get(item, None)
+            if line is not None:  # Item might have been removed since
+                line.set_data(x_values, y_values)
+        self.set_xlim(prepared.x0, prepared.x1)
+        self.set_ylim(*prepared.ylim)
+        if self.show_cleaned:
+            self.show_cleaned_interval(prepared.x0, prepared.x1)
+        self.redraw('lines', 'axes', 'ticks')
+
+    def set_show_cleaned(self, show):
+        """Toggle an overlay of each item cleaned according to its markings"""
+        self.show_cleaned = show
+        if show:
+            self.update_cleaned()
+        else:
+            for line in self.item2cleaned_line.values():
+                line.remove()
+            self.item2cleaned_line.clear()
+            self.cleaned_cache.clear()
+            self.redraw('lines')
+
+    def update_cleaned(self, *args):
+        """
+        Refresh the cleaned overlay of the current window, e.g. after markings
+        changed. Accepts and ignores any signal arguments.
+        """
+        if not self.show_cleaned or not self.item2line:
+            return
+        self.show_cleaned_interval(*self.get_xlim())
+        self.redraw('lines')
 
-        self.redraw()
+    def cleaned_slice(self, item, x0, x1):
+        """
+        :return: (x values, y values) of item in [x0, x1], cleaned according
+            to the markings overlapping it. Cached per markings version.
+        """
+        key = (item, item.markings_version, x0, x1)
+        cleaned = self.cleaned_cache.pop(key, None)
+        if cleaned is None:
+            keys, x_values, values, i0, i1 = item.slicer.window_arrays(x0, x1)
+            start_keys, end_keys, labels = item.marking_keys()
+            with tracer.span('detail.clean_window'):
+                positions, values = clean_window(
+                    keys, values, start_keys, end_keys, labels, i0, i1,
+                )
+            cleaned = minmax_decimate(x_values[positions], values,
+                                      self.prefetch_n_points)
+        self.cleaned_cache[key] = cleaned  # Most recently used
+        while len(self.cleaned_cache) > self.cleaned_cache_size:
+            self.cleaned_cache.popitem(last=False)
+        return cleaned
+
+    def show_cleaned_interval(self, x0, x1):
+        for item, line in self.item2line.items():
+            cleaned_line = self.item2cleaned_line.get(item, None)
+            if not line.get_visible():
+                if cleaned_line is not None:
+                    cleaned_line.set_visible(False)
+                continue
+            x_values, y_values = self.cleaned_slice(item, x0, x1)
+            if cleaned_line is None:
+                cleaned_line, = self.axes.plot(
+                    x_values,
+                    y_values,
+                    color=line.get_color(),
+                    alpha=DATA_ALPHA,
+                    linewidth=LINEWIDTH,
+                    linestyle='--',
+                )
+                self.item2cleaned_line[item] = cleaned_line
+            else:
+                cleaned_line.set_data(x_values, y_values)
+            cleaned_line.set_visible(True)
 
     def on_pick(self, event):
-        # Filter any non-Polygons (axvspan:s) or non-visible
+        # Filter anything but the visible spans of this view
         artist = event.artist
-        if not isinstance(artist, Polygon) or not artist.get_visible():
-            return
-        item = self.span2item.get(artist, None)
-        if not item:
-            logging.error('item for artist unexpectedly not found')
+        if not isinstance(artist, MarkingCollection) \
+                or artist.axes is not self.axes or not artist.get_visible():
             return
-        marking = self.span2marking[artist]
+        # The topmost of the spans under the mouse
+        item, marking = artist.marking_at(event.ind[-1])
         self.sig_span_picked.emit(item, marking, event)
 
-    def add_marking_span(self, item, marking):
+    def add_marking_span(self, item, marking, draw=True):
         logger.info('Item: {} Marking: {}'.format(item.name, marking.to_json()))
-        super(DetailView, self).add_marking_span(item, marking)
\ No newline at end of file
+        super(DetailView, self).add_marking_span(item, marking, draw=draw)
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Summary statistics of a series, computed once when an item is added so that
+views and the model never rescan full series for limits and extents
+"""
+from __future__ import print_function, division, unicode_literals
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from inspector.slicing import index_keys, nanminmax
+
+# Number of consecutive index pairs sampled for the median interval
+INTERVAL_SAMPLES = 100000
+
+SeriesSummary = namedtuple('SeriesSummary', [
+    'n',                # number of values
+    'n_nan',            # number of missing values
+    'min',              # minimum value, NaN if all are missing
+    'max',              # maximum value, NaN if all are missing
+    'first',            # first index value
+    'last',             # last index value
+    'first_valid',      # index of the first non-missing value | None
+    'last_valid',       # index of the last non-missing value | None
+    'median_interval',  # pd.Timedelta | float | None (less than 2 values)
+])
+
+
+def median_interval(index):
+    """
+    Median of the intervals between consecutive index values, from at most
+    INTERVAL_SAMPLES evenly spread pairs
+
+    :return: pd.Timedelta | float | None
+    """
+    keys = index_keys(index)
+    if len(keys) < 2:
+        return None
+    if len(keys) - 1 > INTERVAL_SAMPLES:
+        positions = np.linspace(0, len(keys) - 2, INTERVAL_SAMPLES).astype(int)
+        intervals = keys[positions + 1] - keys[positions]
+    else:
+        intervals = np.diff(keys)
+    median = np.median(intervals)
+    if isinstance(index, pd.DatetimeIndex):
+        unit = np.datetime_data(index.values.dtype)[0]
+        return pd.Timedelta(np.timedelta64(int(median), unit))
+    return float(median)
+
+
+def summarize(series):
+    """:return: SeriesSummary of series"""
+    index = series.index
+    values = series.values
+    valid = ~pd.isnull(values)
+    n_valid = int(np.count_nonzero(valid))
+    if n_valid:
+        first_valid = index[int(valid.argmax())]
+        last_valid = index[len(valid) - 1 - int(valid[::-1].argmax())]
+        vmin, vmax = nanminmax(values)
+    else:
+        first_valid = last_valid = None
+        vmin = vmax = np.nan
+    if index.is_monotonic_increasing:
+        first, last = index[0], index[-1]
+    else:
+        first, last = index.min(), index.max()
+    return SeriesSummary(
+        n=len(series),
+        n_nan=len(series) - n_valid,
+        min=vmin,
+        max=vmax,
+        first=first,
+        last=last,
+        first_valid=first_valid,
+        last_valid=last_valid,
+        median_interval=median_interval(index),
+    )
+
+
+def merge_summaries(summary, appended):
+    """
+    Summary of a series followed by another, from their summaries
+
+    The median interval is the count-weighted mean of the two medians, exact
+    for regularly sampled data.
+
+    :param summary: SeriesSummary
+    :param appended: SeriesSummary of the data appended after it
+    :return: SeriesSummary
+    """
+    def nan_extreme(func, a, b):
+        if pd.isnull(a):
+            return b
+        return a if pd.isnull(b) else func(a, b)
+
+    intervals = [(s.median_interval, s.n - 1) for s in [summary, appended]
+                 if s.median_interval is not None]
+    if not intervals:
+        interval = None
+    else:
+        total = sum(weight for _, weight in intervals)
+        interval = intervals[0][0] * intervals[0][1]
+        for value, weight in intervals[1:]:
+            interval += value * weight
+        interval = interval / total
+    return SeriesSummary(
+        n=summary.n + appended.n,
+        n_nan=summary.n_nan + appended.n_nan,
+        min=nan_extreme(min, summary.min, appended.min),
+        max=nan_extreme(max, summary.max, appended.max),
+        first=min(summary.first, appended.first),
+        last=max(summary.last, appended.last),
+        first_valid=summary.first_valid if summary.first_valid is not None
+                    else appended.first_valid,
+        last_valid=appended.last_valid if appended.last_valid is not None
+                   else summary.last_valid,
+        median_interval=interval,
+    )
+
+
+def summary_text(summary):
+    """:return: str, multi-line description of summary, e.g. for tooltips"""
+    return '\n'.join([
+        '{} values, {} missing'.format(summary.n, summary.n_nan),
+        'From {} to {}'.format(summary.first, summary.last),
+        'Valid from {} to {}'.format(summary.first_valid,
+                                     summary.last_valid),
+        'Values in [{:.6g}, {:.6g}]'.format(summary.min, summary.max),
+        'Median interval {}'.format(summary.median_interval),
+    ])
@@ -0,0 +1,82 @@
+from __future__ import print_function, division
+
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.aggregates import IntervalAggregates, window_stats
+from inspector.slicing import IndexSlicer
+
+
+class TestIntervalAggregates(TestCase):
+    def setUp(self):
+        n = 5000
+        seconds = np.cumsum(np.random.randint(1, 30, n))
+        index = pd.to_datetime('2017-01-01') + pd.to_timedelta(seconds, 's')
+        values = np.random.randn(n) * 100 + 500
+        values[np.random.randint(0, n, 300)] = np.nan
+        values[1000:1100] = np.nan
+        self.series = pd.Series(values, index=index)
+        self.aggregates = IntervalAggregates(IndexSlicer(self.series),
+                                             block_size=64)
+
+    def expected(self, x0, x1):
+        window = self.series.loc[x0:x1]
+        hours = (window.index - window.index[0]).total_seconds() / 3600
+        y = window.values
+        both = ~np.isnan(y[1:]) & ~np.isnan(y[:-1])
+        integral = np.sum(((y[1:] + y[:-1]) / 2 * np.diff(hours))[both])
+        return window, integral
+
+    def test_matches_pandas(self):
+        index = self.series.index
+        for i0, i1 in [(0, 4999), (10, 20), (990, 1110), (1020, 1080),
+                       (63, 64), (100, 4000), (7, 7)]:
+            x0, x1 = index[i0], index[i1]
+            window, integral = self.expected(x0, x1)
+            stats = self.aggregates.query(x0, x1)
+            self.assertEqual(stats.n, window.count())
+            if stats.n:
+                self.assertAlmostEqual(stats.mean, window.mean())
+                self.assertAlmostEqual(stats.min, window.min())
+                self.assertAlmostEqual(stats.max, window.max())
+            if stats.n > 1:
+                self.assertAlmostEqual(stats.std, window.std(), places=6)
+            self.assertAlmostEqual(stats.integral, integral, places=6)
+
+    def test_empty_interval(self):
+        stats = self.aggregates.query(self.series.index[-1] + pd.Timedelta('1h'),
+                                      self.series.index[-1] + pd.Timedelta('2h'))
+        self.assertEqual(stats.n, 0)
+        self.assertTrue(np.isnan(stats.mean))
+        self.assertEqual(stats.integral, 0)
+
+    def test_numeric_index(self):
+        series = pd.Series([1.0, 3.0, np.nan, 2.0], index=[0, 2, 3, 4])
+        stats = IntervalAggregates(IndexSlicer(series)).query(0, 4)
+        self.assertEqual((stats.n, stats.min, stats.max, stats.integral),
+                         (3, 1.0, 3.0, 4.0))
+
+    def test_std_of_large_offset(self):
+        n = 2000000
+        values = 1000 + np.random.randn(n) * 0.01
+        values[np.random.randint(0, n, 1000)] = np.nan
+        series = pd.Series(values, index=np.arange(n))
+        aggregates = IntervalAggregates(IndexSlicer(series))
+        for i0, i1 in [(n - 100, n - 1), (5, n - 3), (123456, 654321)]:
+            stats = aggregates.query(i0, i1)
+            expected = series.iloc[i0:i1 + 1]
+            self.assertAlmostEqual(stats.mean, expected.mean(), places=9)
+            self.assertLess(abs(stats.std / expected.std() - 1), 1e-6)
+
+    def test_window_stats_match_query(self):
+        slicer = IndexSlicer(self.series)
+        index = self.series.index
+        for i0, i1 in [(0, 4999), (990, 1110), (7, 7)]:
+            expected = self.aggregates.query(index[i0], index[i1])
+            stats = window_stats(*slicer.slice(index[i0], index[i1]))
+            np.testing.assert_allclose(stats, expected)
+        stats = window_stats(np.array([0, 2, 3, 4]),
+                             np.array([1.0, 3.0, np.nan, 2.0]))
+        self.assertEqual((stats.n, stats.integral), (3, 4.0))
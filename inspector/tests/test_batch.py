@@ -0,0 +1,97 @@
+from __future__ import print_function, division
+
+import os
+import json
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.batch import run, parse_rules
+from inspector.loaders import decode_bytes
+from inspector.markings import gap_markings
+
+
+def gappy_series(name=None):
+    index = pd.date_range('2017-01-01', periods=100, freq='10s')
+    index = index[:40].append(index[60:])  # One gap of 210 s
+    return pd.Series(np.arange(80.0), index=index, name=name)
+
+
+class TestGapMarkings(TestCase):
+    def test_datetimeindex(self):
+        series = gappy_series()
+        markings = gap_markings(series, 'discard', gap_limit='20s')
+        self.assertEqual(len(markings), 1)
+        self.assertEqual(markings[0]['start'], series.index[39])
+        self.assertEqual(markings[0]['end'], series.index[40])
+        self.assertEqual(markings[0]['label'], 'discard')
+
+    def test_numeric_index(self):
+        series = pd.Series(np.arange(5.0), index=[0, 1, 5, 6, 20])
+        markings = gap_markings(series, 'zero', gap_limit=2)
+        self.assertEqual([(m['start'], m['end']) for m in markings],
+                         [(1, 5), (6, 20)])
+
+    def test_bad_label(self):
+        with self.assertRaises(ValueError):
+            gap_markings(gappy_series(), 'no-such-label')
+
+
+class TestDecodeBytes(TestCase):
+    def test_names_unnamed_series(self):
+        seria = decode_bytes(pickle.dumps(gappy_series()), data_source='src')
+        self.assertEqual(len(seria), 1)
+        self.assertEqual(seria[0].name, 'src_0')
+
+    def test_garbage(self):
+        self.assertIsNone(decode_bytes(b'garbage', data_source='src'))
+
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.tmpdir, 'meter{}.pickle'.format(i))
+            with open(path, 'wb') as fh:
+                pickle.dump(gappy_series(name='meter{}'.format(i)), fh)
+            self.paths.append(path)
+        self.bad_path = os.path.join(self.tmpdir, 'bad.pickle')
+        with open(self.bad_path, 'wb') as fh:
+            fh.write(b'garbage')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_writes_markings_over_pool(self):
+        out_dir = os.path.join(self.tmpdir, 'out')
+        failed = run(self.paths + [self.bad_path], workers=2, out_dir=out_dir)
+        self.assertEqual(list(failed), [self.bad_path])
+        for i, path in enumerate(self.paths):
+            out_path = os.path.join(out_dir, os.path.basename(path)
+                                    + '.markings.json')
+            with open(out_path) as fh:
+                markings = json.load(fh)
+            self.assertEqual(list(markings), ['meter{}'.format(i)])
+            self.assertEqual(markings['meter{}'.format(i)][0]['start'],
+                             '2017-01-01T00:06:30')
+
+    def test_rules(self):
+        rules = parse_rules('[{"rule": "gaps", "label": "zero", '
+                            '"gap_limit": "1h"}]')
+        self.assertEqual(run(self.paths[:1], rules=rules, workers=1), {})
+        with open(self.paths[0] + '.markings.json') as fh:
+            self.assertEqual(json.load(fh), {'meter0': []})
+        with self.assertRaises(ValueError):
+            parse_rules('[{"rule": "nonexistent"}]')
+
+    def test_cleaned(self):
+        self.assertEqual(run(self.paths[:1], workers=1, cleaned=True), {})
+        with open(self.paths[0] + '.cleaned.pickle', 'rb') as fh:
+            cleaned, = pickle.load(fh)
+        # The discarded gap ends are dropped
+        self.assertEqual(len(cleaned), 78)
@@ -0,0 +1,123 @@
+from __future__ import print_function, division
+
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.cleaning import (
+    LABEL_PRECEDENCE,
+    clean_series,
+    clean_window,
+    label_codes,
+    label_counts,
+)
+
+
+def naive_codes(keys, markings):
+    """Per-point reference for label_codes"""
+    codes = np.zeros(len(keys), dtype=np.int8)
+    for i, key in enumerate(keys):
+        covering = [m['label'] for m in markings
+                    if m['start'] <= key <= m['end']
+                    and m['label'] in LABEL_PRECEDENCE]
+        if covering:
+            codes[i] = min(LABEL_PRECEDENCE.index(l) for l in covering) + 1
+    return codes
+
+
+class TestCleaning(TestCase):
+    def setUp(self):
+        self.series = pd.Series(
+            [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0],
+            index=pd.date_range('2017-01-01', periods=8, freq='1h'),
+        )
+        self.index = self.series.index
+
+    def marking(self, i0, i1, label):
+        return {'start': self.index[i0], 'end': self.index[i1],
+                'label': label}
+
+    def test_actions(self):
+        cleaned, counts = clean_series(self.series, [
+            self.marking(0, 0, 'zero'),
+            self.marking(1, 2, 'linear-fill'),
+            self.marking(4, 4, 'ffill'),
+            self.marking(5, 5, 'bfill'),
+            self.marking(7, 7, 'discard'),
+            self.marking(3, 6, 'good'),
+        ])
+        # Fills use the nearest points that are not filled or discarded
+        np.testing.assert_array_equal(
+            cleaned.values,
+            [0.0, 4/3.0, 8/3.0, 4.0, 4.0, 7.0, 7.0],
+        )
+        self.assertEqual(len(cleaned), 7)
+        self.assertEqual(counts, {'zero': 1, 'linear-fill': 2, 'ffill': 1,
+                                  'bfill': 1, 'discard': 1})
+
+    def test_fill_without_source_is_nan(self):
+        cleaned, _ = clean_series(self.series, [
+            self.marking(0, 1, 'ffill'),
+            self.marking(6, 7, 'linear-fill'),
+        ])
+        self.assertTrue(np.isnan(cleaned.values[[0, 1, 6, 7]]).all())
+        np.testing.assert_array_equal(cleaned.values[2:6], [3, 4, 5, 6])
+
+    def test_no_markings(self):
+        cleaned, counts = clean_series(self.series, [])
+        np.testing.assert_array_equal(cleaned.values, self.series.values)
+        self.assertEqual(sum(counts.values()), 0)
+
+    def test_codes_match_naive_with_overlaps(self):
+        keys = np.sort(np.random.randint(0, 1000, 500))
+        labels = list(LABEL_PRECEDENCE) + ['good', 'comment']
+        markings = []
+        for _ in range(200):
+            start = np.random.randint(-10, 1010)
+            markings.append({
+                'start': start,
+                'end': start + np.random.randint(-5, 30),
+                'label': labels[np.random.randint(len(labels))],
+            })
+        codes = label_codes(
+            keys,
+            np.array([m['start'] for m in markings]),
+            np.array([m['end'] for m in markings]),
+            np.array([m['label'] for m in markings], dtype=object),
+        )
+        expected = naive_codes(keys, markings)
+        np.testing.assert_array_equal(codes, expected)
+        self.assertEqual(
+            label_counts(codes),
+            dict((label, int((expected == i).sum()))
+                 for i, label in enumerate(LABEL_PRECEDENCE, 1))
+        )
+
+    def test_window_matches_full_series(self):
+        n = 2000
+        keys = np.cumsum(np.random.randint(1, 5, n))
+        values = np.random.randn(n)
+        series = pd.Series(values, index=keys)
+        labels = list(LABEL_PRECEDENCE) + ['good']
+        markings = []
+        for _ in range(100):
+            start = np.random.randint(keys[0] - 10, keys[-1])
+            markings.append({
+                'start': start,
+                'end': start + np.random.randint(0, 200),
+                'label': labels[np.random.randint(len(labels))],
+            })
+        cleaned, _ = clean_series(series, markings)
+        start_keys = np.array([m['start'] for m in markings])
+        end_keys = np.array([m['end'] for m in markings])
+        marking_labels = np.array([m['label'] for m in markings],
+                                  dtype=object)
+        for i0, i1 in [(0, n), (0, 1), (500, 700), (1999, 2000), (10, 10)]:
+            positions, window_values = clean_window(
+                keys, values, start_keys, end_keys, marking_labels, i0, i1
+            )
+            expected = cleaned.loc[keys[i0]:keys[i1 - 1]] if i0 < i1 \
+                       else cleaned.iloc[:0]
+            np.testing.assert_array_equal(keys[positions], expected.index)
+            np.testing.assert_array_equal(window_values, expected.values)
@@ -0,0 +1,105 @@
+from __future__ import print_function, division
+
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.derived import DerivedSeries, DerivedSlicer, align
+from inspector.slicing import IndexSlicer
+from inspector.summary import summarize
+
+
+class Item(object):
+    """The parts of DataItem that derived series use"""
+    def __init__(self, series, name):
+        self.series = series
+        self.name = name
+        self.slicer = IndexSlicer(series)
+        self.summary = summarize(series)
+
+
+class TestDerived(TestCase):
+    def setUp(self):
+        index = pd.date_range('2017-01-01', periods=2000, freq='1min',
+                              tz='Europe/Stockholm')
+        self.mains = pd.Series(np.random.rand(2000) * 10, index=index)
+        # Sub-meter sampled at other times than the mains
+        self.kitchen = pd.Series(np.random.rand(400),
+                                 index=index[::5] + pd.Timedelta('20s'))
+        self.items = [Item(self.mains, 'mains'),
+                      Item(self.kitchen, 'kitchen 1')]
+        self.x0, self.x1 = index[700], index[900]
+
+    def assert_window(self, expression, expected):
+        derived = DerivedSeries(expression, self.items)
+        index_values, x_values, values = derived.window(self.x0, self.x1)
+        expected = expected.loc[self.x0:self.x1]
+        np.testing.assert_array_equal(
+            index_values, expected.index.tz_convert('UTC').tz_localize(None)
+        )
+        np.testing.assert_allclose(values, expected.values)
+        return derived
+
+    def test_arithmetic_aligns_by_searchsorted(self):
+        aligned = self.kitchen.reindex(self.mains.index, method='ffill')
+        self.assert_window("mains - 2 * item('kitchen 1')",
+                           self.mains - 2 * aligned)
+        np.testing.assert_array_equal(
+            align(self.kitchen.iloc[:3], self.mains.iloc[:2]),
+            [self.mains.iloc[0], self.mains.iloc[1], self.mains.iloc[1]]
+        )
+
+    def test_window_functions_match_full_evaluation(self):
+        self.assert_window("rolling(mains, '15min')",
+                           self.mains.rolling('15min').mean())
+        self.assert_window('rolling(mains, 10, "max")',
+                           self.mains.rolling(10, min_periods=1).max())
+        self.assert_window("resample(mains, '1h', 'sum') / 60",
+                           self.mains.resample('1h').sum() / 60)
+        self.assert_window('diff(mains, 3)', self.mains.diff(3))
+        self.assert_window('-abs(shift(mains))', -self.mains.shift(1).abs())
+
+    def test_windows_are_cached(self):
+        derived = self.assert_window('mains + 1', self.mains + 1)
+        self.assertIs(derived.window(self.x0, self.x1),
+                      derived.window(self.x0, self.x1))
+
+    def test_coarse_evaluation_and_slicer(self):
+        derived = DerivedSeries('mains * 2', self.items)
+        coarse = derived.coarse(n_points=100)
+        self.assertEqual(len(coarse), 100)
+        pd.testing.assert_series_equal(coarse, (self.mains * 2).iloc[::20],
+                                       check_names=False, check_freq=False)
+        slicer = DerivedSlicer(coarse, derived)
+        x_values, values = slicer.axis_slice(self.x0, self.x1)
+        self.assertEqual(len(values), 201)
+        # The coarse evaluation is not mistaken for the data
+        for name in ['keys', 'index_values', 'values', 'axis_values']:
+            with self.assertRaises(NotImplementedError):
+                getattr(slicer, name)
+        with self.assertRaises(NotImplementedError):
+            slicer.bounds(self.x0, self.x1)
+        keys, window_x, window_values, i0, i1 = slicer.window_arrays(self.x0,
+                                                                     self.x1)
+        np.testing.assert_array_equal(window_x, x_values)
+        np.testing.assert_array_equal(window_values[i0:i1], values)
+        self.assertEqual(len(keys), len(values))
+        # Derived items can be used in other expressions
+        item = Item(coarse, 'double')
+        item.slicer = slicer
+        self.items.append(item)
+        self.assert_window('double - mains', self.mains)
+
+    def test_full_evaluation(self):
+        derived = DerivedSeries('mains * 2', self.items)
+        pd.testing.assert_series_equal(derived.evaluate(), self.mains * 2,
+                                       check_names=False, check_freq=False)
+
+    def test_rejects_invalid_expressions(self):
+        for expression in ["__import__('os')", 'mains.values', 'other + 1',
+                           'eval(mains)', '1 + 2', 'mains +', 'mains < 1',
+                           "rolling(mains, '1h', 'cumsum')", 'shift(mains, 1.5)',
+                           'rolling(mains)', "resample(mains, 'MS')"]:
+            with self.assertRaises(ValueError):
+                DerivedSeries(expression, self.items)
@@ -0,0 +1,77 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.exchange import export_markings, import_markings
+from inspector.markings import MarkingStore
+
+
+class Item(object):
+    """The parts of DataItem that exchange uses"""
+    def __init__(self, name, metadata, is_time=True):
+        self.name = name
+        self.metadata = metadata
+        self.markings = MarkingStore(is_time=is_time)
+
+
+class Model(object):
+    """The parts of Model that exchange uses"""
+    def __init__(self, items):
+        self.items = items
+
+    def matching_items(self, name, metadata, only_visible=False):
+        return [item for item in self.items
+                if (item.metadata or None) == (metadata or None)
+                and (metadata or item.name == name)]
+
+    def add_markings(self, item, starts, ends, labels, notes=None):
+        return item.markings.extend(starts, ends, labels, notes)
+
+
+class TestExchange(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = [Item('a', {'meter': 1}), Item('b', {}),
+                       Item('c', {}, is_time=False)]
+        starts = pd.date_range('2017-01-01', periods=1000, freq='1min').values
+        # 1 s and 1 ns, which must survive a round trip
+        ends = starts + np.timedelta64(1000000001, 'ns')
+        self.source[0].markings.extend(starts, ends,
+                                       ['discard', 'zero'] * 500,
+                                       ['note'] + [None] * 999)
+        self.source[1].markings.extend(starts[:3], starts[1:4], ['ffill'] * 3)
+        self.source[2].markings.extend([1.5, 3], [2, 4.25], ['bfill'] * 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def round_trip(self, filename):
+        path = os.path.join(self.tmpdir, filename)
+        self.assertEqual(export_markings(path, self.source), 1005)
+        target = [Item('a', {'meter': 1}), Item('b', {}),
+                  Item('c', {}, is_time=False), Item('d', {})]
+        self.assertEqual(import_markings(path, Model(target)), 1005)
+        for source, imported in zip(self.source, target):
+            pd.testing.assert_frame_equal(imported.markings.to_frame(),
+                                          source.markings.to_frame())
+        self.assertEqual(len(target[3].markings), 0)
+
+    def test_csv(self):
+        self.round_trip('markings.csv')
+
+    def test_csv_gz(self):
+        self.round_trip('markings.csv.gz')
+
+    def test_binary(self):
+        try:
+            import msgpack
+            import lz4.frame
+        except ImportError:
+            self.skipTest('msgpack and lz4 are not installed')
+        self.round_trip('markings.lz4')
@@ -0,0 +1,74 @@
+from __future__ import print_function, division
+
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.filecache import DecodedFileCache
+
+
+class TestDecodedFileCache(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = DecodedFileCache(os.path.join(self.tmpdir, 'cache'))
+        self.series = pd.Series(
+            np.random.randn(1000),
+            index=pd.date_range('2017-01-01', periods=1000, freq='1s'),
+            name='meter',
+        )
+        self.outline = self.series.resample('1min').mean()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, obj):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as fh:
+            pickle.dump(obj, fh)
+        return path
+
+    def test_roundtrip_is_memory_mapped(self):
+        path = self.write('data.pickle', self.series)
+        self.assertIsNone(self.cache.get(path))
+        other = self.series.rename('other').reset_index(drop=True)
+        self.assertTrue(self.cache.put(path, [self.series, other],
+                                       [self.outline, None]))
+        (series, outline), (numeric, no_outline) = self.cache.get(path)
+        pd.testing.assert_series_equal(series, self.series, check_freq=False)
+        pd.testing.assert_series_equal(outline, self.outline,
+                                       check_freq=False)
+        pd.testing.assert_series_equal(numeric, other)
+        self.assertIsNone(no_outline)
+        self.assertIsInstance(series.values.base, np.memmap)
+
+        # Content addressed: a copy of the file hits the same entry
+        copy_path = self.write('copy.pickle', self.series)
+        self.assertEqual(len(self.cache.get(copy_path)), 2)
+        self.assertEqual(len(self.cache.entries()), 1)
+
+    def test_object_dtype_is_not_cached(self):
+        path = self.write('objects.pickle', None)
+        self.assertFalse(self.cache.put(path, [pd.Series(['a', 'b'])]))
+        self.assertIsNone(self.cache.get(path))
+
+    def test_evicts_least_recently_used(self):
+        paths = [self.write('data{}.pickle'.format(i), self.series * i)
+                 for i in range(3)]
+        entry_size = self.series.values.nbytes * 2
+        self.cache.budget_bytes = 2 * entry_size
+        self.cache.put(paths[0], [self.series * 0])
+        self.cache.put(paths[1], [self.series * 1])
+        for _, _, entry_dir in self.cache.entries():
+            os.utime(os.path.join(entry_dir, 'meta.json'), (0, 0))
+        self.assertIsNotNone(self.cache.get(paths[0]))  # Used most recently
+        self.cache.put(paths[2], [self.series * 2])
+        # Stat files of evicted entries are removed too
+        self.assertEqual(len(os.listdir(self.cache.stat_dir)), 2)
+        self.assertIsNotNone(self.cache.get(paths[0]))
+        self.assertIsNone(self.cache.get(paths[1]))
+        self.assertIsNotNone(self.cache.get(paths[2]))
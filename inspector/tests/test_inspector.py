@@ -1,6 +1,8 @@
 from __future__ import print_function, division
 
+import os
 import sys
+import tempfile
 
 from functools import wraps
 from unittest import TestCase
@@ -23,6 +25,10 @@ else:
 from inspector import Inspector
 from inspector.constants import Labels
 from inspector import plugins
+from inspector.helpers import action_profiler
+from inspector.prefetch import window_key
+from inspector.filecache import DecodedFileCache
+from inspector.spanviews import CollectionLine
 
 
 app = QtWidgets.QApplication([])
@@ -130,6 +136,10 @@ class TestInspector(TestCase):
             }
         ])
         mark_io = self.ins.view.plugins[plugins.MarkingsIO.name]
+        added = []
+        self.ins.model.sig_marking_added.connect(
+            lambda item, marking: added.append(marking)
+        )
         mark_io.sig_apply_on_visible.emit(
             lambda series, metadata: mark_io.auto_mark_gaps(
                 series=series,
@@ -150,6 +160,7 @@ class TestInspector(TestCase):
             list(map(attrgetter('end'), self.ins.model.items[0].markings)),
             [4, 8, 12, 16],
         )
+        self.assertEqual(added, list(self.ins.model.items[0].markings))
 
     @check_slot_failure
     def test_move_interval(self):
@@ -157,6 +168,39 @@ class TestInspector(TestCase):
         self.ins.view.move_interval('right')
         self.ins.view.move_interval(direction='left')
 
+    @check_slot_failure
+    def test_marking_spans_are_collected_per_label(self):
+        self.ins.load_series(self.df_timeseries)
+        index = self.df_timeseries.index
+        item = self.ins.model.items[0]
+        self.ins.model.add_markings(item, index[:10:2], index[1:10:2],
+                                    ['discard', 'zero'] * 2 + ['discard'])
+        detail_view = self.ins.view.detail_view
+        self.assertEqual(sorted(detail_view.label2spans), ['discard', 'zero'])
+        discard = detail_view.label2spans['discard']
+        self.assertEqual(len(discard.spans), 3)
+        self.ins.view.canvas.draw()
+        self.assertEqual(discard.marking_at(1), (item, item.markings[2]))
+
+    @check_slot_failure
+    def test_delete_markings_in_interval(self):
+        self.ins.load_series(self.df_timeseries)
+        index = self.df_timeseries.index
+        item = self.ins.model.items[0]
+        self.ins.model.add_markings(item, index[1:9:2], index[2:10:2],
+                                    ['discard'] * 4)
+        removed = []
+        self.ins.model.sig_marking_removed.connect(
+            lambda item, marking: removed.append(marking)
+        )
+        self.ins.model.delete_markings_in_interval(index[0], index[5],
+                                                   only_visible=False)
+        self.assertEqual([m.start for m in item.markings],
+                         [index[5], index[7]])
+        self.assertEqual([m.start for m in removed], [index[1], index[3]])
+        self.assertEqual(item.deleted_markings, removed)
+        self.assertEqual(len(self.ins.view.detail_view.marking2span), 2)
+
     @check_slot_failure
     def test_set_marking_label(self):
         self.ins.view.set_marking_label(Labels.DISCARD)
@@ -184,4 +228,367 @@ class TestInspector(TestCase):
     @check_slot_failure
     def test_move_actions(self):
         self.ins.view.actions['move_left'].trigger()
-        self.ins.view.actions['move_right'].trigger()
\ No newline at end of file
+        self.ins.view.actions['move_right'].trigger()
+
+    def test_iter_entry_points(self):
+        self.assertIsInstance(
+            plugins.iter_entry_points(plugins.PLUGINS_RESOURCE_GROUP),
+            list
+        )
+
+    @check_slot_failure
+    def test_toggle_plugin_from_ref(self):
+        plugin_ref = plugins.all_plugins()[plugins.RandomDataGenerator.name]
+        self.assertIsInstance(plugin_ref, plugins.PluginRef)
+        self.ins.view.toggle_plugin(plugin_ref, True)
+        self.assertIsInstance(
+            self.ins.view.plugins[plugins.RandomDataGenerator.name],
+            plugins.RandomDataGenerator
+        )
+        self.ins.view.toggle_plugin(plugin_ref, False)
+        self.assertNotIn(plugins.RandomDataGenerator.name, self.ins.view.plugins)
+
+    def test_toggle_plugin_import_failure(self):
+        name = plugins.RandomDataGenerator.name
+        plugin_ref = plugins.PluginRef(name, 'inspector.no_such_module',
+                                       'RandomDataGenerator')
+        action = self.ins.view.actions['toggle_plugin_' + name]
+        action.setChecked(True)
+        self.ins.view.toggle_plugin(plugin_ref, True)
+        self.assertFalse(action.isChecked())
+        self.assertNotIn(name, self.ins.view.plugins)
+
+    @check_slot_failure
+    def test_show_trace_dialog(self):
+        self.ins.load_series(self.df_timeseries)
+        self.ins.view.actions['show_trace'].trigger()
+        self.assertGreater(self.ins.view.trace_dialog.table.rowCount(), 0)
+
+    @check_slot_failure
+    def test_profile_next_action(self):
+        saved = []
+        action_profiler.output_dir = tempfile.mkdtemp()
+        action_profiler.sig_profile_saved.connect(
+            lambda name, path, summary: saved.append(path)
+        )
+        self.ins.view.actions['profile_next_action'].trigger()
+        self.assertTrue(action_profiler.armed)
+        self.ins.view.actions['move_right'].trigger()
+        self.assertFalse(action_profiler.armed)
+        self.assertEqual(len(saved), 1)
+        self.assertTrue(os.path.exists(saved[0]))
+
+        # Closed views no longer show profiles
+        closed = self.ins.view
+        closed.close()
+        closed.statusBar().clearMessage()
+        self.ins = Inspector()
+        self.ins.view.actions['profile_next_action'].trigger()
+        self.ins.view.actions['move_right'].trigger()
+        self.assertEqual(len(saved), 2)
+        self.assertEqual(closed.statusBar().currentMessage(), '')
+
+    @check_slot_failure
+    def test_zero_argument_action(self):
+        # triggered passes 'checked', the profiler wrapper must not
+        self.ins.load_series(self.df_timeseries)
+        self.ins.view.actions['hide_all'].trigger()
+        self.assertFalse(list(self.ins.model.visible_items()))
+        action_profiler.output_dir = tempfile.mkdtemp()
+        self.ins.view.actions['profile_next_action'].trigger()
+        self.ins.view.actions['invert'].trigger()
+        self.assertFalse(action_profiler.armed)
+        self.assertEqual(len(list(self.ins.model.visible_items())),
+                         len(self.ins.model.items))
+
+    @check_slot_failure
+    def test_bulk_visibility_toggle_renders_once(self):
+        self.ins.load_series(self.df_timeseries)
+        scheduler = self.ins.view.redraw_scheduler
+        scheduler.flush()
+        n_renders = scheduler.n_renders
+        self.ins.model.set_items_visible(how=False)
+        self.ins.model.set_items_visible(how='invert')
+        self.assertTrue(scheduler.pending)
+        QTest.qWait(100)
+        self.assertEqual(scheduler.n_renders, n_renders + 1)
+        # Nothing changed, nothing rendered
+        self.ins.model.set_items_visible(how=True)
+        QTest.qWait(100)
+        self.assertEqual(scheduler.n_renders, n_renders + 1)
+
+    @check_slot_failure
+    def test_redraw_renders_dirty_layers_only(self):
+        self.ins.load_series(self.df_timeseries)
+        view = self.ins.view
+        view.redraw_scheduler.flush()
+        view.canvas_redraw()
+        figure_renders = []
+        view.render_figure = lambda: figure_renders.append(True)
+        view.canvas_redraw({view.detail_view: {'spans'},
+                            view.outline_view: {'spans'}})
+        self.assertEqual(figure_renders, [])
+        view.canvas_redraw({view: {'axes', 'ticks'}})
+        self.assertEqual(figure_renders, [True])
+
+    @check_slot_failure
+    def test_live_preview_while_dragging(self):
+        self.ins.load_series(self.df_timeseries)
+        outline_view = self.ins.view.outline_view
+        index = self.df_timeseries.index
+        outline_view._last_preview = 0
+        outline_view.on_span_move(
+            outline_view.to_xaxis(index[2]),
+            outline_view.to_xaxis(index[5])
+        )
+        self.assertEqual(
+            self.ins.view.detail_view.get_xlim(),
+            [index[2].to_pydatetime(), index[5].to_pydatetime()]
+        )
+
+    @check_slot_failure
+    def test_move_interval_uses_prefetched_window(self):
+        self.ins.load_series(self.df_timeseries)
+        view = self.ins.view
+        view.move_interval('right')
+        xlim = view.detail_view.axes.get_xlim()
+        diff = xlim[1] - xlim[0]
+        key = window_key(xlim[1], xlim[1] + diff)
+        for _ in range(100):
+            if view.prefetcher.get(key) is not None:
+                break
+            QTest.qWait(10)
+        self.assertIsNotNone(view.prefetcher.get(key))
+        view.redraw_scheduler.flush()
+        selected = []
+        view.outline_view.sig_interval_selected.connect(
+            lambda x0, x1: selected.append((x0, x1))
+        )
+        view.move_interval('right')
+        self.assertEqual(window_key(*view.detail_view.axes.get_xlim()), key)
+        self.assertEqual(len(selected), 1)
+        # Only the detail view is redrawn, the outline view blits its span
+        self.assertEqual(dict(view.redraw_scheduler.dirty), {
+            view.detail_view: {'lines', 'axes', 'ticks'},
+            view.outline_view: {'spans'},
+        })
+        # Then shown at full resolution once paging pauses
+        self.assertIsNotNone(view._decimated_window)
+        QTest.qWait(view.full_resolution_delay_ms + 100)
+        self.assertIsNone(view._decimated_window)
+        self.assertEqual(window_key(*view.detail_view.axes.get_xlim()), key)
+        # Explicit selections invalidate prefetched windows
+        view.outline_view.display_maximal_interval()
+        self.assertIsNone(view.prefetcher.get(key))
+
+    @check_slot_failure
+    def test_cleaned_overlay_follows_markings(self):
+        self.ins.load_series(self.df_timeseries)
+        view = self.ins.view
+        detail_view = view.detail_view
+        item = self.ins.model.items[0]
+        derived = self.ins.add_derived_series("item('0') * 2", name='doubled')
+        view.actions['show_cleaned'].trigger()
+        self.assertIn(item, detail_view.item2cleaned_line)
+        x0, x1 = detail_view.get_xlim()
+        version = item.markings_version
+        self.assertIn((item, version, x0, x1), detail_view.cleaned_cache)
+
+        index = item.series.index
+        self.ins.model.set_current_label('zero')
+        self.ins.model.new_marking(index[2], index[3])
+        self.assertEqual(item.markings_version, version + 1)
+        cleaned_y = detail_view.item2cleaned_line[item].get_ydata()
+        np.testing.assert_array_equal(cleaned_y[2:4], [0, 0])
+        # Derived items are cleaned from their evaluated window
+        derived_y = detail_view.item2cleaned_line[derived].get_ydata()
+        np.testing.assert_array_equal(derived_y[2:4], [0, 0])
+        np.testing.assert_allclose(derived_y[4:], 2 * cleaned_y[4:])
+
+        self.ins.model.set_current_label('discard')
+        self.ins.model.update_marking_label(item.markings[0])
+        self.assertEqual(len(detail_view.item2cleaned_line[item].get_ydata()),
+                         len(cleaned_y) - 2)
+
+        view.actions['show_cleaned'].trigger()
+        self.assertEqual(detail_view.item2cleaned_line, {})
+
+    @check_slot_failure
+    def test_markings_journal_replays_onto_reloaded_items(self):
+        path = os.path.join(tempfile.mkdtemp(), 'markings.jsonl')
+        os.environ['INSPECTOR_JOURNAL'] = path
+        try:
+            self.ins = Inspector()
+            self.ins.load_series(self.df_timeseries)
+            index = self.df_timeseries.index
+            self.ins.model.set_current_label('zero')
+            self.ins.model.new_marking(index[2], index[3])
+            self.ins.model.new_marking(index[5], index[6])
+            self.ins.model.remove_marking(self.ins.model.items[0],
+                                          self.ins.model.items[0].markings[0])
+            self.ins.model.journal.close()
+
+            self.ins = Inspector()
+            self.ins.load_series(self.df_timeseries)
+        finally:
+            del os.environ['INSPECTOR_JOURNAL']
+        first, second = self.ins.model.items
+        self.assertEqual([(m.start, m.label) for m in first.markings],
+                         [(index[5], 'zero')])
+        self.assertEqual(len(second.markings), 2)
+        self.assertIn(first.markings[0],
+                      self.ins.view.outline_view.marking2span)
+
+    @check_slot_failure
+    def test_save_and_restore_session(self):
+        path = os.path.join(tempfile.mkdtemp(), 'labeling.inspector')
+        self.ins.load_series(self.df_timeseries)
+        model = self.ins.model
+        index = self.df_timeseries.index
+        model.set_current_label('discard')
+        model.new_marking(index[2], index[3])
+        model.items[1].setCheckState(Qt.Unchecked)
+        self.ins.view.save_session(path)
+
+        self.ins = Inspector()
+        self.ins.view.load_files([path])
+        first, second = self.ins.model.items
+        self.assertEqual([(m.start, m.end, m.label) for m in first.markings],
+                         [(index[2], index[3], 'discard')])
+        self.assertFalse(second.visible)
+        self.assertEqual(self.ins.model.current_label, 'discard')
+        self.assertIn(first.markings[0],
+                      self.ins.view.detail_view.marking2span)
+
+    @check_slot_failure
+    def test_second_load_of_file_uses_decoded_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        view = self.ins.view
+        view.file_cache = DecodedFileCache(os.path.join(tmpdir, 'cache'))
+        n_data = view.outline_view.do_resample_threshold + 1
+        series = pd.Series(np.random.randn(n_data), name='meter',
+                           index=pd.date_range('2017-01-01', periods=n_data,
+                                               freq='1s'))
+        path = os.path.join(tmpdir, 'meter.pickle')
+        series.to_pickle(path)
+        view.load_files([path, path])
+        first, second = self.ins.model.items
+        self.assertIsInstance(second.series.values.base, np.memmap)
+        self.assertIsNotNone(second.outline)
+        np.testing.assert_array_equal(
+            view.outline_view.item2line[second].get_ydata(),
+            view.outline_view.item2line[first].get_ydata(),
+        )
+
+    @check_slot_failure
+    def test_add_derived_series(self):
+        self.ins.load_series(self.df_timeseries)
+        item = self.ins.add_derived_series("item('0') - 2 * item('1')",
+                                           name='difference')
+        self.assertEqual(item.metadata, {'expression': "item('0') - 2 * item('1')"})
+        view = self.ins.view
+        view.detail_view.display_interval(*view.detail_view.get_xlim())
+        line = view.detail_view.item2line[item]
+        expected = self.df_timeseries[0] - 2 * self.df_timeseries[1]
+        np.testing.assert_allclose(line.get_ydata(),
+                                   expected.iloc[:len(line.get_ydata())])
+        with self.assertRaises(ValueError):
+            self.ins.add_derived_series('missing + 1')
+
+        # Plugins get the full evaluation, not the coarse one
+        applied = []
+        self.ins.model.apply_on_visible(
+            lambda series, metadata: applied.append(series)
+        )
+        pd.testing.assert_series_equal(applied[-1], expected,
+                                       check_names=False, check_freq=False)
+
+        # Sessions derive it again from the restored items
+        path = os.path.join(tempfile.mkdtemp(), 'derived.inspector')
+        view.save_session(path)
+        self.ins = Inspector()
+        self.ins.view.load_files([path])
+        restored = self.ins.model.items[-1]
+        self.assertTrue(restored.is_derived)
+        self.assertEqual(restored.name, 'difference')
+
+    @check_slot_failure
+    def test_append_data(self):
+        self.ins.load_series(self.df_timeseries)
+        model = self.ins.model
+        view = self.ins.view
+        item = model.items[0]
+        derived = self.ins.add_derived_series("item('0') * 2", name='doubled')
+        appended = []
+        model.sig_item_appended.connect(appended.append)
+        index = pd.date_range(self.df_timeseries.index[-1], periods=6)[1:]
+        tail = pd.Series([100.0, 1, 2, 3, 4], index=index)
+        self.assertEqual(model.append_data(item, tail), [item, derived])
+        self.assertEqual(appended, [item, derived])
+        self.assertEqual(item.summary.max, 100)
+        self.assertEqual(item.summary.last, index[-1])
+        self.assertEqual(derived.summary.max, 200)
+        # Both views show the new data
+        self.assertEqual(view.outline_view.axes.get_ylim()[1], 200)
+        np.testing.assert_array_equal(
+            view.outline_view.item2line[item].get_ydata()[-5:], tail.values
+        )
+        view.detail_view.display_interval(index[0], index[-1])
+        np.testing.assert_array_equal(
+            view.detail_view.item2line[derived].get_ydata(), tail.values * 2
+        )
+        with self.assertRaises(ValueError):
+            model.append_data(derived, tail)
+
+    @check_slot_failure
+    def test_span_stats(self):
+        self.ins.load_series(self.df_timeseries)
+        self.ins.add_derived_series("item('0') * 3", name='tripled')
+        index = self.df_timeseries.index
+        self.ins.view.detail_view.sig_span_selected.emit(index[1], index[4])
+        text = self.ins.view.stats_panel.toPlainText()
+        self.assertIn('4 values', text)
+        self.assertIn('mean {:.6g}'.format(self.df_timeseries[0][1:5].mean()),
+                      text)
+        # Derived items are evaluated over the span
+        self.assertIn('tripled (derived)', text)
+        self.assertIn('mean {:.6g}'.format(
+            3 * self.df_timeseries[0][1:5].mean()
+        ), text)
+
+    @check_slot_failure
+    def test_bulk_add_and_remove_items(self):
+        frame = pd.DataFrame(
+            np.random.randn(100, 400),
+            index=pd.date_range('2017-01-01', periods=100, freq='1min'),
+        )
+        view = self.ins.view
+        model = self.ins.model
+        # Plugins bound to the per-item signals still get every item
+        added, item_removed = [], []
+        model.sig_item_added.connect(added.append)
+        model.sig_item_removed.connect(item_removed.append)
+        self.ins.load_series(frame)
+        self.assertEqual(len(model.items), 400)
+        self.assertEqual(added, model.items)
+        self.assertEqual(model.item_model.rowCount(), 400)
+        self.assertEqual(len(view.outline_view.item2line), 400)
+        self.assertEqual(view.outline_view.axes.get_ylim(),
+                         (frame.values.min(), frame.values.max()))
+        # Drawn by a single LineCollection in the outline view
+        line = view.outline_view.item2line[model.items[0]]
+        self.assertIsInstance(line, CollectionLine)
+        model.items[0].setCheckState(Qt.Unchecked)
+        self.assertFalse(line.get_visible())
+
+        removed = model.items[::2]
+        model.remove_rows([item.row() for item in removed])
+        self.assertEqual(len(model.items), 200)
+        self.assertEqual(item_removed, removed)
+        self.assertEqual(model.item_model.rowCount(), 200)
+        self.assertEqual([item.row() for item in model.items],
+                         list(range(200)))
+        self.assertNotIn(removed[0], view.detail_view.item2line)
+        self.assertEqual(set(view.outline_view.item2line),
+                         set(model.items))
+        self.assertEqual(len(view.outline_view.collection.lines), 200)
@@ -0,0 +1,126 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.journal import MarkingJournal
+from inspector.markings import Marking, MarkingStore
+
+
+class Item(object):
+    """The parts of DataItem that the journal uses"""
+    def __init__(self, name, metadata, is_time=True, source=None):
+        self.name = name
+        self.metadata = metadata
+        self.source = source
+        self.markings = MarkingStore(is_time=is_time)
+
+
+def replay(journal, item):
+    """What Model.replay_journal does"""
+    keys, columns = journal.journaled_markings(item)
+    if keys:
+        journal.bind(item.markings.extend(*columns), keys)
+
+
+class TestJournal(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'markings.jsonl')
+        self.starts = pd.date_range('2017-01-01', periods=10, freq='1h').values
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_replay_across_sessions(self):
+        journal = MarkingJournal(self.path)
+        item = Item('a', {'meter': 1})
+        ids = item.markings.extend(self.starts, self.starts, ['discard'] * 10,
+                                   ['flat'] + [None] * 9)
+        journal.record_added(item, ids)
+        marking = Marking(datetime(2017, 2, 1), datetime(2017, 2, 2), 'zero')
+        item.markings.append(marking)
+        journal.record_added(item, [marking.id])
+        removed = item.markings[1:3]
+        for view in removed:
+            item.markings.remove(view)
+        journal.record_removed(removed)
+        item.markings[0].label = 'good'
+        journal.record_relabeled(item.markings[0])
+        journal.close()
+
+        # Items are matched by metadata, not name
+        journal = MarkingJournal(self.path)
+        self.assertEqual(journal.n_entries, 1)  # Compacted
+        restored = Item('renamed', {'meter': 1})
+        replay(journal, restored)
+        pd.testing.assert_frame_equal(restored.markings.to_frame(),
+                                      item.markings.to_frame())
+        self.assertEqual(journal.journaled_markings(Item('a', {}))[0], [])
+
+        # Replayed markings keep their identity in the journal
+        journal.record_removed([restored.markings[0]])
+        journal.close()
+        journal = MarkingJournal(self.path)
+        self.assertEqual(len(journal.journaled_markings(restored)[0]), 8)
+
+    def test_numeric_and_torn_line(self):
+        journal = MarkingJournal(self.path)
+        item = Item('b', {}, is_time=False)
+        journal.record_added(item, item.markings.extend([1.5], [2], ['zero']))
+        journal.close()
+        with open(self.path, 'a') as fh:
+            fh.write('{"op": "add", "ite')
+        journal = MarkingJournal(self.path)
+        keys, (starts, ends, labels, notes) = journal.journaled_markings(item)
+        self.assertEqual((list(starts), list(ends), list(labels)),
+                         ([1.5], [2.0], ['zero']))
+        # Not replayed onto items with another x-axis type
+        self.assertEqual(journal.journaled_markings(Item('b', {}))[0], [])
+
+    def test_items_without_metadata_are_matched_by_source(self):
+        journal = MarkingJournal(self.path)
+        item = Item('power', {}, source='one.csv')
+        journal.record_added(item, item.markings.extend(self.starts[:1],
+                                                        self.starts[1:2],
+                                                        ['zero']))
+        journal.close()
+        journal = MarkingJournal(self.path)
+        self.assertEqual(
+            len(journal.journaled_markings(Item('power', {},
+                                                source='one.csv'))[0]), 1)
+        for other in [Item('power', {}, source='two.csv'), Item('power', {})]:
+            self.assertEqual(journal.journaled_markings(other)[0], [])
+
+    def test_compaction_and_segments(self):
+        journal = MarkingJournal(self.path, compact_min_entries=20)
+        item = Item('a', {'meter': 1})
+        entries, offset = journal.entries_since(0)
+        self.assertEqual(entries, [])
+        for start in self.starts:
+            journal.record_added(item, item.markings.extend(
+                [start], [start], ['discard']
+            ))
+        entries, offset = journal.entries_since(0)
+        self.assertEqual(len(entries), 10)
+        journal.record_removed(item.markings[:5])
+        entries, _ = journal.entries_since(offset)
+        self.assertEqual([entry['op'] for entry in entries], ['remove'])
+
+        for start in self.starts:
+            journal.record_added(item, item.markings.extend(
+                [start], [start], ['zero']
+            ))
+        self.assertEqual(journal.generation, 1)
+        self.assertLess(journal.n_entries, 10)
+        journal.close()
+        journal = MarkingJournal(self.path)
+        keys, columns = journal.journaled_markings(item)
+        self.assertEqual(len(keys), 15)
+        np.testing.assert_array_equal(columns[0][:5], self.starts[5:])
@@ -0,0 +1,96 @@
+from __future__ import print_function, division
+
+import json
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.markings import Marking, MarkingStore
+
+
+class TestMarkingStore(TestCase):
+    def setUp(self):
+        self.store = MarkingStore(is_time=True)
+        self.t0 = datetime(2017, 1, 1, 12)
+        self.t1 = datetime(2017, 1, 1, 13)
+
+    def test_markings_become_views(self):
+        marking = Marking(self.t0, self.t1, 'discard', note='flat')
+        self.store.append(marking)
+        self.assertEqual(len(self.store), 1)
+        self.assertIn(marking, self.store)
+        view = self.store[0]
+        self.assertIsNot(view, marking)
+        self.assertEqual(view, marking)
+        self.assertEqual({view: 1}[marking], 1)
+        self.assertEqual((view.start, view.end, view.label, view.note),
+                         (self.t0, self.t1, 'discard', 'flat'))
+
+        version = self.store.version
+        view.label = 'zero'
+        self.assertEqual(marking.label, 'zero')
+        self.assertEqual(self.store.version, version + 1)
+
+    def test_remove_detaches(self):
+        first = Marking(self.t0, self.t1, 'discard')
+        second = Marking(self.t1, self.t1, 'good')
+        self.store.append(first)
+        self.store.append(second)
+        view = self.store[0]
+        self.store.remove(first)
+        self.assertNotIn(first, self.store)
+        self.assertEqual(list(self.store), [second])
+        # Removed markings, and any other view of them, keep their values
+        self.assertEqual((first.start, first.label), (self.t0, 'discard'))
+        self.assertEqual((view.start, view.label), (self.t0, 'discard'))
+        self.assertIn('discard', repr(view))
+        self.assertEqual(self.store.removed(), [first])
+
+    def test_append_out_of_id_order(self):
+        older = Marking(self.t0, self.t1, 'discard')
+        newer = Marking(self.t0, self.t1, 'zero')
+        self.store.append(newer)
+        self.store.append(older)
+        self.assertEqual(list(self.store), [older, newer])
+        self.assertEqual(self.store[1].label, 'zero')
+
+    def test_extend_and_export(self):
+        starts = pd.date_range('2017-01-01', periods=1000, freq='1h')
+        ids = self.store.extend(starts.values, starts.values + np.timedelta64(
+            30, 'm'), ['discard', 'zero'] * 500)
+        self.assertEqual(len(ids), 1000)
+        self.assertEqual(self.store[1].label, 'zero')
+        self.assertEqual(self.store[999].end, datetime(2017, 2, 11, 15, 30))
+
+        column_starts, _, labels = self.store.columns()
+        np.testing.assert_array_equal(column_starts, starts.values)
+        self.assertEqual(list(labels[:2]), ['discard', 'zero'])
+
+        records = json.loads(self.store.to_json())
+        self.assertEqual(records[0]['label'], 'discard')
+        self.assertTrue(records[0]['start'].startswith('2017-01-01T00:00:00'))
+        self.assertEqual(self.store.to_records()[1]['end'],
+                         pd.Timestamp('2017-01-01 01:30'))
+        self.assertEqual(self.store.extent(),
+                         (datetime(2017, 1, 1), datetime(2017, 2, 11, 15, 30)))
+
+        first = self.store[0]
+        self.assertEqual(len(self.store.remove_ids(ids[::2])), 500)
+        self.assertEqual(len(self.store), 500)
+        self.assertEqual(first.label, 'discard')
+        self.assertEqual(set(self.store.columns()[2]), set(['zero']))
+
+    def test_numeric(self):
+        store = MarkingStore(is_time=False)
+        store.extend([0, 4, 8], [4, 8, 12], ['discard'] * 3)
+        self.assertEqual([m.start for m in store], [0, 4, 8])
+        self.assertEqual(list(store.ids_within(1, 12.5)),
+                         list(store.rows['id'][1:]))
+
+    def test_values_keep_nanoseconds(self):
+        start = pd.Timestamp('2017-01-01 00:00:00.000000001')
+        self.store.extend([start], [start], ['zero'])
+        self.assertEqual(self.store[0].start, start)
+        self.assertIsInstance(self.store[0].start, pd.Timestamp)
@@ -0,0 +1,47 @@
+from __future__ import print_function, division
+
+import time
+import threading
+from unittest import TestCase
+
+from inspector.prefetch import WindowPrefetcher
+
+
+class TestWindowPrefetcher(TestCase):
+    def wait_for(self, prefetcher, key, timeout=2.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            prepared = prefetcher.get(key)
+            if prepared is not None:
+                return prepared
+            time.sleep(0.005)
+        return None
+
+    def test_prepares_in_background_and_evicts_lru(self):
+        prefetcher = WindowPrefetcher(lambda x0, x1: (x0, x1), capacity=2)
+        for x0 in range(3):
+            prefetcher.request((x0, x0 + 1), x0, x0 + 1)
+            self.assertEqual(self.wait_for(prefetcher, (x0, x0 + 1)),
+                             (x0, x0 + 1))
+        self.assertIsNone(prefetcher.get((0, 1)))
+        self.assertEqual(list(prefetcher.cache), [(1, 2), (2, 3)])
+
+    def test_passes_keyword_arguments(self):
+        prefetcher = WindowPrefetcher(
+            lambda x0, x1, remember=True: (x0, x1, remember)
+        )
+        prefetcher.request((0, 1), 0, 1, remember=False)
+        self.assertEqual(self.wait_for(prefetcher, (0, 1)), (0, 1, False))
+
+    def test_invalidate_discards_running_preparation(self):
+        started, release = threading.Event(), threading.Event()
+        def prepare(x0, x1):
+            started.set()
+            release.wait(2)
+            return (x0, x1)
+        prefetcher = WindowPrefetcher(prepare)
+        prefetcher.request((0, 1), 0, 1)
+        started.wait(2)
+        prefetcher.invalidate()
+        release.set()
+        self.assertIsNone(self.wait_for(prefetcher, (0, 1), timeout=0.2))
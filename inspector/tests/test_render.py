@@ -0,0 +1,60 @@
+from __future__ import print_function, division
+
+import os
+import json
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.render import read_manifest, run
+
+
+class TestRender(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.out_dir = os.path.join(self.tmpdir, 'out')
+        self.paths = []
+        for i, index in enumerate([
+            pd.date_range('2017-01-01', periods=50000, freq='10s'),
+            np.arange(50000.0),
+        ]):
+            path = os.path.join(self.tmpdir, 'meter{}.pickle'.format(i))
+            series = pd.Series(np.random.randn(len(index)), index=index,
+                               name='meter{}'.format(i))
+            with open(path, 'wb') as fh:
+                pickle.dump(series, fh)
+            self.paths.append(path)
+        with open(self.paths[0] + '.markings.json', 'w') as fh:
+            json.dump({'meter0': [{'start': '2017-01-01T01:00:00',
+                                   'end': '2017-01-01T02:00:00',
+                                   'label': 'discard', 'note': None}]}, fh)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_manifest(self, lines):
+        path = os.path.join(self.tmpdir, 'manifest.csv')
+        with open(path, 'w') as fh:
+            fh.write('\n'.join(['file,item,start,end,out'] + lines) + '\n')
+        return read_manifest(path)
+
+    def test_renders_manifest_over_pool(self):
+        rows = self.write_manifest([
+            '{},meter0,2017-01-01 00:30,2017-01-01 03:00,a.png'.format(
+                self.paths[0]),
+            '{},,,,b.png'.format(self.paths[0]),
+            '{},,100,2000,c.png'.format(self.paths[1]),
+            '{},,,,'.format(self.paths[1]),
+            '{},nonexistent,,,d.png'.format(self.paths[1]),
+        ])
+        failed = run(rows, workers=2, out_dir=self.out_dir)
+        self.assertEqual(list(failed), [4])
+        out_files = sorted(os.listdir(self.out_dir))
+        self.assertEqual(len(out_files), 4)
+        for name in ['a.png', 'b.png', 'c.png']:
+            with open(os.path.join(self.out_dir, name), 'rb') as fh:
+                self.assertEqual(fh.read(8), b'\x89PNG\r\n\x1a\n')
@@ -0,0 +1,135 @@
+from __future__ import print_function, division
+
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.markings import MarkingStore
+from inspector.session import (
+    derived_entries,
+    entry_outline,
+    entry_summary,
+    is_session,
+    iter_series,
+    marking_columns,
+    read_session,
+    save_session,
+)
+from inspector.summary import summarize
+
+
+class Item(object):
+    """The parts of DataItem that sessions use"""
+    def __init__(self, series, metadata=None, visible=True, source=None):
+        self.series = series
+        self.name = series.name
+        self.metadata = metadata or {}
+        self.visible = visible
+        self.source = source
+        self.summary = summarize(series)
+        self.outline = None
+        self.markings = MarkingStore(
+            is_time=isinstance(series.index, pd.DatetimeIndex)
+        )
+
+
+class DerivedSlicer(object):
+    """The parts of derived.DerivedSlicer that sessions use"""
+    def __init__(self, expression):
+        self.derived = self
+        self.expression = expression
+
+
+class TestSession(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'labeling.inspector')
+        index = pd.date_range('2017-01-01', periods=100, freq='1min',
+                              tz='Europe/Stockholm')
+        self.timeseries = pd.Series(np.random.randn(100), index=index,
+                                    name='meter')
+        self.numeric = pd.Series(np.arange(10.0), index=np.arange(10) * 0.5,
+                                 name='counter')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_embedded_items_are_memory_mapped(self):
+        items = [Item(self.timeseries, {'meter': 1}),
+                 Item(self.numeric, visible=False)]
+        starts = self.timeseries.index[[1, 10]].tz_localize(None).values
+        items[0].markings.extend(starts, starts, ['zero', 'discard'],
+                                 [None, 'flat'])
+        items[1].markings.extend([1.0], [2.5], ['good'])
+        self.assertEqual(save_session(self.path, items, window=(1.0, 2.0),
+                                      current_label='zero'), 2)
+        self.assertTrue(is_session(self.path))
+
+        saved = read_session(self.path)
+        self.assertEqual(saved['window'], [1.0, 2.0])
+        self.assertEqual(saved['current_label'], 'zero')
+        restored = list(iter_series(self.path, saved))
+        self.assertEqual([entry['visible'] for entry, _ in restored],
+                         [True, False])
+        for (entry, series), item in zip(restored, items):
+            pd.testing.assert_series_equal(series, item.series,
+                                           check_freq=False)
+            self.assertIsInstance(series.values.base, np.memmap)
+            store = MarkingStore(is_time=item.markings.is_time)
+            store.extend(*marking_columns(self.path, entry))
+            pd.testing.assert_frame_equal(store.to_frame(),
+                                          item.markings.to_frame())
+
+    def test_referenced_source(self):
+        source = os.path.join(self.tmpdir, 'data.pickle')
+        with open(source, 'wb') as fh:
+            pickle.dump([self.timeseries, self.numeric], fh)
+        items = [Item(self.numeric, source=source),
+                 Item(self.timeseries.rename('gone'), source=source)]
+        save_session(self.path, items)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.path, 'item0.values.npy')
+        ))
+        restored = list(iter_series(self.path, read_session(self.path)))
+        # Series missing from the source are skipped
+        self.assertEqual(len(restored), 1)
+        pd.testing.assert_series_equal(restored[0][1], self.numeric)
+
+        save_session(self.path, items, embed=True)
+        restored = list(iter_series(self.path, read_session(self.path)))
+        self.assertEqual([series.name for _, series in restored],
+                         ['counter', 'gone'])
+
+    def test_summary_and_outline(self):
+        series = self.timeseries.copy()
+        series.iloc[0] = np.nan
+        items = [Item(series), Item(self.numeric)]
+        items[0].outline = series.iloc[::10]
+        save_session(self.path, items)
+        entries = read_session(self.path)['items']
+        for entry, item in zip(entries, items):
+            self.assertEqual(entry_summary(entry), item.summary)
+            self.assertTrue(entry['sorted'])
+        self.assertEqual(entry_summary(entries[0]).first.tz,
+                         series.index.tz)
+        pd.testing.assert_series_equal(entry_outline(self.path, entries[0]),
+                                       items[0].outline, check_freq=False)
+        self.assertIsNone(entry_outline(self.path, entries[1]))
+
+    def test_derived_items_are_saved_as_expression(self):
+        derived = Item(self.timeseries.rename('double'))
+        derived.is_derived = True
+        derived.slicer = DerivedSlicer('meter * 2')
+        save_session(self.path, [Item(self.timeseries), derived])
+        saved = read_session(self.path)
+        self.assertEqual([entry['name'] for entry, _ in
+                          iter_series(self.path, saved)], ['meter'])
+        entries = derived_entries(saved)
+        self.assertEqual([entry['expression'] for entry in entries],
+                         ['meter * 2'])
+        self.assertNotIn('values', entries[0])
@@ -0,0 +1,97 @@
+from __future__ import print_function, division
+
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector.slicing import (
+    IndexSlicer,
+    _gallop,
+    minmax_decimate,
+    date_number,
+    from_date_number,
+)
+
+
+class TestIndexSlicer(TestCase):
+    def setUp(self):
+        self.timeseries = pd.Series(
+            data=np.arange(1000.0),
+            index=pd.date_range('2016-10-29 22:00:00', periods=1000, freq='1min')
+        )
+        self.numseries = pd.Series(
+            data=np.arange(1000.0),
+            index=np.arange(0, 2000, 2),
+        )
+
+    def assert_same_as_loc(self, series, slicer, x0, x1):
+        expected = series.loc[x0:x1]
+        x_values, y_values = slicer.slice(x0, x1)
+        np.testing.assert_array_equal(x_values, expected.index.values)
+        np.testing.assert_array_equal(y_values, expected.values)
+
+    def test_matches_loc_on_datetimeindex(self):
+        slicer = IndexSlicer(self.timeseries)
+        index = self.timeseries.index
+        for i0, i1 in [(0, 10), (5, 500), (400, 999), (600, 601), (3, 3)]:
+            self.assert_same_as_loc(
+                self.timeseries, slicer, index[i0].to_pydatetime(), index[i1]
+            )
+
+    def test_matches_loc_on_numeric_index(self):
+        slicer = IndexSlicer(self.numseries)
+        for x0, x1 in [(-5, 3), (1.5, 300.5), (1000, 998), (1990, 5000),
+                       (7, 7), (250, 1010)]:
+            self.assert_same_as_loc(self.numseries, slicer, x0, x1)
+
+    def test_returns_views(self):
+        slicer = IndexSlicer(self.numseries)
+        _, y_values = slicer.slice(10, 20)
+        self.assertTrue(np.shares_memory(y_values, self.numseries.values))
+
+    def test_axis_values_are_date_numbers(self):
+        from matplotlib.dates import date2num
+        slicer = IndexSlicer(self.timeseries)
+        index = self.timeseries.index
+        np.testing.assert_allclose(slicer.axis_values,
+                                   date2num(index.to_pydatetime()),
+                                   rtol=0, atol=1e-9)
+        self.assertIs(slicer.axis_values, slicer.axis_values)
+        x_values, _ = slicer.axis_slice(index[5], index[9])
+        np.testing.assert_array_equal(x_values, slicer.axis_values[5:10])
+        keys, x_values, _, i0, i1 = slicer.window_arrays(index[5], index[9])
+        self.assertEqual((i0, i1), (5, 10))
+        self.assertIs(x_values, slicer.axis_values)
+        stamp = index[7].tz_localize('Europe/Stockholm')
+        self.assertAlmostEqual(date_number(stamp), date2num(stamp), places=9)
+        self.assertEqual(from_date_number(date_number(index[7])),
+                         index[7].to_pydatetime())
+        numeric = IndexSlicer(self.numseries).axis_values
+        self.assertEqual(numeric.dtype, np.float64)
+
+    def test_gallop_matches_searchsorted(self):
+        keys = np.sort(np.random.randint(0, 500, 300))
+        for key in [-1, 0, 17, 250, 499, 500]:
+            for side in ['left', 'right']:
+                expected = np.searchsorted(keys, key, side=side)
+                for hint in [0, 1, 150, 299, 300]:
+                    self.assertEqual(_gallop(keys, key, hint, side), expected)
+
+
+class TestMinmaxDecimate(TestCase):
+    def test_keeps_extremes_and_order(self):
+        x_values = np.arange(10001)
+        y_values = np.sin(x_values / 50.0)
+        y_values[1234] = 5
+        y_values[7777] = -5
+        x_dec, y_dec = minmax_decimate(x_values, y_values, 200)
+        self.assertLessEqual(len(y_dec), 204)
+        self.assertTrue(np.all(np.diff(x_dec) >= 0))
+        self.assertEqual(y_dec.max(), 5)
+        self.assertEqual(y_dec.min(), -5)
+
+    def test_short_input_is_returned_as_is(self):
+        x_values, y_values = np.arange(10), np.arange(10.0)
+        x_dec, y_dec = minmax_decimate(x_values, y_values, 100)
+        self.assertIs(y_dec, y_values)
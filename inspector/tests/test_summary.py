@@ -0,0 +1,54 @@
+from __future__ import print_function, division
+
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from inspector import summary as summary_module
+from inspector.summary import merge_summaries, summarize, summary_text
+
+
+class TestSummary(TestCase):
+    def setUp(self):
+        values = np.arange(20.0)
+        values[[0, 1, 7, 19]] = np.nan
+        self.series = pd.Series(
+            values, index=pd.date_range('2017-01-01', periods=20, freq='10s')
+        )
+
+    def test_summarize(self):
+        summary = summarize(self.series)
+        index = self.series.index
+        self.assertEqual((summary.n, summary.n_nan), (20, 4))
+        self.assertEqual((summary.min, summary.max), (2.0, 18.0))
+        self.assertEqual((summary.first, summary.last), (index[0], index[-1]))
+        self.assertEqual(summary.first_valid, self.series.first_valid_index())
+        self.assertEqual(summary.last_valid, self.series.last_valid_index())
+        self.assertEqual(summary.median_interval, pd.Timedelta('10s'))
+        self.assertIn('20 values, 4 missing', summary_text(summary))
+
+    def test_all_missing_and_unsorted(self):
+        summary = summarize(pd.Series([np.nan, np.nan], index=[3.0, 1.0]))
+        self.assertIsNone(summary.first_valid)
+        self.assertTrue(np.isnan(summary.min))
+        self.assertEqual((summary.first, summary.last), (1.0, 3.0))
+        self.assertIsNone(summarize(pd.Series([1.0])).median_interval)
+
+    def test_sampled_median_interval(self):
+        original = summary_module.INTERVAL_SAMPLES
+        summary_module.INTERVAL_SAMPLES = 10
+        try:
+            series = pd.Series(np.ones(1000), index=np.arange(1000) * 2.0)
+            self.assertEqual(summarize(series).median_interval, 2.0)
+        finally:
+            summary_module.INTERVAL_SAMPLES = original
+
+    def test_merge_matches_full(self):
+        head, tail = self.series.iloc[:12], self.series.iloc[12:]
+        merged = merge_summaries(summarize(head), summarize(tail))
+        self.assertEqual(merged, summarize(self.series))
+        # Nothing valid in the appended part
+        merged = merge_summaries(summarize(self.series.iloc[:19]),
+                                 summarize(self.series.iloc[19:]))
+        self.assertEqual(merged, summarize(self.series))
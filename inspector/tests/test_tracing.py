@@ -0,0 +1,68 @@
+from __future__ import print_function, division
+
+from unittest import TestCase
+
+from inspector.tracing import Tracer, SlotMetrics
+
+
+class TestTracer(TestCase):
+    def test_ring_buffer_keeps_latest_spans(self):
+        tracer = Tracer(capacity=3)
+        for name in ['a', 'b', 'c', 'd']:
+            with tracer.span(name):
+                pass
+        self.assertEqual([e.name for e in tracer.events], ['b', 'c', 'd'])
+
+    def test_summary_and_chrome_trace(self):
+        tracer = Tracer()
+
+        @tracer.traced('outer')
+        def outer():
+            with tracer.span('inner'):
+                pass
+        outer()
+        outer()
+        summary = {row[0]: row[1] for row in tracer.summary()}
+        self.assertEqual(summary, {'outer': 2, 'inner': 2})
+        events = tracer.chrome_trace()['traceEvents']
+        self.assertEqual(len(events), 4)
+        self.assertTrue(all(e['ph'] == 'X' and e['dur'] >= 0 for e in events))
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(enabled=False)
+        with tracer.span('a'):
+            pass
+        self.assertEqual(len(tracer.events), 0)
+
+
+class TestSlotMetrics(TestCase):
+    def test_instrumented_slot_is_recorded(self):
+        metrics = SlotMetrics(enabled=True)
+        calls = []
+        slot = metrics.instrument(calls.append, 'sig_item_added')
+        slot(1)
+        slot(2)
+        self.assertEqual(calls, [1, 2])
+        (row,) = metrics.as_list()
+        self.assertEqual(row['signal'], 'sig_item_added')
+        self.assertEqual(row['count'], 2)
+        self.assertEqual(sum(row['histogram']), 2)
+        metrics.clear()
+        self.assertEqual(sum(metrics.as_list()[0]['histogram']), 0)
+
+    def test_disabled_metrics_return_slot_unchanged(self):
+        metrics = SlotMetrics(enabled=False)
+        self.assertIs(metrics.instrument(len, 'sig'), len)
+
+    def test_instrumented_slot_keeps_arity(self):
+        # PyQt retries a raw slot with fewer arguments, e.g. without the
+        # 'checked' of QAction.triggered, the wrapper has to do the same
+        metrics = SlotMetrics(enabled=True)
+        calls = []
+        slot = metrics.instrument(lambda: calls.append('called'), 'triggered')
+        slot(False)
+        self.assertEqual(calls, ['called'])
+        slot = metrics.instrument(lambda *args: calls.extend(args), 'sig')
+        slot(1, 2)
+        self.assertEqual(calls, ['called', 1, 2])
+        self.assertEqual(metrics.as_list()[0]['count'], 1)
@@ -0,0 +1,237 @@
+from __future__ import print_function, division
+
+import os
+import json
+import inspect
+import logging
+import threading
+logger = logging.getLogger('trce')
+
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer
+
+
+TraceEvent = namedtuple('TraceEvent', ['name', 'start', 'duration', 'thread'])
+
+
+class Tracer(object):
+    """
+    Records named timing spans into an in-memory ring buffer.
+
+    Spans may be nested; export to Chrome trace-event JSON (load the file in
+    chrome://tracing or https://ui.perfetto.dev) to see them as a flame chart.
+
+    Example:
+    >>> with tracer.span('detail.slice'):
+    ...     do_work()
+    """
+    def __init__(self, capacity=20000, enabled=True):
+        """
+        :param capacity: int, number of spans kept (oldest are dropped)
+        :param enabled: bool
+        """
+        self.events = deque(maxlen=capacity)
+        self.enabled = enabled
+        self._t0 = default_timer()
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.events.append(TraceEvent(
+                name,
+                start,
+                default_timer() - start,
+                threading.current_thread().ident,
+            ))
+
+    def traced(self, name):
+        """Decorator recording every call of the function as a span"""
+        def inner(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return inner
+
+    def clear(self):
+        self.events.clear()
+
+    def summary(self):
+        """
+        :return: [(name, count, total s, mean s, max s)] sorted by total time
+        """
+        stats = {}
+        for event in list(self.events):
+            count, total, max_ = stats.get(event.name, (0, 0.0, 0.0))
+            stats[event.name] = (count + 1, total + event.duration,
+                                 max(max_, event.duration))
+        rows = [(name, count, total, total / count, max_)
+                for name, (count, total, max_) in stats.items()]
+        return sorted(rows, key=lambda row: -row[2])
+
+    def chrome_trace(self):
+        """
+        :return: dict in Chrome trace-event format (complete 'X' events,
+            timestamps in microseconds)
+        """
+        pid = os.getpid()
+        trace_events = [
+            {
+                'name': event.name,
+                'cat': event.name.split('.')[0],
+                'ph': 'X',
+                'ts': (event.start - self._t0) * 1e6,
+                'dur': event.duration * 1e6,
+                'pid': pid,
+                'tid': event.thread,
+            }
+            for event in list(self.events)
+        ]
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as fh:
+            json.dump(self.chrome_trace(), fh)
+        logger.info('Exported {} trace events to {}'.format(len(self.events),
+                                                            path))
+
+
+# Application-wide tracer for the data-to-pixels path.
+# Disable with the environment variable INSPECTOR_TRACE=0
+tracer = Tracer(enabled=os.environ.get('INSPECTOR_TRACE', '1') != '0')
+
+
+def callable_name(func):
+    """Readable name of a slot, e.g. 'DetailView.add_item'"""
+    owner = getattr(func, '__self__', None)
+    name = getattr(func, '__name__', None)
+    if owner is not None and name:
+        return '{}.{}'.format(type(owner).__name__, name)
+    elif name:
+        return name
+    # functools.partial and the like
+    return callable_name(func.func) if hasattr(func, 'func') else repr(func)
+
+
+def fit_arguments(func):
+    """
+    Return func wrapped to drop the positional arguments it does not take,
+    as PyQt does when it retries a slot that raised TypeError. Wrappers that
+    take *args defeat that retry, so they must call slots through this.
+
+    :return: callable, func itself if it takes any number of arguments, or
+        None if its signature is unknown (e.g. builtins, Python 2)
+    """
+    signature = getattr(inspect, 'signature', None)
+    try:
+        parameters = signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    n_positional = 0
+    for parameter in parameters:
+        if parameter.kind == parameter.VAR_POSITIONAL:
+            return func
+        if parameter.kind in (parameter.POSITIONAL_ONLY,
+                              parameter.POSITIONAL_OR_KEYWORD):
+            n_positional += 1
+
+    @wraps(func)
+    def fitted(*args, **kwargs):
+        return func(*args[:n_positional], **kwargs)
+    return fitted
+
+
+class SlotMetrics(object):
+    """
+    Call counts, cumulative time and latency histograms per (signal, slot)
+    pair, collected by wrapping slots when they are connected.
+
+    Histogram bucket i counts calls that took less than 2**i microseconds
+    (the last bucket also holds anything slower).
+    """
+    n_buckets = 25  # Up to ~16 s
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stats = {}
+
+    def instrument(self, slot, signal_name):
+        """
+        Return slot wrapped so that its calls are recorded under
+        (signal_name, name of slot), or slot itself if metrics are disabled
+        or its signature is unknown
+        """
+        if not self.enabled:
+            return slot
+        call = fit_arguments(slot)
+        if call is None:
+            logger.debug('Not instrumenting %s, unknown signature', slot)
+            return slot
+        key = (signal_name, callable_name(slot))
+        stats = self.stats.setdefault(key, {
+            'count': 0,
+            'total': 0.0,
+            'max': 0.0,
+            'histogram': [0] * self.n_buckets,
+        })
+        histogram = stats['histogram']
+        last_bucket = self.n_buckets - 1
+
+        @wraps(slot)
+        def measured_slot(*args, **kwargs):
+            start = default_timer()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                duration = default_timer() - start
+                stats['count'] += 1
+                stats['total'] += duration
+                stats['max'] = max(stats['max'], duration)
+                micros = int(duration * 1e6)
+                histogram[min(micros.bit_length(), last_bucket)] += 1
+        return measured_slot
+
+    def clear(self):
+        for stats in self.stats.values():
+            stats.update(count=0, total=0.0, max=0.0)
+            # In place, the instrumented slots hold on to the list
+            stats['histogram'][:] = [0] * self.n_buckets
+
+    def as_list(self):
+        """
+        :return: [dict] sorted by cumulative time, slowest first
+        """
+        rows = []
+        for (signal_name, slot_name), stats in self.stats.items():
+            row = dict(stats, signal=signal_name, slot=slot_name)
+            row['mean'] = stats['total'] / stats['count'] \
+                                if stats['count'] else 0.0
+            rows.append(row)
+        return sorted(rows, key=lambda row: -row['total'])
+
+    def dump(self, path):
+        with open(path, 'w') as fh:
+            json.dump({
+                'histogram_bucket_upper_bounds_us': [
+                    2 ** i for i in range(self.n_buckets)
+                ],
+                'slots': self.as_list(),
+            }, fh, indent=1)
+        logger.info('Dumped slot metrics for {} slots to {}'.format(
+            len(self.stats), path
+        ))
+
+
+# Opt in by setting the environment variable INSPECTOR_SLOT_METRICS=1
+slot_metrics = SlotMetrics(
+    enabled=bool(os.environ.get('INSPECTOR_SLOT_METRICS', ''))
+)
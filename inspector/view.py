@@ -2,15 +2,13 @@ from __future__ import print_function, division, unicode_literals
 
 # stdlib imports
 import os
-import pickle  # Could use cPickle if python2 
 import logging
 import json
 import argparse
-import gzip
 
 from time import time
 from datetime import datetime
-from operator import itemgetter, methodcaller
+from operator import methodcaller
 from numbers import Number
 from functools import partial
 
@@ -21,6 +19,7 @@ import pandas as pd
 # Matplotlib and Qt imports
 import matplotlib as mpl
 from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
 from matplotlib.backend_bases import key_press_handler
 
 from matplotlib.backends.qt_compat import QtWidgets, QtCore, QtGui, is_pyqt5
@@ -40,8 +39,21 @@ from inspector.helpers import pyqtSignal, Qt
 
 # Project imports
 from inspector.spanviews import DetailView, OutlineView
-from inspector.plugins import discover_plugins, all_plugins
-from inspector.helpers import print_out, create_action, debug_decorator
+from inspector.loaders import decode_bytes, read_file
+from inspector.slicing import IndexSlicer
+from inspector.filecache import open_decoded_cache
+from inspector import exchange, session, aggregates
+from inspector.scheduler import RedrawScheduler
+from inspector.prefetch import WindowPrefetcher, window_key
+from inspector.plugins import discover_plugins, all_plugins, load_plugin
+from inspector.helpers import (
+    action_profiler,
+    print_out,
+    create_action,
+    instrument_slot,
+    signal_name,
+)
+from inspector.tracing import tracer, slot_metrics
 from inspector.constants import (
     SPAN_ALPHA,
     LABEL_COLOR_MAP,
@@ -53,28 +65,10 @@ from inspector.constants import (
 )
 
 
-def msgpack_lz4_to_series(data):
-    try:
-        import msgpack
-        import lz4
-    except ImportError:
-        logging.info('To load lz4-msgpacked data, '
-                     'install packages "python-msgpack" and "lz4"')
-        raise
-    content = msgpack.loads(lz4.decompress(data))
-    series_load = lambda d: pd.Series(
-        data=d['values'],
-        index=d['index'] if d['index'][-1] <= 1e9 \
-                         else pd.DatetimeIndex(d['index']),
-        name=d['id']
-    )
-    seria = list(map(series_load, content))
-
-    return seria
-
-
 logger = logging.getLogger('view')
 
+MARKINGS_FILE_FILTER = 'Markings (*.lz4 *.csv *.csv.gz);;All files (*)'
+
 
 class View(QtWidgets.QMainWindow):
     """The main widget where all graphical elements are set up, signals
@@ -123,7 +117,21 @@ class View(QtWidgets.QMainWindow):
         for k, v in self.model.signals.items():
             self.avail_signals[k] = v
 
-        self.draw_timer = QtCore.QTimer()
+        self.redraw_scheduler = RedrawScheduler(self.canvas_redraw)
+        self.file_cache = open_decoded_cache()
+        self.prefetcher = None  # Set up together with the views
+        self._paging = False
+        # Prefetched windows are decimated, and shown at full resolution
+        # once paging pauses for this long
+        self.full_resolution_delay_ms = 200
+        self._full_resolution_timer = QtCore.QTimer()
+        self._full_resolution_timer.setSingleShot(True)
+        self._full_resolution_timer.timeout.connect(self.show_full_resolution)
+        self._decimated_window = None  # Detail view axis coordinates
+        self._showing_prefetched = False
+        # Parts of the figure per view as of the last full render
+        self.view_bands = None
+        self._rendering = False
         self.init_ui()
         self.canvas_redraw()
 
@@ -140,11 +148,16 @@ class View(QtWidgets.QMainWindow):
     def parse_sysargs(self):
         parser = argparse.ArgumentParser()
         parser.add_argument('files', nargs='*')
+        parser.add_argument('--profile', action='store_true',
+                            help='profile loading of files, or else the '
+                                 'first plugin CLI action')
         for plugin_name, _ in all_plugins().items():
             parser.add_argument('--%s' %plugin_name, required=False, nargs='*')
         args = parser.parse_args()
+        if args.profile:
+            action_profiler.arm()
         if args.files:
-            self.load_files(args.files)
+            action_profiler.wrap(self.load_files, 'cli: load files')(args.files)
         for plugin_name, _ in all_plugins().items():
             subargs = getattr(args, plugin_name.replace('-','_'))
             if subargs is None or not isinstance(subargs, list):
@@ -173,9 +186,10 @@ class View(QtWidgets.QMainWindow):
                 cmd_kwargs = json.loads(subargs[1]) if len(subargs) > 1 else {}
                 logger.debug('Calling {}:{} with {}'
                              ''.format(plugin_name, cmd, cmd_kwargs))
-                self.plugins[plugin_name].cli_actions[cmd](
-                    **cmd_kwargs
-                )
+                action_profiler.wrap(
+                    self.plugins[plugin_name].cli_actions[cmd],
+                    'cli: {} {}'.format(plugin_name, cmd)
+                )(**cmd_kwargs)
 
     def init_ui(self):
         self.win = QtWidgets.QWidget()
@@ -187,6 +201,7 @@ class View(QtWidgets.QMainWindow):
         logger.debug('Set up done: List view')
 
         self.marking_label = self.setup_marking_label()
+        self.stats_panel = self.setup_stats_panel()
 
         (
         self.fig,
@@ -198,6 +213,7 @@ class View(QtWidgets.QMainWindow):
         self.outline_view,
         self.detail_view,
         ) = self.setup_views(self.fig, self.model.items)
+        self.prefetcher = WindowPrefetcher(self.detail_view.prepare_interval)
         logger.debug('Set up done: Views')
         self.setup_connections()
         logger.debug('Set up done: Connections')
@@ -227,6 +243,7 @@ class View(QtWidgets.QMainWindow):
         self.help_list.setModel(self.help_item_model)
         self.grid_left.addWidget(self.help_list, 2, 0, 1, 1)
         self.grid_left.addWidget(self.list_view, 4, 0, 4, 1)
+        self.grid_left.addWidget(self.stats_panel, 8, 0, 1, 1)
 
         # Right side
         self.frame_right = QtWidgets.QFrame()
@@ -280,12 +297,14 @@ class View(QtWidgets.QMainWindow):
     def setup_plugin_menus(self):
         self.plugin_menus = {}
         discover_plugins()
-        for name, class_ in sorted(all_plugins().items()):
+        # Menus are built from plugin references, plugin modules are not
+        # imported until the plugin gets enabled
+        for name, plugin_ref in sorted(all_plugins().items()):
             menu = self.menuBar().addMenu(name)
             self.actions['toggle_plugin_' + name] = create_action(
                 text='Enabled'.format(name),
                 parent=self,
-                connect_bool=partial(self.toggle_plugin, class_),
+                connect_bool=partial(self.toggle_plugin, plugin_ref),
                 add_to=menu,
                 checkable=True,
             )
@@ -316,6 +335,29 @@ class View(QtWidgets.QMainWindow):
         )
         return marking_label
 
+    def setup_stats_panel(self):
+        stats_panel = QtWidgets.QPlainTextEdit()
+        stats_panel.setReadOnly(True)
+        stats_panel.setPlaceholderText(
+            'Statistics of the visible series over a span selected in the '
+            'detail view'
+        )
+        stats_panel.setSizePolicy(
+            QtWidgets.QSizePolicy.Preferred,
+            QtWidgets.QSizePolicy.Minimum,
+        )
+        return stats_panel
+
+    def show_span_stats(self, x0, x1):
+        """Show the statistics of each visible item over [x0, x1]"""
+        texts = ['{} <==> {}'.format(x0, x1)]
+        for item in self.model.get_items(only_visible=True):
+            name = item.name + (' (derived)' if item.is_derived else '')
+            texts.append(aggregates.stats_text(
+                name, item.interval_stats(x0, x1), item.slicer.is_time
+            ))
+        self.stats_panel.setPlainText('\n'.join(texts))
+
     def set_marking_label(self, label):
         logging.debug('Setting marking label to %s %s', self, label)
         color = QtGui.QColor(LABEL_COLOR_MAP.get(label, 'white'))
@@ -392,6 +434,42 @@ class View(QtWidgets.QMainWindow):
             connect=lambda: self.model.save_markings(only_visible=True),
             add_to=self.file_menu
         )
+        self.actions['export_markings'] = create_action(
+            '&Export markings for visible series to file...',
+            parent=self,
+            connect=lambda: self.export_markings(only_visible=True),
+            add_to=self.file_menu,
+        )
+        self.actions['export_all_markings'] = create_action(
+            'Export markings for all series to file...',
+            parent=self,
+            connect=lambda: self.export_markings(only_visible=False),
+            add_to=self.file_menu,
+        )
+        self.actions['import_markings'] = create_action(
+            '&Import markings from file...',
+            parent=self,
+            connect=lambda: self.import_markings(),
+            add_to=self.file_menu,
+        )
+        self.actions['save_session'] = create_action(
+            'Save s&ession...',
+            parent=self,
+            connect=lambda: self.save_session(embed=False),
+            add_to=self.file_menu,
+        )
+        self.actions['save_session_embedded'] = create_action(
+            'Save session with embedded data...',
+            parent=self,
+            connect=lambda: self.save_session(embed=True),
+            add_to=self.file_menu,
+        )
+        self.actions['open_session'] = create_action(
+            '&Open session...',
+            parent=self,
+            connect=lambda: self.restore_session(),
+            add_to=self.file_menu,
+        )
         self.actions['save_interval_cleaned'] = create_action(
             'Save visible series as cleaned',
             parent=self,
@@ -452,61 +530,105 @@ class View(QtWidgets.QMainWindow):
             shortcut=Qt.Key_Delete,
             connect=self.remove_selected_list_items,
         )
+        self.actions['add_derived_series'] = create_view_action(
+            'Add &derived series...',
+            connect=lambda: self.add_derived_series(),
+        )
         self.actions['maximize_interval'] = create_view_action(
             'M&aximize display interval',
             shortcut=Qt.Key_K,
             connect=self.outline_view.display_maximal_interval,
         )
+        self.actions['live_preview'] = create_view_action(
+            'Live detail &preview while dragging',
+            connect_bool=self.outline_view.set_live_preview,
+            checkable=True,
+        )
+        self.actions['live_preview'].setChecked(self.outline_view.live_preview)
+        self.actions['show_cleaned'] = create_view_action(
+            'Overlay &cleaned series',
+            connect_bool=self.detail_view.set_show_cleaned,
+            checkable=True,
+        )
+        self.actions['show_trace'] = create_view_action(
+            'Show frame &timings',
+            connect=self.show_trace_dialog,
+        )
+        self.actions['dump_slot_metrics'] = create_view_action(
+            'Dump slot metrics to file',
+            connect=self.dump_slot_metrics,
+        )
+        self.actions['profile_next_action'] = create_view_action(
+            '&Profile next action',
+            connect_bool=action_profiler.arm,
+            checkable=True,
+            profile=False,
+        )
 
     def setup_connections(self):
         sources_to_targets = {
-            self.draw_timer.timeout: self.canvas_redraw,
-
             self.list_view.sig_dropped: self.load_files,
 
             # Data unchecked / added / removed
-            self.model.item_model.itemChanged: self.detail_view.item_changed,
+            self.model.item_model.itemChanged: [self.detail_view.item_changed,
+                                                self.invalidate_prefetched],
+
+            self.model.sig_items_added: [self.detail_view.add_items,
+                                         self.outline_view.add_items,
+                                         self.add_list_item,
+                                         self.invalidate_prefetched],
+
+            self.model.sig_items_removed: [self.detail_view.remove_items,
+                                           self.outline_view.remove_items,
+                                           self.invalidate_prefetched],
 
-            self.model.sig_item_added: [self.detail_view.add_item,
-                                        self.outline_view.add_item,
-                                        self.add_list_item,],
+            self.model.sig_items_appended: [self.detail_view.replot_items,
+                                            self.outline_view.replot_items,
+                                            self.invalidate_prefetched],
 
-            self.model.sig_item_removed: [self.detail_view.remove_item,
-                                          self.outline_view.remove_item,],
+            # Prefetched windows depend on the items and their visibility
+            self.outline_view.sig_interval_selected: self.on_interval_selected,
 
             self.detail_view.sig_redraw_request: self.request_canvas_redraw,
 
             # New marking chain
-            self.detail_view.sig_span_selected: self.model.new_marking,
+            self.detail_view.sig_span_selected: [self.model.new_marking,
+                                                 self.show_span_stats],
 
             self.detail_view.sig_span_picked: self.marking_picked,
 
             self.outline_view.sig_redraw_request: self.request_canvas_redraw,
 
-            self.model.sig_marking_added: [self.outline_view.add_marking_span,
-                                           self.detail_view.add_marking_span],
+            self.model.sig_markings_added: [
+                self.outline_view.add_marking_spans,
+                self.detail_view.add_marking_spans,
+                self.detail_view.update_cleaned,
+            ],
 
-            self.model.sig_marking_removed: [
-                self.outline_view.remove_marking_span,
-                self.detail_view.remove_marking_span,
+            self.model.sig_markings_removed: [
+                self.outline_view.remove_marking_spans,
+                self.detail_view.remove_marking_spans,
+                self.detail_view.update_cleaned,
             ],
 
             self.model.sig_marking_label_updated: [
                 self.outline_view.update_span_color,
                 self.detail_view.update_span_color,
+                self.detail_view.update_cleaned,
             ]
         }
         for source, target in sources_to_targets.items():
             targets = target if isinstance(target, list) \
                              else [target]
             for target_i in targets:
-                if os.environ.get('PYDEBUG', None):
-                    target_i = debug_decorator(target_i, str(target_i.__name__))
-                source.connect(target_i)
+                source.connect(instrument_slot(target_i, signal_name(source)))
+
+        action_profiler.sig_profile_saved.connect(self.show_profile_summary)
 
         # Other connections
         self.canvas.mpl_connect('pick_event', self.detail_view.on_pick)
         self.canvas.mpl_connect('key_press_event', self.on_key_press)
+        self.canvas.mpl_connect('draw_event', self.on_canvas_draw)
 
     def setup_list_view(self, item_model):
         list_view = SeriesListView()
@@ -529,6 +651,13 @@ class View(QtWidgets.QMainWindow):
         canvas.setFocusPolicy( Qt.ClickFocus )
         canvas.setFocus() # put last?
         toolbar = NavigationToolbar(canvas, parent=self)
+        fig.subplots_adjust(
+            left=0.04,
+            right=0.99,
+            top=0.96,
+            bottom=0.04,
+            hspace=0.12
+        )
         # Since we have only one plot, we can use add_axes
         # instead of add_subplot, but then the subplot
         # configuration tool in the navigation toolbar wouldn't
@@ -557,41 +686,125 @@ class View(QtWidgets.QMainWindow):
             items
         )
         outline_view.sig_interval_selected.connect(
-            detail_view.display_interval
+            self.display_selected_interval
+        )
+        outline_view.sig_interval_previewed.connect(
+            detail_view.preview_interval
         )
         return outline_view, detail_view
 
+    def closeEvent(self, event):
+        # The profiler is shared by all views, and outlives this one
+        try:
+            action_profiler.sig_profile_saved.disconnect(
+                self.show_profile_summary
+            )
+        except TypeError:
+            pass  # Closed before
+        super(View, self).closeEvent(event)
+
     def resizeEvent(self, resizeEvent):
-        self.canvas_redraw()
+        super(View, self).resizeEvent(resizeEvent)
+        self.request_canvas_redraw(self, ('axes', 'ticks'))
 
-    def request_canvas_redraw(self):
-        self.draw_timer.stop()
-        self.draw_timer.start(10)
-        logger.debug('Redraw requested at {}'.format(time()))
-        self.statusBar().showMessage('Redraw requested at {}'.format(time()))
+    def request_canvas_redraw(self, view=None, layers=()):
+        """
+        Schedule a redraw through the redraw scheduler, which renders at
+        most once per frame however many requests come in
+
+        :param view: object whose layers changed, e.g. a SpanView
+        :param layers: [str], see RedrawScheduler.LAYERS. All if empty.
+        """
+        logger.debug('Redraw of %s requested by %s', layers, view)
+        self.redraw_scheduler.request(view or self, *layers)
 
-    def canvas_redraw(self):
+    @tracer.traced('canvas.redraw')
+    def canvas_redraw(self, dirty=None):
+        """
+        Render the figure. Called by the redraw scheduler with the dirty
+        layers per view, or directly for an immediate full redraw.
+
+        Views whose only dirty layer is 'spans' have their spans, and the
+        lines over them, blitted over the background of the last render,
+        other dirty views have their band of the figure redrawn (see
+        SpanView.render_band). Requests by the View itself, e.g. after
+        resizing, redraw the whole figure.
+        """
         logger.debug('Commencing redraw')
         draw_t0 = time()
-        self.fig.subplots_adjust(
-            left=0.04,
-            right=0.99,
-            top=0.96,
-            bottom=0.04,
-            hspace=0.12
-        )
-        self.fig.canvas.draw()
+        views = [self.outline_view, self.detail_view]
+        if (not dirty or self.view_bands is None
+                or any(view not in views or view.background is None
+                       for view in dirty)):
+            self.render_figure()
+        else:
+            for view, layers in dirty.items():
+                if set(layers) == {'spans'}:
+                    view.render_spans(self.canvas)
+                elif not view.render_band(self.canvas, self.view_bands[view]):
+                    self.render_figure()
+                    break
         t_diff = time() - draw_t0
-        self.draw_timer.stop()
-        fps = int(round(1/t_diff))
+        fps = int(round(1/t_diff)) if t_diff else 0
         status_msg = 'Ready, last draw: {} s ({} fps)'.format(round(t_diff, 2), fps)
         self.statusBar().showMessage(status_msg)
         logger.debug(status_msg)
 
-    def toggle_plugin(self, plugin_class, state):
+    def render_figure(self):
+        """Draw the whole figure, saving the backgrounds of the views"""
+        views = [self.outline_view, self.detail_view]
+        self._rendering = True
+        try:
+            with self.outline_view.overlay_hidden(), \
+                    self.detail_view.overlay_hidden():
+                with tracer.span('canvas.agg_draw'):
+                    self.fig.canvas.draw()
+        finally:
+            self._rendering = False
+        for view in views:
+            view.draw_overlay(self.canvas)
+        # The detail view is below the outline view. Split the figure below
+        # the tick labels of the outline view, if they clear the detail view.
+        renderer = self.canvas.get_renderer()
+        figure_box = self.fig.bbox
+        split = self.outline_view.axes.get_tightbbox(renderer).y0
+        if split <= self.detail_view.axes.bbox.y1:
+            self.view_bands = None
+            return
+        self.view_bands = {
+            self.outline_view: Bbox.from_extents(
+                figure_box.x0, split, figure_box.x1, figure_box.y1
+            ),
+            self.detail_view: Bbox.from_extents(
+                figure_box.x0, figure_box.y0, figure_box.x1, split
+            ),
+        }
+
+    def on_canvas_draw(self, event):
+        """
+        Invalidate the saved backgrounds after draws by others, e.g. the
+        navigation toolbar
+        """
+        if self._rendering:
+            return
+        for view in [self.outline_view, self.detail_view]:
+            view.background = None
+
+    def toggle_plugin(self, plugin, state):
+        """
+        :param plugin: plugins.PluginRef | plugin class
+        :param state: bool, enable or disable
+        """
         if state:
-            if plugin_class.name in self.plugins:
-                raise Exception('expected {} to be disabled'.format(plugin_class))
+            if plugin.name in self.plugins:
+                raise Exception('expected {} to be disabled'.format(plugin))
+            try:
+                plugin_class = load_plugin(plugin)
+            except Exception:
+                logger.exception('Could not import plugin %s', plugin)
+                # setChecked does not emit triggered, the plugin stays disabled
+                self.actions['toggle_plugin_' + plugin.name].setChecked(False)
+                return
             instance = plugin_class()
             if hasattr(instance, 'actions'):
                 list(map(
@@ -603,9 +816,7 @@ class View(QtWidgets.QMainWindow):
             # Connect any plugin slots to known signals by name.
             # Currently assumes they can be found in the self.model object.
             for sig, slot in instance.slot_bindings.items():
-                if os.environ.get('PYDEBUG', None):
-                    slot = debug_decorator(slot, slot.__name__)
-                self.avail_signals[sig].connect(slot)
+                self.avail_signals[sig].connect(instrument_slot(slot, sig))
                 # We could potentially add the slot here
                 # to self.avail_slots_by_signal. If so, we'd also have to remove
                 # it/them if we disabled the plugin.
@@ -615,24 +826,35 @@ class View(QtWidgets.QMainWindow):
             # Connect any plugin signals with known slots by name
             for sig_name, sig in instance.signals.items():
                 for slot in self.avail_slots_by_signal.get(sig_name, []):
-                    if os.environ.get('PYDEBUG', None):
-                        slot = debug_decorator(slot, slot.__name__)
-                    sig.connect(slot)
+                    sig.connect(instrument_slot(
+                        slot, '{}.{}'.format(plugin.name, sig_name)
+                    ))
             print_out('Enabled plugin: {}'.format(plugin_class.name))
         else:
-            instance = self.plugins.pop(plugin_class.name)
+            instance = self.plugins.pop(plugin.name)
             instance.destroy()
             # TODO disconnect any signals and slots?
-            print_out('Disabled plugin: {}'.format(plugin_class.name))
+            print_out('Disabled plugin: {}'.format(plugin.name))
 
     def load_seria(self, series_container, name=None):
         """
+        Add all series in series_container with a single
+        Model.add_dataitems
 
         :param series_container: Series | Dataframe | [float] | {str: Series}
             Also accepts a list of any of the above
             types (will looped over).
         :param name: str | None
         """
+        descriptions = []
+        self.collect_seria(series_container, name, descriptions)
+        self.model.add_dataitems(descriptions)
+
+    def collect_seria(self, series_container, name, descriptions):
+        """
+        Append keyword arguments of Model.add_dataitem for each series in
+        series_container to descriptions, see load_seria
+        """
         # numpy.ndarray
         if isinstance(series_container, np.ndarray):
             if min(series_container.shape) == 1 or series_container.ndim == 1:
@@ -640,25 +862,25 @@ class View(QtWidgets.QMainWindow):
                     series = pd.Series(series_container)
                 except Exception as e:
                     logger.error('Item {}: Could not make into Series: {}'
-                                 ''.format(idx, e))
+                                 ''.format(name, e))
                     return
-                self.model.add_dataitem(series, name)
+                descriptions.append({'series': series, 'name': name})
             else:
                 logger.error('Unsatisfactory array: %s' %series_container.shape)
                 return
 
         # pandas.Series
         elif isinstance(series_container, pd.Series):
-            self.model.add_dataitem(series_container, name)
+            descriptions.append({'series': series_container, 'name': name})
 
         # pandas.DataFrame, dict (recursion)
         elif isinstance(series_container, (pd.DataFrame, dict)):
             if 'series' in series_container:
-                self.model.add_dataitem(
-                    series=series_container.get('series'),
-                    name=series_container.get('name', None),
-                    metadata=series_container.get('metadata', None)
-                )
+                descriptions.append({
+                    'series': series_container.get('series'),
+                    'name': series_container.get('name', None),
+                    'metadata': series_container.get('metadata', None),
+                })
             else:
                 # Check items/iteritems for py2/py3 compatibility
                 if hasattr(series_container, 'items'):
@@ -666,17 +888,18 @@ class View(QtWidgets.QMainWindow):
                 else:
                     items =  series_container.iteritems()
                 for name, subcontainer in items:
-                    self.load_seria(subcontainer, name)
+                    self.collect_seria(subcontainer, name, descriptions)
 
         # tuple or list (call recursively)
         elif isinstance(series_container, (tuple, list)):
             if not series_container:
                 logger.debug('series_container empty')
             elif isinstance(series_container[0], Number):
-                self.load_seria(np.array(series_container))
+                self.collect_seria(np.array(series_container), None,
+                                   descriptions)
             else:
                 for item in series_container:
-                    self.load_seria(item)
+                    self.collect_seria(item, None, descriptions)
         else:
             logger.error('Could not load object: %s' % str(series_container)[:500])
 
@@ -686,69 +909,256 @@ class View(QtWidgets.QMainWindow):
                 self.load_file(p)
             except Exception as err:
                 logger.error('Could not load file {}. Unsupported filetype?\n{}'
-                             ''.format(p, err.message)
+                             ''.format(p, err)
                 )
 
     def load_file(self, path):
-        if path.endswith('.gz'):
-            open_ = gzip.open
-        else:
-            open_ = open
-        with open_(path, 'r') as fh:
-            contents = fh.read()
-        self.load_bytes(contents, data_source=path)
+        if session.is_session(path):
+            self.restore_session(path)
+            return
+        cached = self.file_cache.get(path) if self.file_cache else None
+        if cached is None:
+            seria = decode_bytes(read_file(path), data_source=path)
+            if seria is None:
+                return
+            outlines = []
+            for series in seria:
+                outline = self.outline_view.resample(series)
+                outlines.append(None if outline is series else outline)
+            if self.file_cache:
+                self.file_cache.put(path, seria, outlines)
+            cached = zip(seria, outlines)
+        self.add_loaded_seria(
+            [{'series': series, 'outline': outline}
+             for series, outline in cached],
+            path,
+        )
 
     def load_bytes(self, bytestring, data_source=''):
-        load_methods = [
-             msgpack_lz4_to_series,
-             pd.read_msgpack,
-             pickle.loads,
-        ]
-        seria = None
-        for loader in load_methods:
-            try:
-                loaded = loader(bytestring)
-            except Exception as err:
-                continue
-            if isinstance(loaded, pd.Series):
-                seria = [loaded]
-            elif isinstance(loaded, pd.DataFrame):
-                seria = list(map(
-                    itemgetter(1),
-                    loaded.iteritems()
-                ))
-            elif isinstance(loaded, list):
-                seria = loaded
-            else:
-                logger.error('Unexpected object found: {:.30}... (using deserializer {}'
-                          ''.format(seria, loader))
-                return
+        seria = decode_bytes(bytestring, data_source=data_source)
         if seria is None:
-            logger.error('Could not deserialize contents of {} with any of {}'
-                      ''.format(data_source, load_methods))
             return
-
-        for idx, series in enumerate(seria):
-            if not series.name:
-                if os.path.exists(data_source):
-                    prefix = os.path.split(data_source)[1]
-                else:
-                    prefix=data_source
-                series.name = '{}_{}'.join(map(str, [prefix, idx]))
-            self.model.add_dataitem(series, name=series.name)
+        self.add_loaded_seria([{'series': series} for series in seria],
+                              data_source)
+
+    def add_loaded_seria(self, descriptions, data_source):
+        for description in descriptions:
+            description['name'] = description['series'].name
+            description['source'] = data_source or None
+        for item in self.model.add_dataitems(descriptions):
             logger.info('Loaded "{n}" ({v} values) from {src}'
-                      ''.format(n=series.name, v=len(series), src=data_source))
+                      ''.format(n=item.name, v=len(item.series),
+                                src=data_source))
 
     def move_interval(self, direction):
         xlim = self.detail_view.axes.get_xlim()
         diff = xlim[1] - xlim[0]
         if direction == 'left':
             new_lim = (xlim[0] - diff, xlim[0])
+            step = -diff
         elif direction == 'right':
             new_lim = (xlim[1], xlim[1] + diff)
+            step = diff
         else:
             raise ValueError('urecognized move direction %s' %direction)
-        self.outline_view.on_span_select(*new_lim)
+
+        prepared = self.prefetcher.get(window_key(*new_lim))
+        self._paging = True
+        try:
+            if prepared is not None:
+                logger.debug('Showing prefetched window %s', new_lim)
+                self.detail_view.show_prepared(prepared)
+                self._decimated_window = new_lim
+                self._full_resolution_timer.start(
+                    self.full_resolution_delay_ms
+                )
+                # Selected as usual, for all listeners but the detail view
+                self._showing_prefetched = True
+            self.outline_view.on_span_select(*new_lim)
+        finally:
+            self._paging = False
+            self._showing_prefetched = False
+
+        # Prepare the next window in the paging direction, then the previous
+        for offset in [step, -step]:
+            self.prefetch_window(new_lim[0] + offset, new_lim[1] + offset)
+
+    def display_selected_interval(self, x0, x1):
+        """Show an interval selected in the outline view in the detail view"""
+        if self._showing_prefetched:
+            return  # Already shown, see move_interval
+        self._decimated_window = None
+        self.detail_view.display_interval(x0, x1)
+
+    def show_full_resolution(self):
+        """
+        Replace the decimated prefetched window shown by move_interval with
+        the full resolution data, unless another window is shown since
+        """
+        window, self._decimated_window = self._decimated_window, None
+        if window is None or window_key(*window) != \
+                window_key(*self.detail_view.axes.get_xlim()):
+            return
+        self.detail_view.display_interval(
+            *map(self.detail_view.from_xaxis, window)
+        )
+
+    def prefetch_window(self, x0, x1):
+        """
+        :param x0: float, in detail view axis coordinates
+        :param x1: float, in detail view axis coordinates
+        """
+        if not self.model.items:
+            return
+        items = [(item, item.visible) for item in self.model.items]
+        self.prefetcher.request(
+            window_key(x0, x1),
+            self.detail_view.from_xaxis(x0),
+            self.detail_view.from_xaxis(x1),
+            items=items,
+            max_points=self.detail_view.prefetch_n_points,
+            remember=False,  # Not thread safe
+        )
+
+    def on_interval_selected(self, x0, x1):
+        # Explicit selections in the outline view end any sequential paging
+        if not self._paging:
+            self.prefetcher.invalidate()
+
+    def invalidate_prefetched(self, *args):
+        self.prefetcher.invalidate()
+
+    def export_markings(self, only_visible=True, path=None):
+        """
+        :param path: str | None, asked for if None. See exchange for formats.
+        """
+        if path is None:
+            path = get_save_filename(self, 'Export markings',
+                                     'markings.lz4', MARKINGS_FILE_FILTER)
+            if not path:
+                return
+        items = list(self.model.get_items(only_visible=only_visible))
+        try:
+            exchange.export_markings(path, items)
+        except Exception:
+            logger.exception('Could not export markings to {}'.format(path))
+
+    def import_markings(self, path=None):
+        """
+        :param path: str | None, asked for if None. See exchange for formats.
+        """
+        if path is None:
+            path = get_open_filename(self, 'Import markings',
+                                     MARKINGS_FILE_FILTER)
+            if not path:
+                return
+        try:
+            exchange.import_markings(path, self.model)
+        except Exception:
+            logger.exception('Could not import markings from {}'.format(path))
+
+    def save_session(self, path=None, embed=False):
+        """
+        :param path: str | None, session directory, asked for if None
+        :param embed: bool, see session.save_session
+        """
+        if path is None:
+            path = get_save_filename(self, 'Save session', 'session.inspector')
+            if not path:
+                return
+        window = self.detail_view.axes.get_xlim() if self.model.items \
+                 else None
+        try:
+            session.save_session(path, self.model.items, window=window,
+                                 current_label=self.model.current_label,
+                                 embed=embed)
+        except Exception:
+            logger.exception('Could not save session to {}'.format(path))
+
+    def restore_session(self, path=None):
+        """
+        Add the items of a saved session at once through
+        Model.add_dataitems, with their saved summaries and outlines, derive
+        the derived items again, then restore their markings, visibility, the
+        current label and window
+
+        :param path: str | None, session directory, asked for if None
+        """
+        if path is None:
+            path = get_existing_directory(self, 'Open session')
+            if not path:
+                return
+        try:
+            saved = session.read_session(path)
+        except (IOError, OSError, ValueError) as err:
+            logger.error('Could not open session {}: {}'.format(path, err))
+            return
+        entries, descriptions = [], []
+        for entry, series in session.iter_series(path, saved):
+            entries.append(entry)
+            descriptions.append(dict(
+                series=series,
+                name=entry['name'],
+                metadata=entry['metadata'],
+                source=entry['source'],
+                outline=session.entry_outline(path, entry),
+                summary=session.entry_summary(entry),
+                slicer=IndexSlicer(series,
+                                   is_sorted=entry.get('sorted', False)),
+            ))
+        items = self.model.add_dataitems(descriptions)
+        by_series = dict((id(item.series), item) for item in items)
+        restored = [(entry, by_series.get(id(description['series'])))
+                    for entry, description in zip(entries, descriptions)]
+        # Derived from the items restored above
+        for entry in session.derived_entries(saved):
+            try:
+                item = self.model.add_derived_item(entry['expression'],
+                                                   name=entry['name'])
+            except (ValueError, TypeError) as err:
+                logger.error('Could not restore derived series {}: {}'.format(
+                    entry['name'], err
+                ))
+                item = None
+            restored.append((entry, item))
+        for entry, item in restored:
+            if item is None:
+                continue
+            if item.markings:
+                logger.info('Keeping the journaled markings of {} instead of '
+                            'those in the session'.format(item.name))
+            else:
+                self.model.add_markings(
+                    item, *session.marking_columns(path, entry)
+                )
+            if not entry['visible']:
+                item.setCheckState(Qt.Unchecked)
+        if saved['current_label']:
+            self.set_marking_label(saved['current_label'])
+        if saved['window'] and self.model.items:
+            self.outline_view.on_span_select(*saved['window'])
+
+    def add_derived_series(self, expression=None):
+        """
+        :param expression: str | None, asked for if None. See derived for
+            the syntax.
+        """
+        if expression is None:
+            expression, ok = QtWidgets.QInputDialog.getText(
+                self,
+                'Add derived series',
+                "Expression over item names, e.g. "
+                "mains - rolling(item('meter 1'), '15min')",
+            )
+            if not ok or not expression:
+                return
+        try:
+            self.model.add_derived_item(str(expression))
+        except (ValueError, TypeError) as err:
+            logger.error('Could not add derived series {}: {}'.format(
+                expression, err
+            ))
+            self.statusBar().showMessage(str(err))
 
     def selected_list_item_rows(self):
         rows = list(map(
@@ -801,6 +1211,37 @@ class View(QtWidgets.QMainWindow):
             )
        )
 
+    def show_trace_dialog(self):
+        if getattr(self, 'trace_dialog', None) is None:
+            self.trace_dialog = TraceDialog(tracer, parent=self)
+        self.trace_dialog.refresh()
+        self.trace_dialog.show()
+        self.trace_dialog.raise_()
+
+    def dump_slot_metrics(self, path=None):
+        if not slot_metrics.enabled:
+            logger.info('Slot metrics are not being collected. Restart with '
+                        'the environment variable INSPECTOR_SLOT_METRICS=1')
+            return
+        if not path:
+            path = datetime.now().strftime(
+                'inspector-slot-metrics-%Y%m%d-%H%M%S.json'
+            )
+        slot_metrics.dump(path)
+        self.statusBar().showMessage('Slot metrics written to {}'.format(path))
+
+    def show_profile_summary(self, action_name, path, summary):
+        self.actions['profile_next_action'].setChecked(False)
+        self.statusBar().showMessage('Profile saved to {}'.format(path))
+        dialog = TextDialog(
+            'Profile of "{}"'.format(action_name),
+            'Stats saved to {}\n\n{}'.format(path, summary),
+            parent=self,
+        )
+        dialog.show()
+        # Keep a reference, the dialog is not modal
+        self.profile_dialog = dialog
+
     def add_list_item(self, model_item):
         # We have to resize the color patch column after some items were added
         self.list_view.horizontalHeader().resizeSection(0, 20)
@@ -852,3 +1293,102 @@ class SeriesListView(QtWidgets.QTableView):
         else:
             event.ignore()
 
+
+class TextDialog(QtWidgets.QDialog):
+    """Non-modal dialog showing monospaced, read-only text"""
+    def __init__(self, title, text, parent=None):
+        super(TextDialog, self).__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(900, 500)
+        self.layout = QtWidgets.QVBoxLayout(self)
+        self.text_edit = QtWidgets.QPlainTextEdit(self)
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        font = QtGui.QFont('Monospace')
+        font.setStyleHint(QtGui.QFont.TypeWriter)
+        self.text_edit.setFont(font)
+        self.text_edit.setPlainText(text)
+        self.layout.addWidget(self.text_edit)
+
+
+def get_save_filename(parent, caption, default_name, file_filter=''):
+    """QFileDialog.getSaveFileName returning a str ('' if cancelled) for
+    both PyQt4 and PyQt5 (which returns a tuple)"""
+    result = QtWidgets.QFileDialog.getSaveFileName(
+        parent, caption, default_name, file_filter
+    )
+    if isinstance(result, tuple):
+        result = result[0]
+    return str(result)
+
+
+def get_open_filename(parent, caption, file_filter=''):
+    """QFileDialog.getOpenFileName returning a str ('' if cancelled), see
+    get_save_filename"""
+    result = QtWidgets.QFileDialog.getOpenFileName(
+        parent, caption, '', file_filter
+    )
+    if isinstance(result, tuple):
+        result = result[0]
+    return str(result)
+
+
+def get_existing_directory(parent, caption):
+    """QFileDialog.getExistingDirectory returning a str ('' if cancelled)"""
+    return str(QtWidgets.QFileDialog.getExistingDirectory(parent, caption))
+
+
+class TraceDialog(QtWidgets.QDialog):
+    """
+    Debug panel listing the timing spans recorded by a tracing.Tracer,
+    aggregated by name, with export to Chrome trace-event JSON
+    """
+    columns = ['Span', 'Count', 'Total (ms)', 'Mean (ms)', 'Max (ms)']
+
+    def __init__(self, tracer_, parent=None):
+        super(TraceDialog, self).__init__(parent)
+        self.tracer = tracer_
+        self.setWindowTitle('Frame timings')
+        self.resize(560, 400)
+        self.layout = QtWidgets.QVBoxLayout(self)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.columns), self)
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.layout.addWidget(self.table)
+
+        buttons = QtWidgets.QHBoxLayout()
+        for text, callback in [('Refresh', self.refresh),
+                               ('Clear', self.clear),
+                               ('Export Chrome trace...', self.export)]:
+            button = QtWidgets.QPushButton(text, self)
+            button.clicked.connect(lambda _=None, cb=callback: cb())
+            buttons.addWidget(button)
+        self.layout.addLayout(buttons)
+
+    def refresh(self):
+        rows = self.tracer.summary()
+        self.table.setRowCount(len(rows))
+        for row_idx, (name, count, total, mean, max_) in enumerate(rows):
+            texts = [name, str(count)] + [
+                '{:.2f}'.format(value * 1000) for value in (total, mean, max_)
+            ]
+            for col_idx, text in enumerate(texts):
+                self.table.setItem(row_idx, col_idx,
+                                   QtWidgets.QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+
+    def clear(self):
+        self.tracer.clear()
+        self.refresh()
+
+    def export(self):
+        path = get_save_filename(
+            self,
+            'Export Chrome trace',
+            datetime.now().strftime('inspector-trace-%Y%m%d-%H%M%S.json'),
+            'JSON (*.json)',
+        )
+        if path:
+            self.tracer.export_chrome_trace(path)
@@ -90,7 +90,7 @@ setup(
         'pandas>=0.17.0',
         'numpy>=1.9.0',
         'matplotlib>=1.4.2',
-        'mock',
+        'mock; python_version < "3.3"',
     ],
     extras_require={
         'test': [